@@ -0,0 +1,44 @@
+"""composite unique index on currency_rates (currency_id, date DESC)
+
+Revision ID: 2616f3216b56
+Revises: 3f96800cb35e
+Create Date: 2026-10-17 10:12:40.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2616f3216b56'
+down_revision: Union[str, Sequence[str], None] = '3f96800cb35e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Перед созданием уникального индекса убираем дубли (оставляем самую раннюю запись)
+    op.execute(
+        """
+        DELETE FROM currency_rates a
+        USING currency_rates b
+        WHERE a.currency_id = b.currency_id
+          AND a.date = b.date
+          AND a.id > b.id
+        """
+    )
+    op.create_index(
+        'ux_currency_rates_currency_id_date',
+        'currency_rates',
+        ['currency_id', sa.text('date DESC')],
+        unique=True,
+        postgresql_include=['rate'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_currency_rates_currency_id_date', table_name='currency_rates')
@@ -0,0 +1,32 @@
+"""keyset index on transactions (wallet_id, created_at DESC, id DESC)
+
+Revision ID: 9b51520f220b
+Revises: 2616f3216b56
+Create Date: 2026-10-17 12:40:03.511827
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b51520f220b'
+down_revision: Union[str, Sequence[str], None] = '2616f3216b56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_transactions_wallet_id_created_at_id',
+        'transactions',
+        ['wallet_id', sa.text('created_at DESC'), sa.text('id DESC')],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_wallet_id_created_at_id', table_name='transactions')
@@ -0,0 +1,34 @@
+"""balance_snapshots table
+
+Revision ID: a41c7e9d2b63
+Revises: 15236282bfc0
+Create Date: 2026-10-17 16:20:43.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c7e9d2b63'
+down_revision: Union[str, Sequence[str], None] = '15236282bfc0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('balance_snapshots',
+    sa.Column('wallet_id', sa.Integer(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('balance', sa.Numeric(precision=20, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('wallet_id', 'taken_at')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('balance_snapshots')
@@ -0,0 +1,28 @@
+"""index on categories.parent_id
+
+Revision ID: c5e2f18a7d40
+Revises: a41c7e9d2b63
+Create Date: 2026-10-17 17:05:12.540118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2f18a7d40'
+down_revision: Union[str, Sequence[str], None] = 'a41c7e9d2b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_categories_parent_id'), 'categories', ['parent_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_categories_parent_id'), table_name='categories')
@@ -0,0 +1,56 @@
+"""monthly_aggregates rollup table
+
+Revision ID: cec285d9e68c
+Revises: 9b51520f220b
+Create Date: 2026-10-17 13:21:47.904116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cec285d9e68c'
+down_revision: Union[str, Sequence[str], None] = '9b51520f220b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('monthly_aggregates',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('wallet_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('type', postgresql.ENUM('INCOME', 'EXPENSE', 'TRANSFER', name='transactiontype', create_type=False), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Numeric(precision=20, scale=2), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'wallet_id', 'month', 'type', 'category_id')
+    )
+    # Первичное заполнение (то же, что app.commands.rebuild_monthly_aggregates)
+    op.execute(
+        """
+        INSERT INTO monthly_aggregates (user_id, wallet_id, month, type, category_id, total, count)
+        SELECT w.user_id,
+               t.wallet_id,
+               date_trunc('month', timezone('UTC', t.created_at))::date,
+               t.type,
+               coalesce(t.category_id, 0),
+               sum(t.amount),
+               count(*)
+        FROM transactions t
+        JOIN wallets w ON w.id = t.wallet_id
+        GROUP BY 1, 2, 3, 4, 5
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('monthly_aggregates')
@@ -0,0 +1,31 @@
+"""partial index on active debts due_date
+
+Revision ID: e8f41b6d2a93
+Revises: c5e2f18a7d40
+Create Date: 2026-10-17 18:40:27.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8f41b6d2a93'
+down_revision: Union[str, Sequence[str], None] = 'c5e2f18a7d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_debts_active_due_date', 'debts', ['status', 'due_date'], unique=False,
+        postgresql_where=sa.text("status = 'ACTIVE'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_debts_active_due_date', table_name='debts')
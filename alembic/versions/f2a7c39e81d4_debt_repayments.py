@@ -0,0 +1,48 @@
+"""debt_repayments
+
+Revision ID: f2a7c39e81d4
+Revises: e8f41b6d2a93
+Create Date: 2026-10-17 19:22:51.604113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c39e81d4'
+down_revision: Union[str, Sequence[str], None] = 'e8f41b6d2a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('debt_repayments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('debt_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=20, scale=2), nullable=False),
+    sa.Column('wallet_id', sa.Integer(), nullable=True),
+    sa.Column('transaction_id', sa.Integer(), nullable=True),
+    sa.Column('comment', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['debt_id'], ['debts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallets.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_debt_repayments_debt_id'), 'debt_repayments', ['debt_id'], unique=False)
+    # История до журнала: уже погашенное — одной строкой на долг
+    op.execute(
+        "INSERT INTO debt_repayments (debt_id, amount, comment) "
+        "SELECT id, repaid_amount, 'Погашено до появления журнала' FROM debts WHERE repaid_amount > 0"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_debt_repayments_debt_id'), table_name='debt_repayments')
+    op.drop_table('debt_repayments')
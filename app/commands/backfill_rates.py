@@ -0,0 +1,39 @@
+# app/commands/backfill_rates.py
+"""
+Загрузка исторических курсов ЦБ за период.
+
+    python -m app.commands.backfill_rates --from 2020-01-01 --to 2024-12-31 --concurrency 8
+"""
+import argparse
+import asyncio
+from datetime import date
+
+import httpx
+from app.core.database import async_session_maker
+from app.modules.finance.services.currency_parser import CurrencyClient
+
+
+async def run(date_from: date, date_to: date, concurrency: int) -> dict:
+	# Один пул соединений на весь бэкфилл
+	limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+	async with httpx.AsyncClient(limits=limits, timeout=30) as http:
+		client = CurrencyClient(client=http)
+		async with async_session_maker() as session:
+			return await client.backfill_rates(session, date_from, date_to, concurrency=concurrency)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Загрузка исторических курсов ЦБ за период")
+	parser.add_argument("--from", dest="date_from", type=date.fromisoformat, required=True)
+	parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=date.today())
+	parser.add_argument("--concurrency", type=int, default=8)
+	args = parser.parse_args(argv)
+	
+	result = asyncio.run(run(args.date_from, args.date_to, args.concurrency))
+	print(f"✅ Добавлено курсов: {result['new_rates_added']} (дат: {result['dates_requested']})")
+	if result["dates_failed"]:
+		print(f"⚠️ Не удалось загрузить даты: {', '.join(result['dates_failed'])}")
+
+
+if __name__ == "__main__":
+	main()
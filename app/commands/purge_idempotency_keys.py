@@ -0,0 +1,26 @@
+# app/commands/purge_idempotency_keys.py
+"""
+Удаление протухших Idempotency-Key (старше IDEMPOTENCY_KEY_TTL_HOURS). Удобно гонять по cron.
+
+    python -m app.commands.purge_idempotency_keys
+"""
+import asyncio
+
+from app.core.database import async_session_maker
+from app.modules.finance.services.idempotency import IdempotencyService
+
+
+async def run() -> int:
+	async with async_session_maker() as session:
+		deleted = await IdempotencyService(session).purge_expired()
+		await session.commit()
+		return deleted
+
+
+def main():
+	deleted = asyncio.run(run())
+	print(f"✅ Удалено ключей: {deleted}")
+
+
+if __name__ == "__main__":
+	main()
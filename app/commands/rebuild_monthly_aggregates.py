@@ -0,0 +1,35 @@
+# app/commands/rebuild_monthly_aggregates.py
+"""
+Пересборка месячной свертки операций (monthly_aggregates) из transactions.
+Нужна для первичного заполнения и после ручных правок операций в обход сервиса.
+
+    python -m app.commands.rebuild_monthly_aggregates [--user <uuid>]
+"""
+import argparse
+import asyncio
+import uuid
+from typing import Optional
+
+from app.core.database import async_session_maker
+from app.modules.finance.services import monthly_aggregates
+
+
+async def run(user_id: Optional[uuid.UUID]) -> int:
+	async with async_session_maker() as session:
+		rows = await monthly_aggregates.rebuild(session, user_id)
+		await session.commit()
+		return rows
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Пересборка месячной свертки операций")
+	parser.add_argument("--user", dest="user_id", type=uuid.UUID, default=None,
+	                    help="Только для одного пользователя")
+	args = parser.parse_args(argv)
+	
+	rows = asyncio.run(run(args.user_id))
+	print(f"✅ Строк в свертке: {rows}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,38 @@
+# app/commands/reconcile_balances.py
+"""
+Сверка балансов кошельков с историей операций и периодические снимки баланса.
+Обходит кошельки пачками; удобно гонять по cron (например, раз в час).
+Первый запуск берет начальные снимки из текущих балансов.
+
+    python -m app.commands.reconcile_balances [--chunk 1000]
+"""
+import argparse
+import asyncio
+
+from app.core.database import async_session_maker
+from app.modules.finance.services import balance_ledger
+
+
+async def run(chunk_size: int) -> balance_ledger.ReconcileReport:
+	async with async_session_maker() as session:
+		return await balance_ledger.reconcile(session, chunk_size=chunk_size)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Сверка балансов кошельков с историей операций")
+	parser.add_argument("--chunk", dest="chunk_size", type=int, default=1000, help="Кошельков в пачке")
+	args = parser.parse_args(argv)
+	
+	report = asyncio.run(run(args.chunk_size))
+	for drift in report.drifts:
+		print(f"⚠️ Кошелек #{drift.wallet_id}: баланс {drift.balance}, по истории {drift.expected} ({drift.diff:+})")
+	print(
+		f"✅ Кошельков: {report.wallets}, новых снимков: {report.snapshots} "
+		f"(начальных: {report.baselined}), расхождений: {len(report.drifts)}"
+	)
+	if report.drifts:
+		raise SystemExit(1)
+
+
+if __name__ == "__main__":
+	main()
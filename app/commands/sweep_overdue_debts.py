@@ -0,0 +1,35 @@
+# app/commands/sweep_overdue_debts.py
+"""
+Разовый проход пометки просроченных долгов (ACTIVE -> OVERDUE) — то же,
+что делает фоновая задача приложения. --dry-run только считает кандидатов.
+
+    python -m app.commands.sweep_overdue_debts [--dry-run] [--batch 1000]
+"""
+import argparse
+import asyncio
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.modules.social.services.overdue_sweeper import sweep_overdue
+
+
+async def run(batch_size: int, dry_run: bool) -> int:
+	async with async_session_maker() as session:
+		return await sweep_overdue(session, batch_size=batch_size, dry_run=dry_run)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Пометка просроченных долгов")
+	parser.add_argument("--batch", dest="batch_size", type=int, default=settings.DEBT_OVERDUE_SWEEP_BATCH, help="Долгов в пачке")
+	parser.add_argument("--dry-run", action="store_true", help="Только посчитать, статусы не менять")
+	args = parser.parse_args(argv)
+	
+	count = asyncio.run(run(args.batch_size, args.dry_run))
+	if args.dry_run:
+		print(f"✅ Будет помечено просроченными: {count}")
+	else:
+		print(f"✅ Помечено просроченными: {count}")
+
+
+if __name__ == "__main__":
+	main()
@@ -1,4 +1,7 @@
+from typing import Optional
+
 from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
 
 from starlette.requests import Request
 from starlette.responses import Response
@@ -6,10 +9,17 @@ from starlette_admin.auth import AdminUser, AuthProvider, AdminConfig
 from starlette_admin.exceptions import LoginFailed
 
 from app.core.database import engine
-from app.core.security import verify_password
+from app.core.security import verify_password_async
 from app.modules.auth.models import User, UserRole
 
 
+def _get_user_by_phone(phone: str) -> Optional[User]:
+	# Ищем пользователя (поле username в форме - это наш phone_number)
+	with Session(engine) as session:
+		statement = select(User).where(User.phone_number == phone)
+		return session.exec(statement).first()
+
+
 class MonetaAuthProvider(AuthProvider):
 	async def login(
 			self,
@@ -19,28 +29,26 @@ class MonetaAuthProvider(AuthProvider):
 			request: Request,
 			response: Response,
 	) -> Response:
-		with Session(engine) as session:
-			# Ищем пользователя (поле username в форме - это наш phone_number)
-			statement = select(User).where(User.phone_number == username)
-			user = session.exec(statement).first()
-			
-			# 1. Проверяем существование и пароль
-			if not user or not verify_password(password, user.hashed_password):
-				raise LoginFailed("Неверный номер телефона или пароль")
-			
-			# 2. Проверяем роль (доступ только админам)
-			if user.role != UserRole.ADMIN:
-				raise LoginFailed("У вас нет прав администратора")
-			
-			# 3. Сохраняем данные в сессию
-			# Важно: сессия должна быть инициализирована через Middleware
-			request.session.update({
-				"user_id": str(user.id),
-				"user_phone": user.phone_number,
-				"user_name": user.full_name or "Admin"
-			})
-			
-			return response
+		# Синхронный запрос к БД и bcrypt не должны блокировать event loop
+		user = await run_in_threadpool(_get_user_by_phone, username)
+		
+		# 1. Проверяем существование и пароль
+		if not user or not await verify_password_async(password, user.hashed_password):
+			raise LoginFailed("Неверный номер телефона или пароль")
+		
+		# 2. Проверяем роль (доступ только админам)
+		if user.role != UserRole.ADMIN:
+			raise LoginFailed("У вас нет прав администратора")
+		
+		# 3. Сохраняем данные в сессию
+		# Важно: сессия должна быть инициализирована через Middleware
+		request.session.update({
+			"user_id": str(user.id),
+			"user_phone": user.phone_number,
+			"user_name": user.full_name or "Admin"
+		})
+		
+		return response
 	
 	async def is_authenticated(self, request: Request) -> bool:
 		# Проверяем, есть ли ID в сессии
@@ -21,6 +21,18 @@ class Settings(BaseSettings):
 	# --- DATABASE ---
 	DATABASE_URL: str | None = None
 	
+	# --- DATABASE POOL ---
+	DB_ECHO: bool = False  # SQL в консоль: только для локальной отладки, в проде заваливает stdout
+	DB_SLOW_QUERY_MS: int = 200  # запросы дольше порога пишутся в лог moneta.sql.slow
+	DB_POOL_SIZE: int = 10
+	DB_MAX_OVERFLOW: int = 20
+	DB_POOL_RECYCLE: int = 1800  # секунд; рвем соединения до того, как их закроет сервер/прокси
+	DB_POOL_PRE_PING: bool = True
+	
+	# --- METRICS ---
+	# Bearer-токен для /internal/metrics (Prometheus: authorization.credentials). Не задан — ручка отдает 404
+	METRICS_TOKEN: Optional[str] = None
+	
 	# --- PATHS ---
 	BASE_DIR: Path = Path(__file__).resolve().parent.parent.parent
 	
@@ -30,6 +42,55 @@ class Settings(BaseSettings):
 	ALGORITHM: str
 	ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 дней (чтобы не логиниться постоянно)
 	
+	# --- PASSWORD HASHING ---
+	# Cost factor bcrypt (2^N итераций): +1 к значению = в 2 раза медленнее хеш
+	BCRYPT_ROUNDS: int = 12
+	# Размер отдельного пула потоков для bcrypt (не занимает общий threadpool/event loop)
+	PASSWORD_HASH_WORKERS: int = 4
+	
+	# --- AUTH CACHE ---
+	# Снимки активных пользователей в памяти процесса (get_current_user не ходит в БД)
+	AUTH_USER_CACHE_TTL_SECONDS: int = 60
+	AUTH_USER_CACHE_MAXSIZE: int = 10_000
+	# Read-only ручки верят подписанным claims токена без похода в БД/кэш.
+	# Минус: деактивированный пользователь читает данные до истечения токена.
+	AUTH_TRUST_TOKEN_CLAIMS: bool = False
+	
+	# --- RATE CACHE ---
+	# Курсы валют в памяти процесса; курсы, записанные другим процессом, видны не позже TTL
+	RATE_CACHE_TTL_SECONDS: int = 300
+	
+	# --- CATEGORY CACHE ---
+	# Дерево категорий в памяти процесса; записи в других воркерах видны не позже TTL
+	CATEGORY_CACHE_TTL_SECONDS: int = 300
+	CATEGORY_CACHE_MAXSIZE: int = 10_000
+	
+	# --- CATEGORY CLASSIFIER ---
+	# Подсказка категории по описанию: индексы пользователей в памяти процесса (LRU + TTL),
+	# каждый строится из последних HISTORY_LIMIT операций пользователя
+	CATEGORY_CLASSIFIER_USERS_MAXSIZE: int = 10_000
+	CATEGORY_CLASSIFIER_USER_TTL_SECONDS: int = 3600
+	CATEGORY_CLASSIFIER_HISTORY_LIMIT: int = 5000
+	
+	# --- BALANCES ---
+	# Доход/расход: баланс меняется одним UPDATE ... RETURNING без SELECT ... FOR UPDATE.
+	# False — старый путь с блокировкой кошелька на несколько round trip'ов
+	ATOMIC_BALANCE_UPDATES: bool = True
+	# Снимок баланса: после стольких операций с прошлого снимка или раз в столько часов
+	BALANCE_SNAPSHOT_EVERY: int = 500
+	BALANCE_SNAPSHOT_MAX_AGE_HOURS: int = 24
+	
+	# --- DEBTS ---
+	# Фоновая пометка просроченных долгов (ACTIVE -> OVERDUE); 0 — задача не запускается
+	DEBT_OVERDUE_SWEEP_INTERVAL_SECONDS: int = 300
+	DEBT_OVERDUE_SWEEP_BATCH: int = 1000
+	# Только считать кандидатов (метрика + лог), статусы не трогать
+	DEBT_OVERDUE_SWEEP_DRY_RUN: bool = False
+	
+	# --- IDEMPOTENCY ---
+	# Сколько хранится ответ на POST с Idempotency-Key (повторы клиента в этом окне безопасны)
+	IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+	
 	class Config:
 		# Читаем переменные из файла .env
 		env_file = ".env"
@@ -1,9 +1,82 @@
 # app/core/database.py
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
 from app.core.config import settings
+from app.core.metrics import instrument_engine, record_pool_wait
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool, который отдает в метрики время ожидания свободного соединения."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_pool_wait(time.perf_counter() - start)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_pool_wait(time.perf_counter() - start)
+
+
+def _engine_kwargs(url: str, is_async: bool = False) -> dict:
+    """Настройки пула из Settings. У SQLite (тесты) свой пул — параметры не передаем."""
+    kwargs = {"echo": settings.DB_ECHO}  # echo=True выводит SQL запросы в консоль (только для отладки)
+    if make_url(url).get_backend_name() != "sqlite":
+        kwargs.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+    return kwargs
+
 
-# check_same_thread=False нужен только для SQLite, для Postgres удаляем
-engine = create_engine(settings.DATABASE_URL, echo=True) # echo=True выводит SQL запросы в консоль (удобно для отладки)
+def _async_url(url: str):
+    """postgresql:// -> postgresql+asyncpg://, sqlite:// -> sqlite+aiosqlite://"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}[backend]
+    
+    # asyncpg не понимает sslmode (Heroku добавляет ?sslmode=require) — переводим в ssl
+    query = dict(parsed.query)
+    sslmode = query.pop("sslmode", None)
+    if sslmode and backend == "postgresql":
+        query["ssl"] = sslmode
+    
+    return parsed.set(drivername=f"{backend}+{driver}", query=query)
+
+
+# Синхронный движок: админка (starlette-admin), миграции, скрипты
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL))
+
+# Асинхронный движок: API. Не занимает threadpool FastAPI на время запросов к БД.
+async_engine = create_async_engine(
+    _async_url(settings.DATABASE_URL), **_engine_kwargs(settings.DATABASE_URL, is_async=True)
+)
+
+# Счетчики запросов/времени и лог медленных запросов (вместо echo в проде)
+instrument_engine(engine)
+instrument_engine(async_engine)
+
+# expire_on_commit=False: после commit объекты можно сериализовать без повторного
+# (ленивого и в async невозможного) похода в БД
+async_session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 def get_session():
     """
@@ -13,9 +86,22 @@ def get_session():
     with Session(engine) as session:
         yield session
 
+async def get_async_session():
+    """
+    Асинхронный аналог get_session для async-ручек.
+    """
+    async with async_session_maker() as session:
+        yield session
+
+def dialect_insert(session: AsyncSession):
+    """INSERT с поддержкой ON CONFLICT для текущей БД (PostgreSQL в проде, SQLite в тестах)."""
+    if session.bind.dialect.name == "sqlite":
+        return sqlite_insert
+    return pg_insert
+
 def create_db_and_tables():
     """
     Создает таблицы, если их нет.
     В продакшене лучше использовать Alembic, но для старта это ок.
     """
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
@@ -0,0 +1,221 @@
+# app/core/metrics.py
+"""
+Стоимость запросов к БД в разрезе HTTP-ручек.
+
+- события SQLAlchemy (instrument_engine) считают запросы, время в БД и строки;
+- пул соединений (database.TimedQueuePool) добавляет время ожидания соединения;
+- MetricsMiddleware копит это на время HTTP-запроса, отдает заголовок Server-Timing
+  и складывает итоги в общий реестр;
+- /internal/metrics отдает реестр в текстовом формате Prometheus — только
+  с заголовком Authorization: Bearer <METRICS_TOKEN>, без токена в настройках ручки нет.
+"""
+import logging
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from app.core.config import settings
+
+slow_query_logger = logging.getLogger("moneta.sql.slow")
+
+
+@dataclass
+class RequestStats:
+	"""Счетчики одного HTTP-запроса. Объект общий для всех задач/потоков запроса."""
+	statements: int = 0
+	db_time: float = 0.0
+	rows: int = 0
+	pool_wait: float = 0.0
+
+
+# Статистика текущего запроса (None вне HTTP-запроса: команды, фоновые задачи)
+current_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_stats", default=None)
+
+
+def record_pool_wait(seconds: float) -> None:
+	stats = current_stats.get()
+	if stats is not None:
+		stats.pool_wait += seconds
+
+
+# =========================================================================
+# SQLAlchemy
+# =========================================================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	elapsed = time.perf_counter() - conn.info.pop("query_start")
+
+	stats = current_stats.get()
+	if stats is not None:
+		stats.statements += 1
+		stats.db_time += elapsed
+		# У SELECT драйвер отдает rowcount не всегда (-1) — такие не считаем
+		if cursor.rowcount and cursor.rowcount > 0:
+			stats.rows += cursor.rowcount
+
+	if elapsed * 1000 >= settings.DB_SLOW_QUERY_MS:
+		metrics.record_slow_query()
+		slow_query_logger.warning("Медленный запрос %.1f мс: %s", elapsed * 1000, " ".join(statement.split())[:1000])
+
+
+def instrument_engine(engine) -> None:
+	"""Вешает счетчики на движок (для AsyncEngine — на его sync_engine)."""
+	engine = getattr(engine, "sync_engine", engine)
+	event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+	event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# =========================================================================
+# РЕЕСТР
+# =========================================================================
+
+RouteKey = Tuple[str, str]  # (method, шаблон пути)
+
+
+class MetricsRegistry:
+	"""Накопленные итоги по ручкам. Пишут и event loop, и потоки threadpool — нужен лок."""
+
+	# (имя метрики, поле, описание)
+	COUNTERS = (
+		("moneta_http_requests_total", "requests", "Количество HTTP-запросов"),
+		("moneta_http_request_duration_seconds_total", "duration", "Суммарное время обработки запросов"),
+		("moneta_db_statements_total", "statements", "Количество SQL-запросов"),
+		("moneta_db_duration_seconds_total", "db_time", "Суммарное время выполнения SQL"),
+		("moneta_db_rows_total", "rows", "Строки, затронутые/возвращенные SQL (по rowcount драйвера)"),
+		("moneta_db_pool_wait_seconds_total", "pool_wait", "Суммарное ожидание соединения из пула"),
+	)
+
+	def __init__(self):
+		self._routes: Dict[RouteKey, Dict[str, float]] = {}
+		self._lock = threading.Lock()
+		self.slow_queries = 0
+		# Фоновая пометка просроченных долгов: {"applied" | "dry_run": число долгов}
+		self.overdue_debts = {"applied": 0, "dry_run": 0}
+
+	def observe(self, method: str, route: str, duration: float, stats: RequestStats) -> None:
+		with self._lock:
+			totals = self._routes.setdefault((method, route), {field: 0 for _, field, _ in self.COUNTERS})
+			totals["requests"] += 1
+			totals["duration"] += duration
+			totals["statements"] += stats.statements
+			totals["db_time"] += stats.db_time
+			totals["rows"] += stats.rows
+			totals["pool_wait"] += stats.pool_wait
+
+	def record_slow_query(self) -> None:
+		with self._lock:
+			self.slow_queries += 1
+
+	def record_overdue_debts(self, count: int, dry_run: bool = False) -> None:
+		with self._lock:
+			self.overdue_debts["dry_run" if dry_run else "applied"] += count
+
+	def reset(self) -> None:
+		with self._lock:
+			self._routes.clear()
+			self.slow_queries = 0
+			self.overdue_debts = {"applied": 0, "dry_run": 0}
+
+	def render(self) -> str:
+		"""Текстовый формат Prometheus (text/plain; version=0.0.4)."""
+		with self._lock:
+			routes = sorted(self._routes.items())
+			slow_queries = self.slow_queries
+			overdue_debts = dict(self.overdue_debts)
+
+		lines = []
+		for name, field, help_text in self.COUNTERS:
+			lines.append(f"# HELP {name} {help_text}")
+			lines.append(f"# TYPE {name} counter")
+			for (method, route), totals in routes:
+				lines.append(f'{name}{{method="{method}",route="{_escape(route)}"}} {totals[field]:g}')
+
+		lines.append("# HELP moneta_db_slow_queries_total SQL-запросы дольше DB_SLOW_QUERY_MS")
+		lines.append("# TYPE moneta_db_slow_queries_total counter")
+		lines.append(f"moneta_db_slow_queries_total {slow_queries}")
+		lines.append("# HELP moneta_debts_marked_overdue_total Долги, помеченные просроченными (dry_run — найденные без изменений)")
+		lines.append("# TYPE moneta_debts_marked_overdue_total counter")
+		for mode, count in overdue_debts.items():
+			lines.append(f'moneta_debts_marked_overdue_total{{mode="{mode}"}} {count}')
+		return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Единый экземпляр на процесс
+metrics = MetricsRegistry()
+
+
+# =========================================================================
+# HTTP
+# =========================================================================
+
+class MetricsMiddleware:
+	"""
+	Чистый ASGI-middleware (без BaseHTTPMiddleware): не создает лишних задач
+	и не буферизует ответ. Server-Timing собирается к моменту отправки заголовков,
+	поэтому SQL, выполненный во время стриминга тела, попадает только в /internal/metrics.
+	"""
+
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			return await self.app(scope, receive, send)
+
+		stats = RequestStats()
+		token = current_stats.set(stats)
+		start = time.perf_counter()
+
+		async def send_wrapper(message):
+			if message["type"] == "http.response.start":
+				headers = list(message.get("headers", []))
+				headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - start).encode()))
+				message = {**message, "headers": headers}
+			await send(message)
+
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			current_stats.reset(token)
+			metrics.observe(scope["method"], _route_template(scope), time.perf_counter() - start, stats)
+
+
+def _route_template(scope) -> str:
+	# Шаблон (/wallets/{wallet_id}), а не сырой путь — иначе метрик будет по числу id
+	route = scope.get("route")
+	path = getattr(route, "path", None)
+	return path or "unmatched"
+
+
+def _server_timing(stats: RequestStats, total: float) -> str:
+	return (
+		f'db;desc="{stats.statements} queries";dur={stats.db_time * 1000:.1f}, '
+		f"pool;dur={stats.pool_wait * 1000:.1f}, "
+		f"app;dur={total * 1000:.1f}"
+	)
+
+
+async def metrics_endpoint(request: Request):
+	# Метрики раскрывают маршруты и нагрузку — наружу их не отдаем
+	if not settings.METRICS_TOKEN:
+		return PlainTextResponse("Not Found", status_code=404)
+	scheme, _, token = request.headers.get("authorization", "").partition(" ")
+	if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+		return PlainTextResponse("Unauthorized", status_code=401, headers={"WWW-Authenticate": "Bearer"})
+	
+	return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
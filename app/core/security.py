@@ -1,4 +1,6 @@
 # app/core/security.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, UTC
 from typing import Optional
 
@@ -10,12 +12,19 @@ from app.core.config import settings
 
 # pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt отпускает GIL, поэтому хватает потоков. Пул ограничен, чтобы всплеск логинов
+# не съел ни event loop, ни общий threadpool FastAPI (там крутятся sync-ручки).
+_password_executor = ThreadPoolExecutor(
+	max_workers=settings.PASSWORD_HASH_WORKERS,
+	thread_name_prefix="bcrypt",
+)
+
 
 def get_password_hash(password: str) -> str:
 	# Превращаем строку в байты
 	pwd_bytes = password.encode('utf-8')
 	# Генерируем соль и хешируем
-	salt = bcrypt.gensalt()
+	salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
 	hashed = bcrypt.hashpw(pwd_bytes, salt)
 	# Возвращаем строку для хранения в БД
 	return hashed.decode('utf-8')
@@ -28,6 +37,18 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 	return bcrypt.checkpw(password_bytes, hashed_bytes)
 
 
+async def get_password_hash_async(password: str) -> str:
+	"""get_password_hash в выделенном пуле — для async-кода."""
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+	"""verify_password в выделенном пуле — для async-кода."""
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(_password_executor, verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 	to_encode = data.copy()
 	if expires_delta:
@@ -1,4 +1,5 @@
 # app/main.py
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
@@ -6,8 +7,12 @@ from sqlmodel import Session
 
 from app.api.router import api_router
 from app.core.admin import create_admin
-from app.core.database import create_db_and_tables, engine
+from app.core.config import settings
+from app.core.database import create_db_and_tables, engine, async_engine, async_session_maker
+from app.core.metrics import MetricsMiddleware, metrics_endpoint
 from app.core.init_data import init_base_currency
+from app.modules.finance.services.category_classifier import category_classifier
+from app.modules.social.services.overdue_sweeper import run_overdue_sweeper
 
 
 # Функция, которая запускается ПЕРЕД стартом приложения
@@ -20,7 +25,20 @@ async def lifespan(app: FastAPI):
         init_base_currency(session)
     
     print("Startup: Таблицы проверены/созданы.")
+    
+    # Общий индекс классификатора категорий строится фоном: старт не ждет чтения истории
+    classifier_build = asyncio.create_task(category_classifier.build_global(async_session_maker))
+    # Просроченные долги помечаются фоном, а не при чтении
+    overdue_sweeper = None
+    if settings.DEBT_OVERDUE_SWEEP_INTERVAL_SECONDS > 0:
+        overdue_sweeper = asyncio.create_task(
+            run_overdue_sweeper(async_session_maker, settings.DEBT_OVERDUE_SWEEP_INTERVAL_SECONDS)
+        )
     yield
+    classifier_build.cancel()
+    if overdue_sweeper:
+        overdue_sweeper.cancel()
+    await async_engine.dispose()
     print("Shutdown: Приложение остановлено.")
 
 app = FastAPI(
@@ -29,6 +47,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Кол-во SQL, время в БД и ожидание пула по ручкам: заголовок Server-Timing + /internal/metrics (по METRICS_TOKEN)
+app.add_middleware(MetricsMiddleware)
+app.add_route("/internal/metrics", metrics_endpoint, include_in_schema=False)
+
 # Подключаем роутеры
 app.include_router(api_router, prefix='/api/v1')
 
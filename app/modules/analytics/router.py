@@ -1,69 +1,94 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select, func
-from datetime import date, timedelta
-from typing import List
-from app.core.database import get_session
-from app.modules.auth.dependencies import get_current_user
+import json
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import date
+from typing import Optional
+from app.core.database import get_async_session
+from app.modules.auth.dependencies import get_current_user_readonly
 from app.modules.auth.models import User
-from app.modules.finance.models import Transaction, TransactionType, Category
+from app.modules.analytics.service import AnalyticsService, BASE_CURRENCY, Granularity
 
 router = APIRouter()
 
 
 @router.get("/summary")
-def get_monthly_summary(
+async def get_monthly_summary(
 		month: date = None,  # Если нет, берем текущий
-		session: Session = Depends(get_session),
-		user: User = Depends(get_current_user)
+		currency: str = BASE_CURRENCY,
+		session: AsyncSession = Depends(get_async_session),
+		user: User = Depends(get_current_user_readonly)
 ):
-	"""Возвращает: Общий доход, Общий расход, Разницу (Savings) за месяц"""
+	"""Возвращает: Общий доход, Общий расход, Разницу (Savings) за месяц в валюте currency"""
 	if not month:
 		month = date.today()
 	
-	# Определяем начало и конец месяца
-	start_date = month.replace(day=1)
-	next_month = (start_date + timedelta(days=32)).replace(day=1)
-	
-	# SQL запрос: Группируем по типу транзакции (INCOME/EXPENSE)
-	# ВАЖНО: Тут нужно учитывать валюты! Для MVP пока считаем в валюте кошелька
-	# (или нужно конвертировать всё к базовой валюте UZS через CurrencyService)
-	
-	query = (
-		select(Transaction.type, func.sum(Transaction.amount))
-		.join(Transaction.wallet)
-		.where(Transaction.wallet.has(user_id=user.id))
-		.where(Transaction.created_at >= start_date)
-		.where(Transaction.created_at < next_month)
-		.group_by(Transaction.type)
-	)
-	
-	results = session.exec(query).all()
-	
-	summary = {"income": 0, "expense": 0, "total": 0}
-	for t_type, amount in results:
-		if t_type == TransactionType.INCOME:
-			summary["income"] = amount
-		elif t_type == TransactionType.EXPENSE:
-			summary["expense"] = amount
-	
-	summary["total"] = summary["income"] - summary["expense"]
-	return summary
+	return await AnalyticsService(session).monthly_summary(user.id, month, currency)
 
 
 @router.get("/expenses-by-category")
-def get_expenses_by_category(
-		session: Session = Depends(get_session),
-		user: User = Depends(get_current_user)
+async def get_expenses_by_category(
+		month: Optional[date] = None,  # Если нет — за все время
+		currency: str = BASE_CURRENCY,
+		session: AsyncSession = Depends(get_async_session),
+		user: User = Depends(get_current_user_readonly)
 ):
-	"""Для круговой диаграммы расходов"""
-	query = (
-		select(Category.name, func.sum(Transaction.amount))
-		.join(Transaction.category)
-		.join(Transaction.wallet)
-		.where(Transaction.wallet.has(user_id=user.id))
-		.where(Transaction.type == TransactionType.EXPENSE)
-		.group_by(Category.name)
-	)
-	results = session.exec(query).all()
-	
-	return [{"category": name, "amount": amount} for name, amount in results]
\ No newline at end of file
+	"""Для круговой диаграммы расходов (в валюте currency): корневые категории с подкатегориями внутри"""
+	return await AnalyticsService(session).expenses_by_category(user.id, month, currency)
+
+
+@router.get("/expenses-by-category/{category_id}")
+async def get_category_drilldown(
+		category_id: int,
+		month: Optional[date] = None,  # Если нет — за все время
+		currency: str = BASE_CURRENCY,
+		session: AsyncSession = Depends(get_async_session),
+		user: User = Depends(get_current_user_readonly)
+):
+	"""Провал в категорию: ее сумма, расходы прямо на нее и суммы прямых подкатегорий"""
+	return await AnalyticsService(session).category_drilldown(user.id, category_id, month, currency)
+
+
+@router.get("/net-worth")
+async def get_net_worth(
+		date_from: date = Query(alias="from"),
+		date_to: date = Query(default_factory=date.today, alias="to"),
+		granularity: Granularity = Granularity.DAY,
+		currency: str = BASE_CURRENCY,
+		session: AsyncSession = Depends(get_async_session),
+		user: User = Depends(get_current_user_readonly)
+):
+	"""
+	Ряд балансов: по каждому кошельку и итог в валюте currency на конец каждого периода.
+	balances[i] в точке ряда соответствует wallets[i]. Суммы — строками, как в остальном API.
+	Ряд считается в памяти (не длиннее MAX_SERIES_POINTS), а тело отдается кусками
+	по _STREAM_CHUNK точек, без сборки всего JSON в одну строку.
+	"""
+	report = await AnalyticsService(session).net_worth(user.id, date_from, date_to, granularity, currency)
+	return StreamingResponse(_stream_net_worth(report), media_type="application/json")
+
+
+# Точек ряда в одном куске потока
+_STREAM_CHUNK = 256
+
+
+def _stream_net_worth(report: dict):
+	series = report.pop("series")
+	# Decimal → str, как _money_model_config в схемах: float теряет копейки на больших суммах
+	head = json.dumps(jsonable_encoder(report, custom_encoder={Decimal: str}), ensure_ascii=False)
+	yield head[:-1] + ', "series": ['
+	for offset in range(0, len(series), _STREAM_CHUNK):
+		# Без jsonable_encoder на каждую точку: формат тот же, но в разы дешевле
+		chunk = ",".join(
+			json.dumps({
+				"date": point["date"].isoformat(),
+				"balances": [str(balance) for balance in point["balances"]],
+				"total": str(point["total"]),
+			})
+			for point in series[offset:offset + _STREAM_CHUNK]
+		)
+		yield ("," if offset else "") + chunk
+	yield "]}"
@@ -0,0 +1,392 @@
+# app/modules/analytics/service.py
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from enum import Enum
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import Date, and_, case, cast, literal, or_, type_coerce
+from sqlalchemy.orm import aliased
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.modules.finance.models import (
+	BalanceSnapshot, Category, Currency, CurrencyRate, MonthlyAggregate, Transaction, TransactionType, Wallet,
+)
+from app.modules.finance.services import monthly_aggregates
+from app.modules.finance.services.balance_ledger import signed_amount
+from app.modules.finance.services.currency_service import as_of_rate_subquery
+
+BASE_CURRENCY = "UZS"
+
+# 10 лет по дням
+MAX_SERIES_POINTS = 3660
+
+
+class Granularity(str, Enum):
+	DAY = "day"
+	WEEK = "week"
+	MONTH = "month"
+
+
+def period_start(day: date, granularity: Granularity) -> date:
+	if granularity == Granularity.WEEK:
+		return day - timedelta(days=day.weekday())
+	if granularity == Granularity.MONTH:
+		return day.replace(day=1)
+	return day
+
+
+def next_period(start: date, granularity: Granularity) -> date:
+	if granularity == Granularity.WEEK:
+		return start + timedelta(days=7)
+	if granularity == Granularity.MONTH:
+		return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+	return start + timedelta(days=1)
+
+
+class AnalyticsService:
+	"""
+	Отчеты по месячной свертке с пересчетом в одну валюту.
+	Каждая строка свертки конвертируется по курсу на конец своего месяца:
+	курсы достаются коррелированными подзапросами в том же SELECT,
+	а умножение делается в Python по уже сгруппированным строкам.
+	Итого на отчет — запрос валюты и один запрос данных, сколько бы ни было
+	операций, кошельков и валют.
+	"""
+
+	def __init__(self, session: AsyncSession):
+		self.session = session
+
+	async def monthly_summary(self, user_id: UUID, month: date, currency: str = BASE_CURRENCY) -> dict:
+		totals = await self._converted_totals(
+			user_id,
+			currency,
+			keys=(MonthlyAggregate.type,),
+			month=month.replace(day=1),
+		)
+
+		income = totals.get(TransactionType.INCOME, Decimal("0.00"))
+		expense = totals.get(TransactionType.EXPENSE, Decimal("0.00"))
+		return {"income": income, "expense": expense, "total": income - expense, "currency": currency}
+
+	async def expenses_by_category(
+			self, user_id: UUID, month: Optional[date] = None, currency: str = BASE_CURRENCY
+	) -> list[dict]:
+		"""Корневые категории; сумма каждой включает все ее подкатегории."""
+		totals = await self._category_subtree_totals(
+			user_id, Category.parent_id.is_(None), month, currency
+		)
+		return sorted(
+			({"id": category_id, "category": name, "amount": amount} for (category_id, name, _), amount in totals.items()),
+			key=lambda item: item["amount"],
+			reverse=True,
+		)
+	
+	async def category_drilldown(
+			self, user_id: UUID, category_id: int, month: Optional[date] = None, currency: str = BASE_CURRENCY
+	) -> dict:
+		"""
+		Категория и ее прямые подкатегории, у каждой — сумма по всему поддереву.
+		own — расходы, записанные прямо на саму категорию (не на подкатегории).
+		"""
+		category = await self.session.get(Category, category_id)
+		if not category or (category.user_id is not None and category.user_id != user_id):
+			raise HTTPException(status_code=404, detail="Категория не найдена")
+		
+		totals = await self._category_subtree_totals(
+			user_id, (Category.id == category_id) | (Category.parent_id == category_id), month, currency
+		)
+		total = Decimal("0.00")
+		children = []
+		for (node_id, name, _), amount in totals.items():
+			if node_id == category_id:
+				total = amount
+			else:
+				children.append({"id": node_id, "category": name, "amount": amount})
+		
+		return {
+			"id": category.id,
+			"category": category.name,
+			"parent_id": category.parent_id,
+			"amount": total,
+			"own": total - sum((child["amount"] for child in children), Decimal("0.00")),
+			"children": sorted(children, key=lambda item: item["amount"], reverse=True),
+		}
+
+	async def net_worth(
+			self,
+			user_id: UUID,
+			date_from: date,
+			date_to: date,
+			granularity: Granularity = Granularity.DAY,
+			currency: str = BASE_CURRENCY,
+	) -> dict:
+		"""
+		Баланс каждого кошелька на конец каждого периода [date_from, date_to] и итог
+		в валюте currency по курсу на конец периода.
+		
+		Запросов фиксированное число, независимо от длины ряда:
+		- начальные балансы: последний снимок до начала + хвост операций
+		  (кошельки без снимков — назад от текущего баланса);
+		- изменения по периодам: операции диапазона, сгруппированные по (кошелек, период);
+		- курсы: на начало и все внутри диапазона.
+		Пустые периоды все равно нужно заполнять, поэтому нарастающий итог считается
+		в Python по разреженным строкам, а не оконной функцией в SQL.
+		"""
+		if date_from > date_to:
+			raise HTTPException(status_code=400, detail="Дата начала позже даты окончания")
+		
+		periods = [period_start(date_from, granularity)]
+		last = period_start(date_to, granularity)
+		while periods[-1] < last:
+			if len(periods) >= MAX_SERIES_POINTS:
+				raise HTTPException(status_code=400, detail=f"Слишком длинный ряд (максимум {MAX_SERIES_POINTS} точек)")
+			periods.append(next_period(periods[-1], granularity))
+		
+		target = await self._get_currency_or_404(currency.upper())
+		start = datetime.combine(periods[0], time.min, tzinfo=timezone.utc)
+		end = datetime.combine(next_period(periods[-1], granularity), time.min, tzinfo=timezone.utc)
+		
+		wallets = await self._opening_balances(user_id, start)
+		deltas = await self._period_deltas(user_id, start, end, granularity)
+		
+		# Курс на последний день каждого периода
+		period_ends = [next_period(p, granularity) - timedelta(days=1) for p in periods]
+		currency_ids = {w["currency_id"] for w in wallets} | {target.id}
+		rates = await self._rate_series(currency_ids, period_ends)
+		
+		balances = [w.pop("balance") for w in wallets]
+		codes = {w["currency_id"]: w["currency"] for w in wallets} | {target.id: target.char_code}
+		series = []
+		for i, period in enumerate(periods):
+			total = Decimal("0")
+			for j, wallet in enumerate(wallets):
+				balances[j] += deltas.get((wallet["id"], period), 0)
+				total += self._convert(balances[j], wallet["currency_id"], target.id, rates[i], codes)
+			series.append({
+				"date": period,
+				"balances": [balance.quantize(Decimal("1.00")) for balance in balances],
+				"total": total.quantize(Decimal("1.00")),
+			})
+		
+		for wallet in wallets:
+			del wallet["currency_id"]
+		return {"currency": target.char_code, "granularity": granularity.value, "wallets": wallets, "series": series}
+	
+	# =========================================================================
+	# PRIVATE HELPERS
+	# =========================================================================
+	
+	async def _opening_balances(self, user_id: UUID, start: datetime) -> List[dict]:
+		"""Балансы кошельков пользователя на момент start (до операций с created_at >= start)."""
+		latest = (
+			select(BalanceSnapshot.wallet_id, func.max(BalanceSnapshot.taken_at).label("taken_at"))
+			.join(Wallet, Wallet.id == BalanceSnapshot.wallet_id)
+			.where(Wallet.user_id == user_id)
+			.where(BalanceSnapshot.taken_at < start)
+			.group_by(BalanceSnapshot.wallet_id)
+			.subquery("latest")
+		)
+		query = (
+			select(
+				Wallet.id,
+				Wallet.name,
+				Currency.id,
+				Currency.char_code,
+				Wallet.balance,
+				latest.c.taken_at,
+				BalanceSnapshot.balance,
+				func.sum(signed_amount()),
+			)
+			.join(Currency, Currency.id == Wallet.currency_id)
+			.outerjoin(latest, latest.c.wallet_id == Wallet.id)
+			.outerjoin(BalanceSnapshot, and_(
+				BalanceSnapshot.wallet_id == latest.c.wallet_id,
+				BalanceSnapshot.taken_at == latest.c.taken_at,
+			))
+			.outerjoin(Transaction, and_(
+				Transaction.wallet_id == Wallet.id,
+				or_(
+					# От снимка вперед до start ...
+					and_(Transaction.created_at > latest.c.taken_at, Transaction.created_at < start),
+					# ... или от текущего баланса назад до start
+					and_(latest.c.taken_at.is_(None), Transaction.created_at >= start),
+				),
+			))
+			.where(Wallet.user_id == user_id)
+			.group_by(
+				Wallet.id, Wallet.name, Currency.id, Currency.char_code, Wallet.balance,
+				latest.c.taken_at, BalanceSnapshot.balance,
+			)
+			.order_by(Wallet.id)
+		)
+		
+		wallets = []
+		for wallet_id, name, currency_id, char_code, balance, taken_at, snapshot_balance, tail in (
+				await self.session.exec(query)).all():
+			tail = Decimal(tail or 0)
+			wallets.append({
+				"id": wallet_id,
+				"name": name,
+				"currency": char_code,
+				"currency_id": currency_id,
+				"balance": snapshot_balance + tail if taken_at is not None else balance - tail,
+			})
+		return wallets
+	
+	async def _period_deltas(
+			self, user_id: UUID, start: datetime, end: datetime, granularity: Granularity
+	) -> Dict[tuple, Decimal]:
+		"""Сумма операций по (кошелек, начало периода) в [start, end)."""
+		period = self._period_expr(Transaction.created_at, granularity)
+		query = (
+			select(Transaction.wallet_id, period, func.sum(signed_amount()))
+			.join(Wallet, Wallet.id == Transaction.wallet_id)
+			.where(Wallet.user_id == user_id)
+			.where(Transaction.created_at >= start, Transaction.created_at < end)
+			.group_by(Transaction.wallet_id, period)
+		)
+		return {(wallet_id, day): Decimal(amount) for wallet_id, day, amount in (await self.session.exec(query)).all()}
+	
+	def _period_expr(self, column, granularity: Granularity):
+		"""Начало периода (дата, UTC) для колонки с датой-временем."""
+		if self.session.bind.dialect.name == "sqlite":
+			modifiers = {
+				Granularity.DAY: (),
+				Granularity.WEEK: ("weekday 0", "-6 days"),  # понедельник
+				Granularity.MONTH: ("start of month",),
+			}[granularity]
+			return type_coerce(func.date(column, *modifiers), Date)
+		return cast(func.date_trunc(granularity.value, func.timezone("UTC", column)), Date)
+	
+	async def _rate_series(self, currency_ids: set, days: List[date]) -> List[Dict[int, Optional[Decimal]]]:
+		"""Курсы к UZS на каждую дату из days (последний известный на дату) — два запроса."""
+		opening = select(Currency.id, as_of_rate_subquery(Currency.id, days[0])).where(Currency.id.in_(currency_ids))
+		current = {currency_id: rate for currency_id, rate in (await self.session.exec(opening)).all()}
+		
+		changes = (
+			select(CurrencyRate.date, CurrencyRate.currency_id, CurrencyRate.rate)
+			.where(CurrencyRate.currency_id.in_(currency_ids))
+			.where(CurrencyRate.date > days[0], CurrencyRate.date <= days[-1])
+			.order_by(CurrencyRate.date)
+		)
+		changes = (await self.session.exec(changes)).all()
+		
+		series, position = [], 0
+		for day in days:
+			while position < len(changes) and changes[position][0] <= day:
+				_, currency_id, rate = changes[position]
+				current[currency_id] = rate
+				position += 1
+			series.append(dict(current))
+		return series
+	
+	@staticmethod
+	def _convert(amount: Decimal, currency_id: int, target_id: int, rates: Dict[int, Optional[Decimal]], codes) -> Decimal:
+		if currency_id == target_id or not amount:
+			return amount
+		rate = Decimal("1") if codes[currency_id] == BASE_CURRENCY else rates.get(currency_id)
+		target_rate = Decimal("1") if codes[target_id] == BASE_CURRENCY else rates.get(target_id)
+		if rate is None or target_rate is None:
+			missing = codes[currency_id] if rate is None else codes[target_id]
+			raise HTTPException(status_code=400, detail=f"Не найден курс для валюты {missing}")
+		# Все курсы к UZS: (Сумма * Курс_Из) / Курс_В
+		return amount * rate / target_rate
+
+	async def _get_currency_or_404(self, char_code: str) -> Currency:
+		currency = (await self.session.exec(select(Currency).where(Currency.char_code == char_code))).first()
+		if not currency:
+			raise HTTPException(status_code=404, detail=f"Валюта {char_code} не найдена")
+		return currency
+
+	async def _category_subtree_totals(
+			self, user_id: UUID, anchor, month: Optional[date], currency: str
+	) -> Dict[tuple, Decimal]:
+		"""
+		Расходы по поддеревьям категорий, отобранных условием anchor, — одним запросом.
+		Рекурсивный CTE раскрывает каждую такую категорию во все ее потомки
+		(ancestor_id, descendant_id), свертка джойнится по потомку и группируется по предку.
+		"""
+		subtree = (
+			select(Category.id.label("ancestor_id"), Category.id.label("descendant_id"))
+			.where(anchor)
+			.where(or_(Category.user_id == user_id, Category.user_id.is_(None)))
+			.cte("subtree", recursive=True)
+		)
+		child = aliased(Category)
+		# UNION, а не UNION ALL: на случайном цикле parent_id рекурсия остановится сама
+		subtree = subtree.union(
+			select(subtree.c.ancestor_id, child.id).join(child, child.parent_id == subtree.c.descendant_id)
+		)
+		ancestor = aliased(Category)
+		return await self._converted_totals(
+			user_id,
+			currency,
+			keys=(ancestor.id, ancestor.name, ancestor.parent_id),
+			month=month.replace(day=1) if month else None,
+			tx_type=TransactionType.EXPENSE,
+			joins=(
+				(subtree, subtree.c.descendant_id == MonthlyAggregate.category_id),
+				(ancestor, ancestor.id == subtree.c.ancestor_id),
+			),
+		)
+	
+	async def _converted_totals(
+			self,
+			user_id: UUID,
+			char_code: str,
+			keys: tuple,
+			month: Optional[date] = None,
+			tx_type: Optional[TransactionType] = None,
+			joins: tuple = (),
+	) -> Dict[object, Decimal]:
+		"""Суммы свертки по keys (ключ результата — значение, а для нескольких keys — кортеж)."""
+		target = await self._get_currency_or_404(char_code.upper())
+
+		# Курс на последний день месяца строки (для текущего месяца — просто последний)
+		as_of = monthly_aggregates.month_end(self.session, MonthlyAggregate.month)
+		rate_from = case(
+			(Currency.char_code == BASE_CURRENCY, literal(Decimal("1"))),
+			else_=as_of_rate_subquery(Currency.id, as_of),
+		)
+		rate_to = (
+			literal(Decimal("1")) if target.char_code == BASE_CURRENCY
+			else as_of_rate_subquery(target.id, as_of)
+		)
+
+		query = (
+			select(
+				*keys,
+				Currency.id,
+				Currency.char_code,
+				func.sum(MonthlyAggregate.total),
+				rate_from,
+				rate_to,
+			)
+			.join(Wallet, Wallet.id == MonthlyAggregate.wallet_id)
+			.join(Currency, Currency.id == Wallet.currency_id)
+			.where(MonthlyAggregate.user_id == user_id)
+			.group_by(*keys, MonthlyAggregate.month, Currency.id, Currency.char_code)
+		)
+		for target_table, onclause in joins:
+			query = query.join(target_table, onclause)
+		if month:
+			query = query.where(MonthlyAggregate.month == month)
+		if tx_type:
+			query = query.where(MonthlyAggregate.type == tx_type)
+
+		totals: Dict[object, Decimal] = {}
+		for row in (await self.session.exec(query)).all():
+			group = row[0] if len(keys) == 1 else tuple(row[:len(keys)])
+			currency_id, currency_code, amount, rate, target_rate = row[len(keys):]
+			if currency_id != target.id:
+				if rate is None or target_rate is None:
+					missing = currency_code if rate is None else target.char_code
+					raise HTTPException(status_code=400, detail=f"Не найден курс для валюты {missing}")
+				# Все курсы к UZS: (Сумма * Курс_Из) / Курс_В
+				amount = amount * rate / target_rate
+			totals[group] = totals.get(group, Decimal("0")) + amount
+
+		return {group: amount.quantize(Decimal("1.00")) for group, amount in totals.items()}
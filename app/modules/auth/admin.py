@@ -14,8 +14,9 @@ from starlette_admin.fields import (
 )
 from starlette_admin.helpers import not_none
 from starlette_admin.exceptions import FormValidationError
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async
 from app.modules.auth.models import UserRole, UserLanguage
+from app.modules.auth.user_cache import user_cache
 
 
 class UserAdmin(ModelView):
@@ -115,7 +116,7 @@ class UserAdmin(ModelView):
 		if not raw_password:
 			raise FormValidationError({"password_create": "Password is required"})
 		
-		obj.hashed_password = get_password_hash(raw_password)
+		obj.hashed_password = await get_password_hash_async(raw_password)
 		return obj
 	
 	async def before_edit(self, request, data, obj):
@@ -123,7 +124,13 @@ class UserAdmin(ModelView):
 		
 		# Если пароль введен - обновляем хеш
 		if raw_password:
-			obj.hashed_password = get_password_hash(raw_password)
+			obj.hashed_password = await get_password_hash_async(raw_password)
 		
 		return obj
 	
+	# Роль, активность или пароль могли поменяться — сбрасываем снимок в кэше
+	async def after_edit(self, request, obj):
+		user_cache.invalidate(obj.id)
+	
+	async def after_delete(self, request, obj):
+		user_cache.invalidate(obj.id)
@@ -2,50 +2,98 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 import uuid
 
 from app.core.config import settings
-from app.core.database import get_session
-from app.modules.auth.models import User
+from app.core.database import get_async_session
+from app.modules.auth.models import User, UserRole
 from app.modules.auth.schemas import TokenPayload
+from app.modules.auth.user_cache import user_cache
 
 # Указываем FastAPI, где искать токен (в заголовке Authorization: Bearer ...)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/access-token")
 
-def get_current_user(
+credentials_exception = HTTPException(
+	status_code=status.HTTP_401_UNAUTHORIZED,
+	detail="Не удалось подтвердить учетные данные",
+	headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+def decode_token(token: str) -> TokenPayload:
+	"""Проверяет подпись и срок действия токена. Если что-то не так — 401."""
+	try:
+		# Декодируем токен с помощью Секретного Ключа
+		payload = jwt.decode(
+			token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM]
+		)
+		token_data = TokenPayload(**payload)
+		if token_data.sub is None:
+			raise credentials_exception
+
+		return token_data
+
+	except (JWTError, ValueError):
+		raise credentials_exception
+
+
+async def get_current_user(
 		token: str = Depends(oauth2_scheme),
-		session: Session = Depends(get_session)
+		session: AsyncSession = Depends(get_async_session)
 ) -> User:
 	"""
-	Валидирует токен, декодирует его, ищет пользователя в БД.
+	Валидирует токен, декодирует его, ищет пользователя.
+	Сначала в кэше снимков, в БД — только при промахе.
 	Если что-то не так — кидает 401 ошибку.
 	"""
-	credentials_exception = HTTPException(
-		status_code=status.HTTP_401_UNAUTHORIZED,
-		detail="Не удалось подтвердить учетные данные",
-		headers={"WWW-Authenticate": "Bearer"},
-	)
-	
+	token_data = decode_token(token)
+
 	try:
-		# 1. Декодируем токен с помощью Секретного Ключа
-		payload = jwt.decode(
-			token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM]
-		)
-		user_id: str = payload.get("sub")
-		print(payload)
-		if user_id is None:
-			raise credentials_exception
-		
-		token_data = TokenPayload(sub=user_id)
-	
-	except JWTError:
+		user_id = uuid.UUID(token_data.sub)
+	except ValueError:
 		raise credentials_exception
-	
-	# 2. Ищем пользователя в базе
-	user = session.get(User, uuid.UUID(token_data.sub))
-	
+
+	user = user_cache.get(user_id)
+	if user is not None:
+		return user
+
+	# Промах кэша: ищем пользователя в базе
+	user = await session.get(User, user_id)
+
 	if user is None:
 		raise credentials_exception
-	
-	return user
\ No newline at end of file
+
+	if not user.is_active:
+		raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Пользователь деактивирован")
+
+	user_cache.set(user)
+	return user
+
+
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+	"""Служебные ручки (загрузка курсов и т.п.): только роль ADMIN, остальным 403."""
+	if current_user.role != UserRole.ADMIN:
+		raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
+	return current_user
+
+
+async def get_current_user_readonly(
+		token: str = Depends(oauth2_scheme),
+		session: AsyncSession = Depends(get_async_session)
+) -> User:
+	"""
+	Вариант для read-only ручек. При AUTH_TRUST_TOKEN_CLAIMS=True пользователь
+	собирается из подписанных claims токена без обращения к БД и кэшу,
+	иначе работает как get_current_user.
+	"""
+	if not settings.AUTH_TRUST_TOKEN_CLAIMS:
+		return await get_current_user(token, session)
+
+	token_data = decode_token(token)
+	try:
+		user_id = uuid.UUID(token_data.sub)
+	except ValueError:
+		raise credentials_exception
+
+	return User(id=user_id, role=token_data.role or UserRole.USER)
@@ -1,12 +1,13 @@
 # app/modules/auth/router.py
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_session  # Твоя функция подключения к БД
+from app.core.database import get_async_session  # Твоя функция подключения к БД
 from app.core.security import create_access_token
-from app.modules.auth.models import UserRole, UserLanguage
-from app.modules.auth.schemas import Token, LoginRequest
+from app.modules.auth.dependencies import get_current_user
+from app.modules.auth.models import User, UserRole, UserLanguage
+from app.modules.auth.schemas import Token, LoginRequest, PasswordChangeRequest
 from app.modules.auth.schemas import UserRead, UserCreate
 from app.modules.auth.service import AuthService
 from app.modules.finance.models import WalletType, TransactionType, CategoryType
@@ -16,13 +17,13 @@ router = APIRouter()
 
 
 # Вспомогательная функция, чтобы не создавать AuthService в каждой ручке руками
-def get_auth_service(session: Session = Depends(get_session)):
+def get_auth_service(session: AsyncSession = Depends(get_async_session)):
 	return AuthService(session)
 
 
 # 1. РЕГИСТРАЦИЯ
 @router.post("/register", response_model=UserRead, status_code=201)
-def register(
+async def register(
 		user_in: UserCreate,
 		service: AuthService = Depends(get_auth_service)
 ):
@@ -31,19 +32,19 @@ def register(
 	Принимает: phone_number, password (сырой)
 	Возвращает: UserRead (без пароля)
 	"""
-	return service.create_user(user_in)
+	return await service.create_user(user_in)
 
 
 # 2. ЛОГИН
 @router.post("/login", response_model=Token)
-def login(
+async def login(
 		login_data: LoginRequest,  # Валидация телефона (schema)
 		service: AuthService = Depends(get_auth_service)
 ):
 	"""
 	Проверяет пароль и выдает JWT токен.
 	"""
-	user = service.authenticate(login_data.phone_number, login_data.password)
+	user = await service.authenticate(login_data.phone_number, login_data.password)
 	
 	if not user:
 		raise HTTPException(
@@ -53,13 +54,13 @@ def login(
 		)
 	
 	# Если всё ок — генерируем токен
-	access_token = create_access_token(data={"sub": str(user.id)})
+	access_token = create_access_token(data={"sub": str(user.id), "role": user.role.value})
 	
 	return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/access-token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
 		form_data: OAuth2PasswordRequestForm = Depends(),
 		service: AuthService = Depends(get_auth_service)
 ):
@@ -68,7 +69,7 @@ def login_for_access_token(
 	Принимает username и password в виде формы (не JSON).
 	"""
 	# Swagger отправляет поле 'username', но мы знаем, что там лежит номер телефона
-	user = service.authenticate(form_data.username, form_data.password)
+	user = await service.authenticate(form_data.username, form_data.password)
 	
 	if not user:
 		raise HTTPException(
@@ -77,10 +78,22 @@ def login_for_access_token(
 			headers={"WWW-Authenticate": "Bearer"},
 		)
 	
-	access_token = create_access_token(data={"sub": str(user.id)})
+	access_token = create_access_token(data={"sub": str(user.id), "role": user.role.value})
 	return {"access_token": access_token, "token_type": "bearer"}
 
 
+@router.post("/change-password", status_code=204)
+async def change_password(
+		password_in: PasswordChangeRequest,
+		current_user: User = Depends(get_current_user),
+		service: AuthService = Depends(get_auth_service)
+):
+	"""
+	Меняет пароль текущего пользователя (нужен текущий пароль).
+	"""
+	await service.change_password(current_user.id, password_in.current_password, password_in.new_password)
+
+
 @router.get("/reference/constants")
 def get_constants():
 	return {
@@ -41,6 +41,7 @@ class Token(BaseModel):
 # 2. Схема содержимого токена (то, что мы расшифровываем из JWT)
 class TokenPayload(BaseModel):
 	sub: Optional[str] = None  # В sub обычно кладем ID пользователя
+	role: Optional[UserRole] = None  # Нужна read-only ручкам, которые верят claims
 
 
 # 3. Схема для входа в систему (Login)
@@ -1,47 +1,79 @@
 # app/modules/auth/service.py
-from sqlmodel import Session, select
+import uuid
+from typing import Optional
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException
 from app.modules.auth.models import User
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash_async, verify_password_async
 from app.modules.auth.schemas import UserCreate
+from app.modules.auth.user_cache import user_cache
 
 
 class AuthService:
-	def __init__(self, session: Session):
+	"""
+	Методы асинхронные: bcrypt уходит в выделенный пул (security.*_async),
+	запросы к БД идут через AsyncSession — event loop не блокируется.
+	"""
+
+	def __init__(self, session: AsyncSession):
 		self.session = session
-	
+
 	# ЛОГИКА РЕГИСТРАЦИИ
-	def create_user(self, user_in: UserCreate) -> User:
+	async def create_user(self, user_in: UserCreate) -> User:
 		# 1. Проверяем, занят ли телефон
-		query = select(User).where(User.phone_number == user_in.phone_number)
-		existing_user = self.session.exec(query).first()
+		existing_user = await self._get_by_phone(user_in.phone_number)
 		if existing_user:
 			raise HTTPException(
 				status_code=400,
 				detail="Пользователь с таким номером уже существует"
 			)
-		
+
 		# 2. Хешируем пароль
-		hashed_pw = get_password_hash(user_in.password)
-		
+		hashed_pw = await get_password_hash_async(user_in.password)
+
 		# 3. Создаем объект User (но пароль подменяем на хеш)
 		# exclude={"password"} убирает сырой пароль из данных
 		db_user = User.model_validate(user_in, update={"hashed_password": hashed_pw})
-		
+
 		# 4. Сохраняем
-		self.session.add(db_user)
-		self.session.commit()
-		self.session.refresh(db_user)
-		return db_user
-	
+		return await self._save(db_user)
+
 	# ЛОГИКА ВХОДА
-	def authenticate(self, phone: str, password: str) -> User:
+	async def authenticate(self, phone: str, password: str) -> Optional[User]:
 		# 1. Ищем юзера
-		query = select(User).where(User.phone_number == phone)
-		user = self.session.exec(query).first()
-		
+		user = await self._get_by_phone(phone)
+
 		# 2. Если нет юзера ИЛИ пароль не подошел
-		if not user or not verify_password(password, user.hashed_password):
+		if not user or not await verify_password_async(password, user.hashed_password):
 			return None
-		
-		return user
\ No newline at end of file
+
+		return user
+
+	# СМЕНА ПАРОЛЯ
+	async def change_password(self, user_id: uuid.UUID, current_password: str, new_password: str) -> User:
+		user = await self.session.get(User, user_id)
+		if not user or not await verify_password_async(current_password, user.hashed_password):
+			raise HTTPException(status_code=400, detail="Неверный текущий пароль")
+
+		user.hashed_password = await get_password_hash_async(new_password)
+		user = await self._save(user)
+
+		# Снимок пользователя в кэше больше не актуален
+		user_cache.invalidate(user.id)
+		return user
+
+	# =========================================================================
+	# PRIVATE HELPERS
+	# =========================================================================
+
+	async def _get_by_phone(self, phone: str) -> Optional[User]:
+		query = select(User).where(User.phone_number == phone)
+		return (await self.session.exec(query)).first()
+
+	async def _save(self, user: User) -> User:
+		self.session.add(user)
+		await self.session.commit()
+		await self.session.refresh(user)
+		return user
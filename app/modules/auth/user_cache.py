@@ -0,0 +1,72 @@
+# app/modules/auth/user_cache.py
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.modules.auth.models import User
+
+# Пароль в кэше не держим: для авторизации запросов он не нужен
+_SNAPSHOT_EXCLUDE = {"hashed_password"}
+
+
+class UserCache:
+	"""
+	TTL + LRU кэш снимков активных пользователей по user_id.
+	Кэш живет в памяти процесса: при нескольких воркерах устаревание
+	ограничено TTL, а в текущем процессе — явной инвалидацией.
+	"""
+	
+	def __init__(self, ttl_seconds: int, maxsize: int):
+		self.ttl_seconds = ttl_seconds
+		self.maxsize = maxsize
+		self._items: "OrderedDict[uuid.UUID, tuple[float, dict]]" = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+	
+	def get(self, user_id: uuid.UUID) -> Optional[User]:
+		with self._lock:
+			item = self._items.get(user_id)
+			if item is None or item[0] < time.monotonic():
+				if item is not None:
+					del self._items[user_id]
+				self.misses += 1
+				return None
+			
+			self._items.move_to_end(user_id)
+			self.hits += 1
+			snapshot = item[1]
+		
+		# Каждому запросу — свой отсоединенный от сессии объект
+		return User(**snapshot)
+	
+	def set(self, user: User) -> None:
+		snapshot = user.model_dump(exclude=_SNAPSHOT_EXCLUDE)
+		expires_at = time.monotonic() + self.ttl_seconds
+		with self._lock:
+			self._items[user.id] = (expires_at, snapshot)
+			self._items.move_to_end(user.id)
+			while len(self._items) > self.maxsize:
+				self._items.popitem(last=False)
+	
+	def invalidate(self, user_id: uuid.UUID) -> None:
+		"""Вызывать при смене is_active, role или пароля пользователя."""
+		with self._lock:
+			self._items.pop(user_id, None)
+	
+	def clear(self) -> None:
+		with self._lock:
+			self._items.clear()
+	
+	def stats(self) -> dict:
+		with self._lock:
+			return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache(
+	ttl_seconds=settings.AUTH_USER_CACHE_TTL_SECONDS,
+	maxsize=settings.AUTH_USER_CACHE_MAXSIZE,
+)
@@ -1,4 +1,5 @@
 # app/modules/finance/admin.py
+from sqlalchemy.orm import joinedload
 from starlette_admin.contrib.sqla import ModelView
 from starlette_admin.fields import (
 	StringField,
@@ -11,7 +12,9 @@ from starlette_admin.fields import (
 	HasMany,
 	TextAreaField
 )
-from app.modules.finance.models import WalletType, TransactionType, CategoryType
+from app.modules.finance.models import Wallet, WalletType, TransactionType, CategoryType
+from app.modules.finance.services.category_cache import category_cache
+from app.modules.finance.services.rate_cache import rate_cache
 
 
 class CurrencyAdmin(ModelView):
@@ -33,6 +36,16 @@ class CurrencyRateAdmin(ModelView):
 	]
 	sortable_fields = ["date"]
 	page_size = 20
+	
+	# Ручная правка курсов должна сбрасывать кэш курсов
+	async def after_create(self, request, obj):
+		rate_cache.invalidate()
+	
+	async def after_edit(self, request, obj):
+		rate_cache.invalidate()
+	
+	async def after_delete(self, request, obj):
+		rate_cache.invalidate()
 
 
 class CategoryAdmin(ModelView):
@@ -48,6 +61,16 @@ class CategoryAdmin(ModelView):
 	]
 	searchable_fields = ["name"]
 	sortable_fields = ['user']
+	
+	# Правка из админки может задеть любые деревья (системные категории — у всех)
+	async def after_create(self, request, obj):
+		category_cache.bump_system()
+	
+	async def after_edit(self, request, obj):
+		category_cache.bump_system()
+	
+	async def after_delete(self, request, obj):
+		category_cache.bump_system()
 
 
 class WalletAdmin(ModelView):
@@ -62,6 +85,14 @@ class WalletAdmin(ModelView):
 	]
 	searchable_fields = ["name", "user.phone_number"]
 	list_per_page = 20
+	
+	def get_list_query(self, request):
+		# Владелец и валюта приходят одним JOIN вместе со страницей кошельков,
+		# а не отдельным запросом на каждую строку
+		return super().get_list_query(request).options(
+			joinedload(Wallet.user),
+			joinedload(Wallet.currency_rel),
+		)
 
 
 class TransactionAdmin(ModelView):
@@ -5,7 +5,7 @@ from enum import Enum
 from typing import Optional, List
 
 from pydantic import ConfigDict
-from sqlalchemy import Column, DateTime, func  # Для точной настройки поля в БД
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Index, func, text  # Для точной настройки поля в БД
 from sqlmodel import SQLModel, Field, Relationship
 from starlette.requests import Request
 
@@ -59,6 +59,18 @@ class Currency(SQLModel, table=True):
 class CurrencyRate(SQLModel, table=True):
 	__tablename__ = "currency_rates"
 	
+	# Один курс на валюту в день. Порядок (currency_id, date DESC) + INCLUDE (rate)
+	# позволяет брать "последний курс на дату" index-only сканом без сортировки.
+	__table_args__ = (
+		Index(
+			"ux_currency_rates_currency_id_date",
+			"currency_id",
+			text("date DESC"),
+			unique=True,
+			postgresql_include=["rate"],
+		),
+	)
+	
 	id: Optional[int] = Field(default=None, primary_key=True)
 	currency_id: int = Field(foreign_key="currencies.id")
 	rate: Decimal = Field(default=0, decimal_places=6, max_digits=20)
@@ -83,7 +95,8 @@ class Category(SQLModel, table=True):
 	type: CategoryType = Field(default=CategoryType.EXPENSE)
 	icon_slug: Optional[str] = Field(default=None, description="Название иконки для фронта")
 	
-	parent_id: Optional[int] = Field(default=None, foreign_key="categories.id")
+	# Индекс — для рекурсивного обхода поддерева (analytics: WHERE parent_id = ...)
+	parent_id: Optional[int] = Field(default=None, foreign_key="categories.id", index=True)
 	parent: Optional["Category"] = Relationship(
 		back_populates="children",
 		sa_relationship_kwargs={"remote_side": "Category.id"}
@@ -141,6 +154,17 @@ class Wallet(SQLModel, table=True):
 class Transaction(SQLModel, table=True):
 	__tablename__ = "transactions"
 	
+	# Keyset-пагинация истории: WHERE wallet_id = ? AND (created_at, id) < (?, ?)
+	# ORDER BY created_at DESC, id DESC идет ровно по этому индексу
+	__table_args__ = (
+		Index(
+			"ix_transactions_wallet_id_created_at_id",
+			"wallet_id",
+			text("created_at DESC"),
+			text("id DESC"),
+		),
+	)
+	
 	id: Optional[int] = Field(default=None, primary_key=True)
 	
 	wallet_id: int = Field(foreign_key="wallets.id")
@@ -194,3 +218,61 @@ class Transaction(SQLModel, table=True):
 			f"<small class='text-muted'>{date_str}</small>"
 			f"</div>"
 		)
+
+
+class MonthlyAggregate(SQLModel, table=True):
+	"""
+	Свертка операций по (пользователь, кошелек, месяц, тип, категория).
+	Производная таблица: ее ведет TransactionService в той же транзакции БД,
+	что и сами операции, а пересобирает команда app.commands.rebuild_monthly_aggregates.
+	"""
+	__tablename__ = "monthly_aggregates"
+	
+	user_id: uuid.UUID = Field(foreign_key="users.id", primary_key=True)
+	# Свертка удаляется вместе с кошельком: строки с count = 0 остаются и после удаления операций
+	wallet_id: int = Field(
+		sa_column=Column(ForeignKey("wallets.id", ondelete="CASCADE"), primary_key=True)
+	)
+	month: date_type = Field(primary_key=True, description="Первое число месяца")
+	type: TransactionType = Field(primary_key=True)
+	# 0 — операции без категории: NULL в ключе сломал бы ON CONFLICT
+	category_id: int = Field(default=0, primary_key=True)
+	
+	total: Decimal = Field(default=0, decimal_places=2, max_digits=20)
+	count: int = Field(default=0)
+
+
+class IdempotencyKey(SQLModel, table=True):
+	"""
+	Ответ на POST с заголовком Idempotency-Key. Повтор с тем же ключом получает
+	сохраненный ответ, не трогая кошельки. Ключи живут IDEMPOTENCY_KEY_TTL_HOURS.
+	"""
+	__tablename__ = "idempotency_keys"
+	
+	# Ключ уникален в пределах пользователя: PK и есть индекс для поиска
+	user_id: uuid.UUID = Field(foreign_key="users.id", primary_key=True)
+	key: str = Field(primary_key=True, max_length=255)
+	
+	request_hash: str = Field(max_length=64)  # sha256 тела запроса: тот же ключ с другими данными — ошибка
+	# Без FK: операцию можно удалить, а ответ на повтор остается прежним
+	transaction_id: Optional[int] = Field(default=None)
+	response_body: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+	
+	expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False, index=True))
+
+
+# --- Снимки баланса кошелька ---
+class BalanceSnapshot(SQLModel, table=True):
+	"""
+	Баланс кошелька на момент taken_at с учетом всех операций с created_at <= taken_at.
+	Баланс на любой момент = ближайший снимок + сумма операций между ними
+	(services/balance_ledger.py). Снимки делает reconcile_balances; правка/удаление
+	старой операции удаляет снимки кошелька начиная с ее даты.
+	"""
+	__tablename__ = "balance_snapshots"
+	
+	wallet_id: int = Field(
+		sa_column=Column(ForeignKey("wallets.id", ondelete="CASCADE"), primary_key=True)
+	)
+	taken_at: datetime = Field(sa_column=Column(DateTime(timezone=True), primary_key=True))
+	balance: Decimal = Field(default=0, decimal_places=2, max_digits=20)
@@ -1,10 +1,14 @@
+import hashlib
+import json
 from typing import List, Dict
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, or_
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlmodel import select, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_session
-from app.modules.auth.dependencies import get_current_user
+from app.core.database import get_async_session
+from app.modules.auth.dependencies import get_current_user, get_current_user_readonly
 from app.modules.auth.models import User
 from app.modules.finance.models import (
 	Category
@@ -12,23 +16,41 @@ from app.modules.finance.models import (
 from app.modules.finance.schemas import (
 	CategoryCreate, CategoryRead, CategoryUpdate,
 )
+from app.modules.finance.services.category_cache import CachedTree, category_cache
 
 router = APIRouter()
 
 
+def _to_read(c: Category) -> CategoryRead:
+	"""
+	Схема без связей: список children принудительно пустой.
+	Это важно, чтобы Pydantic не подтянул старые связи из SQLAlchemy
+	(в async-сессии ленивая загрузка вообще невозможна).
+	"""
+	return CategoryRead(
+		id=c.id,
+		name=c.name,
+		type=c.type,
+		icon_slug=c.icon_slug,
+		parent_id=c.parent_id,
+		user_id=c.user_id,
+		children=[]  # Инициализируем пустым списком
+	)
+
+
 @router.post("", response_model=CategoryRead, summary="Создать категорию")
-def create_category(
+async def create_category(
 		category_in: CategoryCreate,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)  # Требуем авторизацию
 ):
-	existing = session.exec(
+	existing = (await session.exec(
 		select(Category).where(
 			Category.name == category_in.name,
 			Category.parent_id == category_in.parent_id,
 			or_(Category.user_id == current_user.id, Category.user_id == None)
 		)
-	).first()
+	)).first()
 	
 	if existing:
 		raise HTTPException(status_code=400, detail="Категория с таким именем уже существует")
@@ -40,49 +62,58 @@ def create_category(
 	
 	# 2. Проверка parent_id (если указан, должен быть доступен юзеру)
 	if category_data.get("parent_id"):
-		parent = session.get(Category, category_data["parent_id"])
+		parent = await session.get(Category, category_data["parent_id"])
 		if not parent or (parent.user_id and parent.user_id != current_user.id):
 			raise HTTPException(status_code=400, detail="Родительская категория не найдена")
 	
 	category = Category(**category_data)
 	session.add(category)
-	session.commit()
-	session.refresh(category)
-	return category
+	await session.commit()
+	await session.refresh(category)
+	category_cache.bump_user(current_user.id)
+	return _to_read(category)
 
 
 @router.get("", response_model=List[CategoryRead], summary="Список всех категорий деревом")
-def get_categories(
-		session: Session = Depends(get_session),
-		current_user: User = Depends(get_current_user)
+async def get_categories(
+		request: Request,
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user_readonly)
 ):
-	# 1. Получаем из базы плоский список ТОЛЬКО разрешенных категорий
-	# Это единственный запрос к БД.
-	statement = select(Category).where(
-		or_(
-			Category.user_id == current_user.id,
-			Category.user_id == None
-		)
-	)
-	all_allowed_db = session.exec(statement).all()
-	
-	# 2. Создаем словарь схем, принудительно ОБНУЛЯЯ список children.
-	# Это важно, чтобы Pydantic не подтянул старые связи из SQLAlchemy
-	category_map: Dict[int, CategoryRead] = {}
-	for c in all_allowed_db:
-		category_map[c.id] = CategoryRead(
-			id=c.id,
-			name=c.name,
-			type=c.type,
-			icon_slug=c.icon_slug,
-			parent_id=c.parent_id,
-			user_id=c.user_id,
-			children=[]  # Инициализируем пустым списком
-		)
+	"""
+	Дерево отдается из кэша (системные категории общие, дерево — на пользователя).
+	ETag — хэш тела: если у клиента та же версия (If-None-Match), отвечаем 304 без тела.
+	"""
+	tree = category_cache.get_tree(current_user.id)
+	if tree is None:
+		tree = await _load_tree(session, current_user.id)
+	
+	headers = {"ETag": tree.etag, "Cache-Control": "private, no-cache"}
+	if tree.etag in _parse_if_none_match(request.headers.get("if-none-match")):
+		return Response(status_code=304, headers=headers)
+	return Response(content=tree.body, media_type="application/json", headers=headers)
+
+
+async def _load_tree(session: AsyncSession, user_id) -> CachedTree:
+	versions = category_cache.versions(user_id)
+	
+	# 1. Системные категории — из общего кэша, в БД только при промахе
+	system = category_cache.get_system()
+	if system is None:
+		rows = (await session.exec(select(Category).where(Category.user_id == None))).all()
+		system = [_to_read(c).model_dump() for c in rows]
+		category_cache.set_system(versions[0], system)
+	
+	# 2. Категории пользователя
+	own = (await session.exec(select(Category).where(Category.user_id == user_id))).all()
+	
+	# 3. Создаем словарь схем (свежие объекты: общий список системных не трогаем)
+	category_map: Dict[int, CategoryRead] = {c["id"]: CategoryRead(**{**c, "children": []}) for c in system}
+	category_map.update({c.id: _to_read(c) for c in own})
 	
 	tree: List[CategoryRead] = []
 	
-	# 3. Собираем дерево вручную
+	# 4. Собираем дерево вручную
 	for cat in category_map.values():
 		if cat.parent_id is None:
 			# Если нет родителя — это корень
@@ -95,17 +126,27 @@ def get_categories(
 			# Если parent_id есть, но родителя нет в словаре (он чужой),
 			# то категория просто проигнорируется и не попадет в ответ.
 	
-	return tree
+	body = json.dumps(jsonable_encoder(tree), ensure_ascii=False, separators=(",", ":")).encode()
+	cached = CachedTree(etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', body=body)
+	category_cache.set_tree(user_id, versions, cached)
+	return cached
+
+
+def _parse_if_none_match(value) -> set:
+	if not value:
+		return set()
+	# Слабые ETag (W/"...") сравниваем как сильные — тело у нас детерминированное
+	return {tag.strip().removeprefix("W/") for tag in value.split(",")}
 
 
 @router.patch("/{category_id}", response_model=CategoryRead)
-def update_category(
+async def update_category(
 		category_id: int,
 		category_in: CategoryUpdate,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
-	db_category = session.get(Category, category_id)
+	db_category = await session.get(Category, category_id)
 	if not db_category:
 		raise HTTPException(status_code=404, detail="Категория не найдена")
 	
@@ -122,18 +163,19 @@ def update_category(
 		setattr(db_category, key, value)
 	
 	session.add(db_category)
-	session.commit()
-	session.refresh(db_category)
-	return db_category
+	await session.commit()
+	await session.refresh(db_category)
+	category_cache.bump_user(current_user.id)
+	return _to_read(db_category)
 
 
 @router.delete("/{category_id}")
-def delete_category(
+async def delete_category(
 		category_id: int,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
-	db_category = session.get(Category, category_id)
+	db_category = await session.get(Category, category_id)
 	if not db_category:
 		raise HTTPException(status_code=404, detail="Категория не найдена")
 	
@@ -143,6 +185,7 @@ def delete_category(
 	if db_category.user_id != current_user.id:
 		raise HTTPException(status_code=403, detail="Доступ запрещен")
 	
-	session.delete(db_category)
-	session.commit()
+	await session.delete(db_category)
+	await session.commit()
+	category_cache.bump_user(current_user.id)
 	return {"ok": True}
@@ -2,10 +2,15 @@ from datetime import date
 from decimal import Decimal
 from typing import List
 
+import httpx
 from fastapi import Depends, HTTPException, APIRouter
-from sqlmodel import Session, select
+from sqlalchemy import true
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_session
+from app.core.database import get_async_session
+from app.modules.auth.dependencies import get_current_admin
+from app.modules.auth.models import User
 from app.modules.finance.models import (
 	Currency, CurrencyRate,
 )
@@ -18,9 +23,12 @@ from app.modules.finance.services.currency_parser import CurrencyClient
 
 router = APIRouter()
 
+# Ограничение на один запрос бэкфилла через API (для больших периодов есть CLI)
+MAX_BACKFILL_DAYS = 366
+
 
 @router.post("/refresh-currency")
-async def refresh_currency_rates(session: Session = Depends(get_session)):
+async def refresh_currency_rates(session: AsyncSession = Depends(get_async_session)):
 	"""Обновляет курсы с сайта ЦБ"""
 	client = CurrencyClient()
 	try:
@@ -29,29 +37,61 @@ async def refresh_currency_rates(session: Session = Depends(get_session)):
 		raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/backfill-currency")
+async def backfill_currency_rates(
+		date_from: date,
+		date_to: date,
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_admin),
+):
+	"""
+	Догружает исторические курсы ЦБ за период (например, для импорта старых операций).
+	До MAX_BACKFILL_DAYS запросов к cbu.uz за вызов — только для администратора.
+	"""
+	if date_from > date_to:
+		raise HTTPException(status_code=400, detail="Дата начала больше даты окончания")
+	if (date_to - date_from).days >= MAX_BACKFILL_DAYS:
+		raise HTTPException(status_code=400, detail=f"Период не может быть больше {MAX_BACKFILL_DAYS} дней")
+	
+	async with httpx.AsyncClient(timeout=30) as http:
+		client = CurrencyClient(client=http)
+		try:
+			return await client.backfill_rates(session, date_from, date_to)
+		except Exception as e:
+			raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/latest-currency", response_model=List[CurrencyRateResponse])
-def get_latest_rates(session: Session = Depends(get_session)):
+async def get_latest_rates(session: AsyncSession = Depends(get_async_session)):
 	"""Берет строго последние курсы для каждой валюты"""
 	
-	# 1. Запрос курсов (Distinct on currency_id, сортировка по дате desc)
+	# 1. Для каждой валюты берем одну строку через LATERAL + LIMIT 1.
+	# Каждый подзапрос — короткий index-only скан по (currency_id, date DESC),
+	# поэтому время не растет вместе с историей курсов (в отличие от DISTINCT ON).
+	latest = (
+		select(CurrencyRate.rate, CurrencyRate.date)
+		.where(CurrencyRate.currency_id == Currency.id)
+		.order_by(CurrencyRate.date.desc())
+		.limit(1)
+		.lateral("latest")
+	)
 	stmt = (
-		select(CurrencyRate, Currency)
-		.join(Currency)
-		.distinct(CurrencyRate.currency_id)
-		.order_by(CurrencyRate.currency_id, CurrencyRate.date.desc())
+		select(Currency.char_code, Currency.name, latest.c.rate, latest.c.date)
+		.join(latest, true())
+		.order_by(Currency.id)
 	)
 	
-	results = session.exec(stmt).all()
+	results = (await session.exec(stmt)).all()
 	
 	response_list = []
 	
 	# 2. Формируем ответ
-	for rate_obj, currency_obj in results:
+	for char_code, name, rate, rate_date in results:
 		response_list.append(CurrencyRateResponse(
-			currency=currency_obj.char_code,
-			name=currency_obj.name,
-			rate=rate_obj.rate,  # Это цена за 1 единицу
-			date=rate_obj.date
+			currency=char_code,
+			name=name,
+			rate=rate,  # Это цена за 1 единицу
+			date=rate_date
 		))
 	
 	# 3. Добавляем базовую валюту UZS (которой нет в таблице rates, но она нужна фронту)
@@ -1,100 +1,247 @@
+from datetime import date
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query, status, HTTPException
-from sqlmodel import Session, select, desc
+from fastapi import APIRouter, Depends, Header, Query, Response, status, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_session
-from app.modules.auth.dependencies import get_current_user
+from app.core.database import async_session_maker, get_async_session
+from app.modules.auth.dependencies import get_current_user, get_current_user_readonly
 from app.modules.auth.models import User
-from app.modules.finance.models import Wallet, Transaction
-from app.modules.finance.schemas import TransactionRead, TransactionCreate, TransactionUpdate
+from app.modules.finance.models import TransactionType
+from app.modules.finance.schemas import (
+	TransactionRead, TransactionCreate, TransactionUpdate,
+	TransactionBatchCreate, TransactionBatchItemResult, TransactionBatchResult, CategorySuggestion,
+	SmsImportBatch,
+)
+from app.modules.finance.services.category_classifier import category_classifier
+from app.modules.finance.services.export_service import MEDIA_TYPES, ExportFormat, stream_export
+from app.modules.finance.services.idempotency import IdempotencyService, request_fingerprint
 from app.modules.finance.services.transaction_service import TransactionService
 
 router = APIRouter()
 
 
 @router.post("", response_model=TransactionRead, status_code=status.HTTP_201_CREATED, summary="Добавить операцию")
-def create_transaction(
-    transaction_in: TransactionCreate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+async def create_transaction(
+		transaction_in: TransactionCreate,
+		response: Response,
+		idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user),
 ):
-    service = TransactionService(session)
+	"""
+	С заголовком Idempotency-Key повтор запроса (ретрай клиента по таймауту) не создает
+	вторую операцию, а возвращает первый ответ с заголовком Idempotent-Replayed: true.
+	"""
+	service = TransactionService(session)
+	idempotency = IdempotencyService(session)
+	request_hash = request_fingerprint(transaction_in) if idempotency_key else None
+	# current_user может быть из этой же сессии: после rollback его атрибуты протухают
+	user_id = current_user.id
+
+	try:
+		if idempotency_key:
+			replay = await idempotency.get_response(user_id, idempotency_key, request_hash)
+			if replay is None and not await idempotency.claim(user_id, idempotency_key, request_hash):
+				# Параллельный запрос с тем же ключом успел раньше: берем его ответ
+				await session.rollback()
+				replay = await idempotency.get_response(user_id, idempotency_key, request_hash)
+				if replay is None:
+					raise HTTPException(status_code=409, detail="Запрос с этим Idempotency-Key еще обрабатывается")
+			if replay is not None:
+				response.headers["Idempotent-Replayed"] = "true"
+				return replay
+
+		tx = await service.create_transaction(transaction_in, user_id)
+
+		if idempotency_key:
+			body = TransactionRead.model_validate(tx).model_dump(mode="json")
+			await idempotency.store_response(user_id, idempotency_key, tx.id, body)
+
+		await session.commit()
+		await session.refresh(tx)
+		return tx
+
+	except HTTPException:
+		await session.rollback()
+		raise
+
+	except Exception as e:
+		await session.rollback()
+		raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+
+@router.post("/batch", response_model=TransactionBatchResult, summary="Пакетный импорт операций")
+async def create_transactions_batch(
+		batch_in: TransactionBatchCreate,
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user),
+):
+	"""
+	Для синхронизации СМС/выписок: кошельки блокируются один раз, все строки — одним INSERT.
+	atomic=false — ошибочные операции пропускаются (см. items[].error), остальные сохраняются;
+	atomic=true — при первой ошибке не сохраняется ничего.
+	"""
+	service = TransactionService(session)
+	
+	try:
+		results = await service.create_transactions_batch(batch_in.items, current_user.id, atomic=batch_in.atomic)
+		await session.commit()
+	except HTTPException:
+		await session.rollback()
+		raise
+	except Exception:
+		await session.rollback()
+		raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+	
+	return _batch_result(results)
 
-    try:
-        tx = service.create_transaction(transaction_in, current_user.id)
-        session.commit()
-        session.refresh(tx)
-        return tx
 
-    except HTTPException:
-        session.rollback()
-        raise
+@router.post("/sms", response_model=TransactionBatchResult, summary="Импорт банковских SMS")
+async def import_sms(
+		batch_in: SmsImportBatch,
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user),
+):
+	"""
+	Сырые SMS банков (Uzcard, Humo, Click, Payme, Visa/Mastercard) разбираются на сервере.
+	Сумма в другой валюте пересчитывается в валюту кошелька по курсу; нераспознанные SMS
+	и валюты без курса попадают в items[].error (atomic=true — отменяют весь пакет).
+	"""
+	service = TransactionService(session)
+	
+	try:
+		results = await service.create_transactions_from_sms(batch_in.items, current_user.id, atomic=batch_in.atomic)
+		await session.commit()
+	except HTTPException:
+		await session.rollback()
+		raise
+	except Exception:
+		await session.rollback()
+		raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+	
+	return _batch_result(results)
+
 
-    except Exception as e:
-        session.rollback()
-        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+def _batch_result(results) -> TransactionBatchResult:
+	items = [
+		TransactionBatchItemResult(
+			index=index,
+			ok=tx is not None,
+			transaction=TransactionRead.model_validate(tx) if tx is not None else None,
+			error=error,
+		)
+		for index, (tx, error) in enumerate(results)
+	]
+	created = sum(item.ok for item in items)
+	return TransactionBatchResult(created=created, failed=len(items) - created, items=items)
 
 
 @router.get("/all", response_model=List[TransactionRead], summary="История операций")
-def get_transactions(
+async def get_transactions(
+		response: Response,
 		wallet_id: Optional[int] = None,
+		date_from: Optional[date] = None,
+		date_to: Optional[date] = None,
+		type: Optional[TransactionType] = None,
+		category_id: Optional[int] = None,
+		cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
 		skip: int = 0,
-		limit: int = 20,
-		session: Session = Depends(get_session),
-		current_user: User = Depends(get_current_user)
+		limit: int = Query(20, ge=1, le=500),
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user_readonly)
 ):
-	# Логика выборки простая, её можно оставить в роутере или вынести в `get_all_transactions` метод сервиса
-	query = select(Transaction).join(Wallet).where(Wallet.user_id == current_user.id)
-	
-	if wallet_id:
-		query = query.where(Transaction.wallet_id == wallet_id)
-	
-	query = query.order_by(desc(Transaction.created_at))
-	query = query.offset(skip).limit(limit)
-	
-	return session.exec(query).all()
+	# Тело ответа — прежний список; курсор следующей страницы уходит в заголовке,
+	# чтобы старые клиенты со skip/limit ничего не заметили
+	service = TransactionService(session)
+	items, next_cursor = await service.list_transactions(
+		current_user.id,
+		wallet_id=wallet_id,
+		date_from=date_from,
+		date_to=date_to,
+		tx_type=type,
+		category_id=category_id,
+		cursor=cursor,
+		skip=skip,
+		limit=limit,
+	)
+	if next_cursor:
+		response.headers["X-Next-Cursor"] = next_cursor
+	return items
+
+
+@router.get("/export", summary="Выгрузка всех операций (CSV / NDJSON / XLSX)")
+async def export_transactions(
+		format: ExportFormat = ExportFormat.CSV,
+		current_user: User = Depends(get_current_user_readonly)
+):
+	"""
+	Отдает всю историю потоком: строки читаются серверным курсором пачками
+	и сразу уходят клиенту, память не растет с числом операций.
+	"""
+	filename = f"transactions.{format.value}"
+	return StreamingResponse(
+		stream_export(async_session_maker, current_user.id, format),
+		media_type=MEDIA_TYPES[format],
+		headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+	)
+
+
+@router.get("/suggest-category", response_model=CategorySuggestion, summary="Подсказать категорию по описанию")
+async def suggest_category(
+		description: str = Query(..., min_length=1, max_length=255),
+		type: TransactionType = TransactionType.EXPENSE,
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user_readonly)
+):
+	"""
+	Та же подсказка, что подставляется при создании операции без category_id:
+	сначала по истории пользователя, затем по выбору всех пользователей.
+	"""
+	await category_classifier.ensure_user(session, current_user.id)
+	return CategorySuggestion(category_id=category_classifier.suggest(current_user.id, type, description))
 
 
 @router.get("/{transaction_id}", response_model=TransactionRead, summary="Детали операции")
-def get_transaction(
+async def get_transaction(
 		transaction_id: int,
-		session: Session = Depends(get_session),
-		current_user: User = Depends(get_current_user)
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user_readonly)
 ):
 	service = TransactionService(session)
-	return service.get_transaction_or_404(transaction_id, current_user.id)
+	return await service.get_transaction_or_404(transaction_id, current_user.id)
 
 
 @router.put("/{transaction_id}", response_model=TransactionRead, summary="Обновить операцию (полностью)")
-def update_transaction_put(
+async def update_transaction_put(
 		transaction_id: int,
 		transaction_in: TransactionUpdate,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
 	service = TransactionService(session)
-	return service.update_transaction(transaction_id, transaction_in, current_user.id)
+	return await service.update_transaction(transaction_id, transaction_in, current_user.id)
 
 
 @router.patch("/{transaction_id}", response_model=TransactionRead, summary="Обновить операцию (частично)")
-def update_transaction_patch(
+async def update_transaction_patch(
 		transaction_id: int,
 		transaction_in: TransactionUpdate,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
 	service = TransactionService(session)
 	# В Pydantic v2 используем exclude_unset при создании модели или внутри сервиса
 	# Сервис уже обрабатывает exclude_unset внутри, передаем как есть
-	return service.update_transaction(transaction_id, transaction_in, current_user.id)
+	return await service.update_transaction(transaction_id, transaction_in, current_user.id)
 
 
 @router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Удалить операцию")
-def delete_transaction(
+async def delete_transaction(
 		transaction_id: int,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
 	service = TransactionService(session)
-	service.delete_transaction(transaction_id, current_user.id)
+	await service.delete_transaction(transaction_id, current_user.id)
 	return {"ok": True, "detail": "Transaction deleted and balance reverted"}
\ No newline at end of file
@@ -1,11 +1,11 @@
-from decimal import Decimal
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_session
-from app.modules.auth.dependencies import get_current_user
+from app.core.database import get_async_session
+from app.modules.auth.dependencies import get_current_user, get_current_user_readonly
 from app.modules.auth.models import User
 from app.modules.finance.models import Wallet, Currency
 from app.modules.finance.schemas import WalletCreate, WalletRead
@@ -16,62 +16,58 @@ from app.modules.finance.schemas import WalletCreate, WalletRead
 router = APIRouter()
 
 
+def _wallet_read_query():
+	"""
+	Один JOIN с валютой и проекция сразу в поля WalletRead:
+	ни ORM-объектов, ни отдельных запросов за валютой на каждый кошелек.
+	"""
+	return (
+		select(
+			Wallet.id,
+			Wallet.name,
+			Wallet.type,
+			Wallet.balance,
+			Wallet.user_id,
+			func.coalesce(Currency.char_code, "UNKNOWN").label("currency_code"),
+		)
+		.outerjoin(Currency, Currency.id == Wallet.currency_id)
+	)
+
+
 @router.get("/all", response_model=List[WalletRead], summary="Мои кошельки")
-def get_my_wallets(
-		session: Session = Depends(get_session),
-		current_user: User = Depends(get_current_user)
+async def get_my_wallets(
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user_readonly)
 ):
 	# Показываем только кошельки текущего пользователя
-	statement = select(Wallet).where(Wallet.user_id == current_user.id)
-	wallets = session.exec(statement).all()
-	
-	response = []
-	for w in wallets:
-		# Для каждого кошелька берем код валюты через связь currency_rel
-		# w.currency_rel.char_code автоматически сделает запрос в БД, если данные не подгружены
-		code = w.currency_rel.char_code if w.currency_rel else "UNKNOWN"
-		
-		response.append(WalletRead(
-			id=w.id,
-			name=w.name,
-			type=w.type,
-			balance=Decimal(w.balance),
-			user_id=w.user_id,
-			currency_code=code  # <--- Заполняем поле
-		))
-	return response
+	statement = _wallet_read_query().where(Wallet.user_id == current_user.id).order_by(Wallet.id)
+	rows = (await session.exec(statement)).all()
+	return [WalletRead(**row._mapping) for row in rows]
 
 
 @router.get("/{wallet_id}", response_model=WalletRead)
-def get_wallet_detail(
+async def get_wallet_detail(
 		wallet_id: int,
-		session: Session = Depends(get_session),
-		current_user: User = Depends(get_current_user)
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user_readonly)
 ):
-	wallet = session.get(Wallet, wallet_id)
-	if not wallet or wallet.user_id != current_user.id:
+	statement = _wallet_read_query().where(Wallet.id == wallet_id, Wallet.user_id == current_user.id)
+	row = (await session.exec(statement)).first()
+	if not row:
 		raise HTTPException(status_code=404, detail="Кошелек не найден")
 	
-	code = wallet.currency_rel.char_code if wallet.currency_rel else "UNKNOWN"
-	return WalletRead(
-		id=wallet.id,
-		name=wallet.name,
-		type=wallet.type,
-		balance=wallet.balance,
-		user_id=wallet.user_id,
-		currency_code=code
-	)
+	return WalletRead(**row._mapping)
 
 
 @router.post("", response_model=WalletRead, status_code=201, summary="Создать кошелек")
-def create_wallet(
+async def create_wallet(
 		wallet_in: WalletCreate,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
 	# 1. Проверяем валюту
 	statement = select(Currency).where(Currency.char_code == wallet_in.currency_code)
-	currency = session.exec(statement).first()
+	currency = (await session.exec(statement)).first()
 	if not currency:
 		raise HTTPException(status_code=404, detail=f"Валюта '{wallet_in.currency_code}' не найдена")
 	
@@ -84,8 +80,8 @@ def create_wallet(
 		user_id=current_user.id
 	)
 	session.add(wallet)
-	session.commit()
-	session.refresh(wallet)
+	await session.commit()
+	await session.refresh(wallet)
 	return WalletRead(
 		id=wallet.id,
 		name=wallet.name,
@@ -97,13 +93,13 @@ def create_wallet(
 
 
 @router.delete("/{wallet_id}", summary="Delete wallet")
-def delete_wallet(wallet_id: int,
-                  session: Session = Depends(get_session),
+async def delete_wallet(wallet_id: int,
+                  session: AsyncSession = Depends(get_async_session),
                   current_user: User = Depends(get_current_user)
                  ):
-	wallet = session.get(Wallet, wallet_id)
+	wallet = await session.get(Wallet, wallet_id)
 	if not wallet or wallet.user_id != current_user.id:
 		raise HTTPException(status_code=404, detail="Кошелек не найден")
 	
-	session.delete(wallet)
-	session.commit()
\ No newline at end of file
+	await session.delete(wallet)
+	await session.commit()
\ No newline at end of file
@@ -133,9 +133,10 @@ class TransactionCreate(TransactionBase):
     
     @model_validator(mode='after')
     def validate_category_logic(self):
-        # 1. Если это расход или доход — требуем категорию
+        # 1. Если это расход или доход — требуем категорию. Без нее нужно описание:
+        #    категорию подставит классификатор (см. category_classifier)
         if self.type in (TransactionType.EXPENSE, TransactionType.INCOME):
-            if self.category_id is None:
+            if self.category_id is None and not (self.description or "").strip():
                 raise ValueError("Для дохода или расхода необходимо выбрать категорию")
         
         # 2. Если это перевод — категория не нужна (принудительно ставим None)
@@ -158,4 +159,44 @@ class TransactionUpdate(SQLModel):
     category_id: Optional[int] = None
     description: Optional[str] = None
     raw_sms_text: Optional[str] = None
-    created_at: Optional[datetime] = None
\ No newline at end of file
+    created_at: Optional[datetime] = None
+
+
+# --- BATCH (пакетный импорт: СМС, выписки) ---
+
+MAX_TRANSACTION_BATCH = 500
+
+
+class TransactionBatchCreate(SQLModel):
+    items: List[TransactionCreate] = Field(min_length=1, max_length=MAX_TRANSACTION_BATCH)
+    # True — все или ничего: первая же ошибка отменяет весь пакет
+    atomic: bool = False
+
+
+class SmsImportItem(SQLModel):
+    text: str = Field(min_length=1, max_length=2000)
+    sender: Optional[str] = Field(default=None, max_length=64)  # Имя отправителя SMS (HUMO, CLICK, ...)
+    wallet_id: int
+    category_id: Optional[int] = None  # None — категорию подставит классификатор по получателю
+
+
+class SmsImportBatch(SQLModel):
+    items: List[SmsImportItem] = Field(min_length=1, max_length=MAX_TRANSACTION_BATCH)
+    atomic: bool = False
+
+
+class TransactionBatchItemResult(SQLModel):
+    index: int  # Позиция в запросе
+    ok: bool
+    transaction: Optional[TransactionRead] = None
+    error: Optional[str] = None
+
+
+class TransactionBatchResult(SQLModel):
+    created: int
+    failed: int
+    items: List[TransactionBatchItemResult]
+
+
+class CategorySuggestion(SQLModel):
+    category_id: Optional[int] = None  # None — классификатор не знает этого мерчанта
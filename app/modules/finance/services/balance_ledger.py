@@ -0,0 +1,205 @@
+"""
+Баланс кошелька как производная от истории операций.
+
+Wallet.balance — изменяемая колонка, которую сервис операций правит руками.
+Источник истины — transactions (доход +, расход −) плюс периодические снимки
+balance_snapshots: баланс на момент T = ближайший снимок + сумма операций между ними.
+reconcile() обходит кошельки пачками, делает новые снимки и сверяет Wallet.balance с историей.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import and_, case, delete, insert
+from sqlmodel import select, func, desc
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.modules.finance.models import BalanceSnapshot, Transaction, TransactionType, Wallet
+
+# Снимок делается не на "сейчас", а чуть раньше: операция получает created_at до коммита,
+# и закоммиченная позже снимка, но с более ранней датой, выпала бы из него навсегда
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+
+def signed_amount():
+	"""Влияние операции на баланс ее кошелька (переводы хранятся парой расход/доход)."""
+	return case(
+		(Transaction.type == TransactionType.INCOME, Transaction.amount),
+		(Transaction.type == TransactionType.EXPENSE, -Transaction.amount),
+		else_=0,
+	)
+
+
+def _aware(moment: datetime) -> datetime:
+	# SQLite отдает DateTime(timezone=True) без tzinfo; храним всегда UTC
+	return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+async def _ledger_sum(
+		session: AsyncSession, wallet_id: int, after: Optional[datetime], upto: Optional[datetime]
+) -> Decimal:
+	"""Сумма операций кошелька с created_at в (after, upto]; None — без границы."""
+	query = select(func.coalesce(func.sum(signed_amount()), 0)).where(Transaction.wallet_id == wallet_id)
+	if after is not None:
+		query = query.where(Transaction.created_at > after)
+	if upto is not None:
+		query = query.where(Transaction.created_at <= upto)
+	return Decimal((await session.exec(query)).one())
+
+
+async def balance_at(session: AsyncSession, wallet_id: int, at: datetime) -> Decimal:
+	"""
+	Баланс кошелька на момент at: последний снимок не позже at плюс хвост операций.
+	Раньше первого снимка — идем назад от ближайшего снимка (или текущего баланса).
+	"""
+	before = (await session.exec(
+		select(BalanceSnapshot)
+		.where(BalanceSnapshot.wallet_id == wallet_id, BalanceSnapshot.taken_at <= at)
+		.order_by(desc(BalanceSnapshot.taken_at))
+		.limit(1)
+	)).first()
+	if before:
+		return before.balance + await _ledger_sum(session, wallet_id, before.taken_at, at)
+
+	after = (await session.exec(
+		select(BalanceSnapshot)
+		.where(BalanceSnapshot.wallet_id == wallet_id, BalanceSnapshot.taken_at > at)
+		.order_by(BalanceSnapshot.taken_at)
+		.limit(1)
+	)).first()
+	if after:
+		anchor_balance, anchor_at = after.balance, after.taken_at
+	else:
+		anchor_balance = (await session.exec(select(Wallet.balance).where(Wallet.id == wallet_id))).one()
+		anchor_at = None
+	return anchor_balance - await _ledger_sum(session, wallet_id, at, anchor_at)
+
+
+async def invalidate(session: AsyncSession, tx: Transaction):
+	"""
+	Операция изменилась задним числом: снимки ее кошелька с даты операции больше не верны.
+	Вызывать для старого и нового состояния операции. Коммит — на вызывающем.
+	"""
+	await session.exec(
+		delete(BalanceSnapshot)
+		.where(BalanceSnapshot.wallet_id == tx.wallet_id)
+		.where(BalanceSnapshot.taken_at >= tx.created_at)
+	)
+
+
+# =========================================================================
+# СВЕРКА
+# =========================================================================
+
+@dataclass
+class WalletDrift:
+	wallet_id: int
+	balance: Decimal  # Wallet.balance
+	expected: Decimal  # снимок + операции после него
+
+	@property
+	def diff(self) -> Decimal:
+		return self.balance - self.expected
+
+
+@dataclass
+class ReconcileReport:
+	wallets: int = 0
+	baselined: int = 0  # кошельки без снимков: первый снимок взят из текущего баланса
+	snapshots: int = 0
+	drifts: List[WalletDrift] = field(default_factory=list)
+
+
+async def reconcile(session: AsyncSession, chunk_size: int = 1000, now: Optional[datetime] = None) -> ReconcileReport:
+	"""
+	Обходит кошельки пачками по id. На пачку — один запрос состояния и один INSERT снимков,
+	коммит после каждой пачки (короткие транзакции, без долгих блокировок).
+	Снимок делается, если с прошлого набралось BALANCE_SNAPSHOT_EVERY операций
+	или прошло BALANCE_SNAPSHOT_MAX_AGE_HOURS (и были операции).
+	"""
+	cutoff = (now or datetime.now(timezone.utc)) - SNAPSHOT_LAG
+	stale_before = cutoff - timedelta(hours=settings.BALANCE_SNAPSHOT_MAX_AGE_HOURS)
+	report = ReconcileReport()
+
+	last_id = 0
+	while True:
+		rows = (await session.exec(_chunk_state_query(last_id, chunk_size, cutoff))).all()
+		if not rows:
+			break
+
+		snapshots = []
+		for wallet_id, balance, taken_at, snapshot_balance, settled, settled_count, recent in rows:
+			settled, recent = Decimal(settled or 0), Decimal(recent or 0)
+
+			if taken_at is None:
+				# Начальный баланс кошелька операцией не является — берем его из текущего состояния
+				snapshots.append({"wallet_id": wallet_id, "taken_at": cutoff, "balance": balance - recent})
+				report.baselined += 1
+				continue
+
+			expected = snapshot_balance + settled + recent
+			if expected != balance:
+				report.drifts.append(WalletDrift(wallet_id=wallet_id, balance=balance, expected=expected))
+
+			if settled_count and (
+					settled_count >= settings.BALANCE_SNAPSHOT_EVERY or _aware(taken_at) <= stale_before
+			):
+				snapshots.append({"wallet_id": wallet_id, "taken_at": cutoff, "balance": snapshot_balance + settled})
+
+		if snapshots:
+			await session.exec(insert(BalanceSnapshot), params=snapshots)
+		await session.commit()
+
+		report.wallets += len(rows)
+		report.snapshots += len(snapshots)
+		last_id = rows[-1][0]
+
+	return report
+
+
+def _chunk_state_query(after_id: int, limit: int, cutoff: datetime):
+	"""
+	По каждому кошельку пачки: баланс, последний снимок, сумма и число операций
+	от снимка до cutoff (settled) и сумма операций после cutoff (recent).
+	Операции читаются только после последнего снимка (для кошельков без снимка — после cutoff).
+	"""
+	chunk = (
+		select(Wallet.id, Wallet.balance)
+		.where(Wallet.id > after_id)
+		.order_by(Wallet.id)
+		.limit(limit)
+		.subquery("chunk")
+	)
+	latest = (
+		select(BalanceSnapshot.wallet_id, func.max(BalanceSnapshot.taken_at).label("taken_at"))
+		.join(chunk, chunk.c.id == BalanceSnapshot.wallet_id)
+		.group_by(BalanceSnapshot.wallet_id)
+		.subquery("latest")
+	)
+	is_settled = Transaction.created_at <= cutoff
+
+	return (
+		select(
+			chunk.c.id,
+			chunk.c.balance,
+			latest.c.taken_at,
+			BalanceSnapshot.balance,
+			func.sum(case((is_settled, signed_amount()), else_=0)),
+			func.sum(case((is_settled, 1), else_=0)),
+			func.sum(case((is_settled, 0), else_=signed_amount())),
+		)
+		.select_from(chunk)
+		.outerjoin(latest, latest.c.wallet_id == chunk.c.id)
+		.outerjoin(BalanceSnapshot, and_(
+			BalanceSnapshot.wallet_id == latest.c.wallet_id,
+			BalanceSnapshot.taken_at == latest.c.taken_at,
+		))
+		.outerjoin(Transaction, and_(
+			Transaction.wallet_id == chunk.c.id,
+			Transaction.created_at > func.coalesce(latest.c.taken_at, cutoff),
+		))
+		.group_by(chunk.c.id, chunk.c.balance, latest.c.taken_at, BalanceSnapshot.balance)
+		.order_by(chunk.c.id)
+	)
@@ -0,0 +1,120 @@
+# app/modules/finance/services/category_cache.py
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+# (версия системных категорий, версия категорий пользователя)
+Versions = Tuple[int, int]
+
+
+@dataclass
+class CachedTree:
+	etag: str
+	body: bytes
+
+
+class CategoryTreeCache:
+	"""
+	Кэш дерева категорий в памяти процесса.
+	- Системные категории (user_id IS NULL) — один общий список на всех пользователей.
+	- Для каждого пользователя — готовое сериализованное дерево и его ETag.
+	Любая запись категорий поднимает счетчик версии (пользователя или системный),
+	и записи со старой версией больше не отдаются. Загрузка, начатая до записи,
+	сохранит результат только если версии за это время не изменились.
+	При нескольких воркерах чужие записи видны не позже TTL (как в UserCache).
+	"""
+
+	def __init__(self, ttl_seconds: int, maxsize: int):
+		self.ttl_seconds = ttl_seconds
+		self.maxsize = maxsize
+		# Версии берутся из общего счетчика: после вытеснения значение не повторится
+		self._clock = itertools.count(1)
+		self._system_version = next(self._clock)
+		# Версии пользователей — LRU не больше maxsize. Вытесненная версия поднимает "пол":
+		# пользователь без записи получает пол, а он больше любого снимка, взятого до вытеснения
+		self._user_versions: "OrderedDict[uuid.UUID, int]" = OrderedDict()
+		self._user_version_floor = 0
+		self._system: Optional[Tuple[int, float, List[dict]]] = None
+		self._trees: "OrderedDict[uuid.UUID, tuple[Versions, float, CachedTree]]" = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def versions(self, user_id: uuid.UUID) -> Versions:
+		"""Снимок версий — берется ДО загрузки из БД и передается в set_*."""
+		with self._lock:
+			return self._current(user_id)
+
+	def _current(self, user_id: uuid.UUID) -> Versions:
+		return self._system_version, self._user_versions.get(user_id, self._user_version_floor)
+
+	def get_tree(self, user_id: uuid.UUID) -> Optional[CachedTree]:
+		with self._lock:
+			item = self._trees.get(user_id)
+			if item is None or item[0] != self._current(user_id) or item[1] < time.monotonic():
+				if item is not None:
+					del self._trees[user_id]
+				self.misses += 1
+				return None
+
+			self._trees.move_to_end(user_id)
+			self.hits += 1
+			return item[2]
+
+	def set_tree(self, user_id: uuid.UUID, versions: Versions, tree: CachedTree) -> None:
+		with self._lock:
+			if versions != self._current(user_id):
+				return  # Пока грузили, категории поменялись
+			self._trees[user_id] = (versions, time.monotonic() + self.ttl_seconds, tree)
+			self._trees.move_to_end(user_id)
+			while len(self._trees) > self.maxsize:
+				self._trees.popitem(last=False)
+
+	def get_system(self) -> Optional[List[dict]]:
+		with self._lock:
+			if self._system is None or self._system[0] != self._system_version or self._system[1] < time.monotonic():
+				return None
+			return self._system[2]
+
+	def set_system(self, version: int, categories: List[dict]) -> None:
+		with self._lock:
+			if version == self._system_version:
+				self._system = (version, time.monotonic() + self.ttl_seconds, categories)
+
+	def bump_user(self, user_id: uuid.UUID) -> None:
+		"""Вызывать после создания/изменения/удаления категории пользователя."""
+		with self._lock:
+			self._user_versions[user_id] = next(self._clock)
+			self._user_versions.move_to_end(user_id)
+			while len(self._user_versions) > self.maxsize:
+				_, version = self._user_versions.popitem(last=False)
+				self._user_version_floor = max(self._user_version_floor, version)
+			self._trees.pop(user_id, None)
+
+	def bump_system(self) -> None:
+		"""Системные категории поменялись — устарели все деревья."""
+		with self._lock:
+			self._system_version = next(self._clock)
+			self._system = None
+			self._trees.clear()
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"size": len(self._trees),
+				"versions": len(self._user_versions),
+				"hits": self.hits,
+				"misses": self.misses,
+			}
+
+
+category_cache = CategoryTreeCache(
+	ttl_seconds=settings.CATEGORY_CACHE_TTL_SECONDS,
+	maxsize=settings.CATEGORY_CACHE_MAXSIZE,
+)
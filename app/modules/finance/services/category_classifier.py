@@ -0,0 +1,313 @@
+# app/modules/finance/services/category_classifier.py
+"""
+Подсказка категории дохода/расхода по описанию (мерчанту) операции.
+
+Описание нормализуется ("KORZINKA MCHJ #12" -> "korzinka"), из него берутся два ключа:
+вся фраза и первое слово (сеть магазинов: "korzinka yunusobod" -> "korzinka").
+Ключ — 64-битный хеш (тип операции + текст), строки в памяти не хранятся.
+
+- Индекс пользователя: ключ -> последняя выбранная им категория. Грузится лениво
+  из истории при первой подсказке, дальше пополняется на лету (новые операции,
+  смена категории), вытесняется по LRU/TTL.
+- Общий индекс: ключ -> категория большинства среди всех пользователей
+  (только системные категории), голосование Бойера — Мура без списка кандидатов.
+  Строится фоном при старте приложения.
+
+Подсказка — до четырех проб хеш-таблицы, без запросов в БД.
+Обучение из сервисов — через learn_on_commit: выбор применяется к индексу только
+после коммита сессии, откат его забывает.
+"""
+import hashlib
+import re
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlmodel import select, desc
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.modules.finance.models import Category, Transaction, TransactionType, Wallet
+
+_WORD = re.compile(r"[^\W\d_]{2,}")
+# Организационно-правовые формы и служебные слова из SMS банков: ключ не различают
+_STOPWORDS = frozenset({
+	"mchj", "xk", "ooo", "llc", "ltd", "inc", "ip", "ao", "oao", "zao", "chp", "xususiy", "korxona",
+	"ооо", "ип", "ао", "чп", "uz", "com", "www",
+})
+
+# Значение общего индекса: категория << 16 | счетчик голосов
+_COUNT_BITS = 16
+_COUNT_MASK = (1 << _COUNT_BITS) - 1
+
+# Ключ Session.info: обучение, ждущее коммита сессии
+_PENDING_KEY = "category_classifier_pending"
+
+
+def merchant_tokens(text: Optional[str]) -> List[str]:
+	"""Слова описания в нижнем регистре, без цифр, пунктуации и стоп-слов."""
+	if not text:
+		return []
+	return [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def _hash(tx_type: TransactionType, text: str) -> int:
+	digest = hashlib.blake2b(f"{tx_type.value}\x00{text}".encode(), digest_size=8).digest()
+	# 0 — признак пустого слота в CompactIndex
+	return int.from_bytes(digest, "little", signed=True) or 1
+
+
+def merchant_keys(tx_type: TransactionType, text: Optional[str]) -> Tuple[int, ...]:
+	"""(ключ фразы, ключ первого слова); для однословного описания — один ключ."""
+	tokens = merchant_tokens(text)
+	if not tokens:
+		return ()
+	phrase = " ".join(tokens)
+	if len(tokens) == 1:
+		return (_hash(tx_type, phrase),)
+	return _hash(tx_type, phrase), _hash(tx_type, tokens[0])
+
+
+class CompactIndex:
+	"""
+	Хеш-таблица int64 -> int64 с открытой адресацией (линейное пробирование)
+	на двух array('q'): 16 байт на слот против ~100+ байт на запись dict.
+	Заполнение не выше 2/3, удаления не нужны (значения только перезаписываются).
+	"""
+
+	def __init__(self, capacity: int = 8):
+		size = 8
+		while size * 2 < capacity * 3:
+			size <<= 1
+		self._allocate(size)
+
+	def _allocate(self, size: int):
+		self._keys = array("q", bytes(8 * size))
+		self._values = array("q", bytes(8 * size))
+		self._mask = size - 1
+		self._used = 0
+
+	def __len__(self) -> int:
+		return self._used
+
+	@property
+	def nbytes(self) -> int:
+		return (self._mask + 1) * 16
+
+	def _slot(self, key: int) -> int:
+		keys, mask = self._keys, self._mask
+		slot = key & mask
+		while True:
+			current = keys[slot]
+			if current == key or current == 0:
+				return slot
+			slot = (slot + 1) & mask
+
+	def get(self, key: int) -> Optional[int]:
+		slot = self._slot(key)
+		return self._values[slot] if self._keys[slot] else None
+
+	def set(self, key: int, value: int):
+		slot = self._slot(key)
+		if not self._keys[slot]:
+			if (self._used + 1) * 3 > (self._mask + 1) * 2:
+				self._grow()
+				slot = self._slot(key)
+			self._keys[slot] = key
+			self._used += 1
+		self._values[slot] = value
+
+	def _grow(self):
+		keys, values = self._keys, self._values
+		self._allocate((self._mask + 1) * 2)
+		for key, value in zip(keys, values):
+			if key:
+				slot = self._slot(key)
+				self._keys[slot] = key
+				self._values[slot] = value
+				self._used += 1
+
+
+def vote(index: CompactIndex, key: int, category_id: int):
+	"""Голос за категорию (Бойер — Мур): держится категория большинства по ключу."""
+	packed = index.get(key)
+	if packed is None:
+		index.set(key, category_id << _COUNT_BITS | 1)
+		return
+	current, count = packed >> _COUNT_BITS, packed & _COUNT_MASK
+	if current == category_id:
+		count = min(count + 1, _COUNT_MASK)
+	elif count > 1:
+		count -= 1
+	else:
+		current, count = category_id, 1
+	index.set(key, current << _COUNT_BITS | count)
+
+
+class CategoryClassifier:
+	def __init__(self, users_maxsize: int, user_ttl_seconds: int, history_limit: int):
+		self.users_maxsize = users_maxsize
+		self.user_ttl_seconds = user_ttl_seconds
+		self.history_limit = history_limit
+		self._users: "OrderedDict[uuid.UUID, tuple[float, CompactIndex]]" = OrderedDict()
+		self._global = CompactIndex()
+		self._building: Optional[CompactIndex] = None  # общий индекс, который сейчас строится
+		self._system_ids: Set[int] = set()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	# --- Подсказка ---
+
+	def suggest(self, user_id: uuid.UUID, tx_type: TransactionType, text: Optional[str]) -> Optional[int]:
+		"""Категория по описанию: фраза (пользователь, общий), затем первое слово (так же)."""
+		if tx_type not in (TransactionType.INCOME, TransactionType.EXPENSE):
+			return None
+		keys = merchant_keys(tx_type, text)
+		with self._lock:
+			item = self._users.get(user_id)
+			user_index = item[1] if item else None
+			for key in keys:
+				category_id = user_index.get(key) if user_index is not None else None
+				if category_id is None:
+					packed = self._global.get(key)
+					category_id = packed >> _COUNT_BITS if packed is not None else None
+				if category_id is not None:
+					self.hits += 1
+					return category_id
+			self.misses += 1
+			return None
+
+	async def ensure_user(self, session: AsyncSession, user_id: uuid.UUID):
+		"""Индекс пользователя из последних history_limit операций (если его нет или он устарел)."""
+		with self._lock:
+			item = self._users.get(user_id)
+			if item is not None and item[0] >= time.monotonic():
+				self._users.move_to_end(user_id)
+				return
+
+		rows = (await session.exec(
+			select(Transaction.type, Transaction.description, Transaction.category_id)
+			.join(Wallet, Wallet.id == Transaction.wallet_id)
+			.where(Wallet.user_id == user_id)
+			.where(Transaction.category_id.is_not(None))
+			.where(Transaction.related_transaction_id.is_(None))
+			.where(Transaction.type.in_([TransactionType.INCOME, TransactionType.EXPENSE]))
+			.order_by(desc(Transaction.created_at), desc(Transaction.id))
+			.limit(self.history_limit)
+		)).all()
+
+		index = CompactIndex(len(rows) * 2)
+		for tx_type, description, category_id in reversed(rows):  # от старых к новым: побеждает последняя
+			for key in merchant_keys(tx_type, description):
+				index.set(key, category_id)
+
+		with self._lock:
+			self._users[user_id] = (time.monotonic() + self.user_ttl_seconds, index)
+			self._users.move_to_end(user_id)
+			while len(self._users) > self.users_maxsize:
+				self._users.popitem(last=False)
+
+	# --- Обучение ---
+
+	def learn(self, user_id: uuid.UUID, tx_type: TransactionType, text: Optional[str], category_id: Optional[int]):
+		"""
+		Пользователь сам выбрал (или сменил) категорию для описания.
+		Вызывать только для явного выбора — автоподстановки индекс не учат.
+		"""
+		if not category_id or tx_type not in (TransactionType.INCOME, TransactionType.EXPENSE):
+			return
+		keys = merchant_keys(tx_type, text)
+		if not keys:
+			return
+		with self._lock:
+			item = self._users.get(user_id)
+			if item is not None:
+				for key in keys:
+					item[1].set(key, category_id)
+			if category_id in self._system_ids:
+				for index in filter(None, (self._global, self._building)):
+					for key in keys:
+						vote(index, key, category_id)
+
+	def learn_on_commit(
+			self, session: AsyncSession, user_id: uuid.UUID, tx_type: TransactionType,
+			text: Optional[str], category_id: Optional[int],
+	):
+		"""learn() после успешного коммита сессии: откаченная операция индекс не учит."""
+		pending = session.sync_session.info.setdefault(_PENDING_KEY, [])
+		pending.append((self, user_id, tx_type, text, category_id))
+	
+	async def build_global(self, session_factory, chunk_size: int = 10_000) -> int:
+		"""
+		Общий индекс по всей истории (системные категории). Строки читаются серверным
+		курсором пачками, старый индекс отвечает, пока строится новый. Возвращает число ключей.
+		"""
+		async with session_factory() as session:
+			system_ids = set((await session.exec(select(Category.id).where(Category.user_id.is_(None)))).all())
+			index = CompactIndex()
+			with self._lock:
+				self._system_ids = system_ids
+				self._building = index
+
+			try:
+				result = await session.stream(
+					select(Transaction.type, Transaction.description, Transaction.category_id)
+					.where(Transaction.category_id.in_(system_ids))
+					.where(Transaction.related_transaction_id.is_(None))
+					.execution_options(yield_per=chunk_size)
+				)
+				async for rows in result.partitions():
+					with self._lock:
+						for tx_type, description, category_id in rows:
+							for key in merchant_keys(tx_type, description):
+								vote(index, key, category_id)
+			finally:
+				with self._lock:
+					self._building = None
+
+		with self._lock:
+			self._global = index
+		return len(index)
+
+	# --- Служебное ---
+
+	def clear(self):
+		with self._lock:
+			self._users.clear()
+			self._global = CompactIndex()
+			self._system_ids = set()
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"users": len(self._users),
+				"user_keys": sum(len(index) for _, index in self._users.values()),
+				"global_keys": len(self._global),
+				"bytes": self._global.nbytes + sum(index.nbytes for _, index in self._users.values()),
+				"hits": self.hits,
+				"misses": self.misses,
+			}
+
+
+@event.listens_for(Session, "after_commit")
+def _learn_committed(session: Session):
+	for classifier, *args in session.info.pop(_PENDING_KEY, ()):
+		classifier.learn(*args)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+	session.info.pop(_PENDING_KEY, None)
+
+
+category_classifier = CategoryClassifier(
+	users_maxsize=settings.CATEGORY_CLASSIFIER_USERS_MAXSIZE,
+	user_ttl_seconds=settings.CATEGORY_CLASSIFIER_USER_TTL_SECONDS,
+	history_limit=settings.CATEGORY_CLASSIFIER_HISTORY_LIMIT,
+)
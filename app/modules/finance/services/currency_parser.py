@@ -1,89 +1,220 @@
-import httpx
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
 from decimal import Decimal
-from datetime import datetime
-from sqlmodel import Session, select
+from typing import Optional
+
+import httpx
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.database import dialect_insert
 from app.modules.finance.models import Currency, CurrencyRate
 from app.modules.finance.schemas import CbuCurrencyItem
+from app.modules.finance.services.rate_cache import rate_cache
 
 # Убедись, что CurrencySchema тоже поддерживает Decimal или просто строку,
 # но здесь мы берем данные напрямую из response.json() для чистоты примера.
 
 CBU_URL = "https://cbu.uz/uz/arkhiv-kursov-valyut/json/"
+# Архив ЦБ: курсы на конкретную дату (YYYY-MM-DD)
+CBU_ARCHIVE_URL = "https://cbu.uz/uz/arkhiv-kursov-valyut/json/all/{date}/"
+
+# Какие ответы архива имеет смысл повторить (перегрузка / временные сбои)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 TARGET_CURRENCIES = {"USD", "EUR", "RUB", "CNY", "GBP", "JPY", "CHF", "KRW", "AZN", "KZT"}
 
 
 class CurrencyClient:
+	def __init__(
+			self,
+			client: Optional[httpx.AsyncClient] = None,
+			archive_url: str = CBU_ARCHIVE_URL,
+			retries: int = 3,
+			backoff: float = 0.5,
+	):
+		# Общий пул соединений. Если не передан — открываем клиент на один вызов.
+		self.client = client
+		self.archive_url = archive_url
+		self.retries = retries
+		self.backoff = backoff
+	
+	@asynccontextmanager
+	async def _http(self):
+		if self.client is not None:
+			yield self.client
+		else:
+			async with httpx.AsyncClient() as client:
+				yield client
+	
 	async def fetch_rates(self) -> list[dict]:
-		async with httpx.AsyncClient() as client:
+		async with self._http() as client:
 			response = await client.get(CBU_URL)
 			response.raise_for_status()
 			return response.json()
 	
-	async def update_rates(self, session: Session):
-		raw_data = await self.fetch_rates()
-		updated_count = 0
+	async def fetch_rates_for_date(self, day: date, client: httpx.AsyncClient) -> list[dict]:
+		"""Курсы из архива ЦБ на дату. Сетевые ошибки и 429/5xx повторяем с экспоненциальной паузой."""
+		url = self.archive_url.format(date=day.isoformat())
+		
+		for attempt in range(self.retries + 1):
+			try:
+				response = await client.get(url)
+				response.raise_for_status()
+				return response.json()
+			except (httpx.TransportError, httpx.HTTPStatusError) as e:
+				retryable = (
+					isinstance(e, httpx.TransportError)
+					or e.response.status_code in RETRY_STATUSES
+				)
+				if not retryable or attempt == self.retries:
+					raise
+				await asyncio.sleep(self.backoff * 2 ** attempt)
+	
+	async def backfill_rates(
+			self,
+			session: AsyncSession,
+			date_from: date,
+			date_to: date,
+			concurrency: int = 8,
+			flush_every: int = 31,
+	) -> dict:
+		"""
+		Загружает исторические курсы за период [date_from, date_to].
+		Даты качаются параллельно (не больше concurrency запросов одновременно),
+		а результаты по мере готовности пачками уходят в save_rates.
+		"""
+		if date_from > date_to:
+			raise ValueError("Дата начала больше даты окончания")
+		
+		days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+		semaphore = asyncio.Semaphore(concurrency)
+		
+		async def fetch(day: date, client: httpx.AsyncClient):
+			async with semaphore:
+				try:
+					return day, await self.fetch_rates_for_date(day, client)
+				except (httpx.HTTPError, ValueError):
+					return day, None
+		
+		added = 0
+		failed: list[date] = []
+		buffer: list[CbuCurrencyItem] = []
+		buffered_days = 0
+		
+		async with self._http() as client:
+			tasks = [asyncio.create_task(fetch(day, client)) for day in days]
+			try:
+				for next_done in asyncio.as_completed(tasks):
+					day, raw_data = await next_done
+					if raw_data is None:
+						failed.append(day)
+						continue
+					
+					buffer.extend(self.parse_items(raw_data))
+					buffered_days += 1
+					
+					if buffered_days >= flush_every:
+						added += await self.save_rates(session, buffer)
+						await session.commit()
+						buffer, buffered_days = [], 0
+			finally:
+				for task in tasks:
+					task.cancel()
+		
+		added += await self.save_rates(session, buffer)
+		await session.commit()
+		
+		if added:
+			rate_cache.invalidate()
 		
-		# 1. Загружаем все существующие валюты в словарь для быстрого поиска
-		# Ключ: char_code ('USD'), Значение: Currency object
-		existing_currencies = {
-			c.char_code: c for c in session.exec(select(Currency)).all()
+		return {
+			"status": "success",
+			"dates_requested": len(days),
+			"dates_failed": sorted(d.isoformat() for d in failed),
+			"new_rates_added": added,
 		}
+	
+	async def update_rates(self, session: AsyncSession):
+		raw_data = await self.fetch_rates()
+		
+		# 1. Сначала валидируем весь ответ ЦБ, потом пишем одним махом
+		items = self.parse_items(raw_data)
+		updated_count = await self.save_rates(session, items)
+		await session.commit()
 		
+		# Новые курсы записаны — старые значения в кэше могли устареть
+		if updated_count:
+			rate_cache.invalidate()
+		
+		return {"status": "success", "new_rates_added": updated_count}
+	
+	@staticmethod
+	def parse_items(raw_data: list[dict]) -> list[CbuCurrencyItem]:
+		"""Валидирует сырые данные ЦБ и оставляет только нужные нам валюты."""
+		items = []
 		for item_dict in raw_data:
 			# Валидируем и парсим через Pydantic (безопасно)
 			try:
 				cbu_item = CbuCurrencyItem(**item_dict)
+				# Свойства парсятся лениво — проверяем их здесь, а не во время записи
+				cbu_item.rate, cbu_item.nominal, cbu_item.parsed_date
 			except Exception:
 				continue  # Пропускаем битые данные
 			
 			if cbu_item.char_code not in TARGET_CURRENCIES:
 				continue
 			
-			# --- Логика Валюты ---
-			currency = existing_currencies.get(cbu_item.char_code)
-			
-			if not currency:
-				# Создаем новую валюту
-				currency = Currency(
-					code=cbu_item.code,
-					char_code=cbu_item.char_code,
-					name=cbu_item.name_ru,
-					nominal=cbu_item.nominal
-				)
-				session.add(currency)
-				session.commit()
-				session.refresh(currency)
-				# Добавляем в локальный кэш
-				existing_currencies[cbu_item.char_code] = currency
-			else:
-				# Обновляем номинал, если вдруг ЦБ его изменил
-				if currency.nominal != cbu_item.nominal:
-					currency.nominal = cbu_item.nominal
-					session.add(currency)
-			
-			# --- Логика Курса (САМОЕ ВАЖНОЕ) ---
-			# Нормализация: Вычисляем цену за 1 единицу
-			# Пример: ЦБ дает JPY Nominal=10, Rate=800. Значит реальный курс 1 JPY = 80.
-			normalized_rate = cbu_item.rate / Decimal(cbu_item.nominal)
-			
-			# Проверяем, есть ли уже курс на эту дату
-			# (Можно оптимизировать, загрузив и рейты в память, но дат много, лучше точечно)
-			stmt_check = select(CurrencyRate).where(
-				CurrencyRate.currency_id == currency.id,
-				CurrencyRate.date == cbu_item.parsed_date
-			)
-			existing_rate = session.exec(stmt_check).first()
-			
-			if not existing_rate:
-				new_rate = CurrencyRate(
-					currency_id=currency.id,
-					rate=normalized_rate,  # Пишем "чистый" курс
-					date=cbu_item.parsed_date
-				)
-				session.add(new_rate)
-				updated_count += 1
+			items.append(cbu_item)
+		return items
+	
+	@staticmethod
+	async def save_rates(session: AsyncSession, items: list[CbuCurrencyItem]) -> int:
+		"""
+		Пишет валюты и курсы пачкой: один upsert валют и один INSERT ... ON CONFLICT
+		для курсов, сколько бы валют и дат ни было. Коммит — на вызывающем.
+		Возвращает количество реально добавленных курсов.
+		"""
+		if not items:
+			return 0
 		
-		session.commit()
-		return {"status": "success", "new_rates_added": updated_count}
\ No newline at end of file
+		insert = dialect_insert(session)
+		
+		# --- Логика Валюты ---
+		# Создаем новые и обновляем номинал, если вдруг ЦБ его изменил.
+		# Ключ: char_code — при нескольких датах побеждает последний номинал.
+		currency_rows = {
+			item.char_code: {
+				"code": item.code,
+				"char_code": item.char_code,
+				"name": item.name_ru,
+				"nominal": item.nominal,
+			}
+			for item in items
+		}
+		currency_stmt = insert(Currency).values(list(currency_rows.values()))
+		currency_stmt = currency_stmt.on_conflict_do_update(
+			index_elements=[Currency.char_code],
+			set_={"nominal": currency_stmt.excluded.nominal},
+		).returning(Currency.id, Currency.char_code)
+		currency_ids = {char_code: cid for cid, char_code in (await session.exec(currency_stmt)).all()}
+		
+		# --- Логика Курса (САМОЕ ВАЖНОЕ) ---
+		# Нормализация: Вычисляем цену за 1 единицу
+		# Пример: ЦБ дает JPY Nominal=10, Rate=800. Значит реальный курс 1 JPY = 80.
+		rate_rows = {
+			(currency_ids[item.char_code], item.parsed_date): {
+				"currency_id": currency_ids[item.char_code],
+				"rate": item.rate / Decimal(item.nominal),  # Пишем "чистый" курс
+				"date": item.parsed_date,
+			}
+			for item in items
+		}
+		# Уже существующие курсы (currency_id, date) пропускает сама БД
+		rate_stmt = insert(CurrencyRate).values(list(rate_rows.values()))
+		rate_stmt = rate_stmt.on_conflict_do_nothing(
+			index_elements=[CurrencyRate.currency_id, CurrencyRate.date],
+		).returning(CurrencyRate.id)
+		
+		return len((await session.exec(rate_stmt)).all())
+
@@ -2,38 +2,58 @@
 from datetime import date as date_type
 from decimal import Decimal
 from typing import Optional
-from sqlmodel import Session, select, desc
+from sqlmodel import Session, select
 from app.modules.finance.models import Currency, CurrencyRate
+from app.modules.finance.services.rate_cache import RateCache, rate_cache
+
+
+def as_of_rate_subquery(currency_id, date: Optional[date_type] = None):
+	"""
+	Скалярный подзапрос "последний курс валюты на дату (или вообще последний)".
+	currency_id и date могут быть колонками внешнего запроса — тогда подзапрос коррелированный.
+	"""
+	query = select(CurrencyRate.rate).where(CurrencyRate.currency_id == currency_id)
+	if date is not None:
+		query = query.where(CurrencyRate.date <= date)
+	
+	# ORDER BY date DESC LIMIT 1 совпадает с порядком индекса — без сортировки
+	return query.order_by(CurrencyRate.date.desc()).limit(1).scalar_subquery()
 
 
 class CurrencyService:
-	def __init__(self, session: Session):
+	def __init__(self, session: Session, cache: RateCache = rate_cache):
 		self.session = session
+		self.cache = cache
 	
 	def get_rate_to_base(self, currency_id: int, date: Optional[date_type] = None) -> Decimal:
 		"""
 		Возвращает курс 1 единицы валюты к UZS.
+		Сначала смотрит в общий кэш, в БД идет только при промахе.
 		"""
-		# Оптимизация: Сразу джойним валюту, чтобы проверить код
-		currency = self.session.get(Currency, currency_id)
-		if not currency:
+		cached = self.cache.get(currency_id, date)
+		if cached is not None:
+			return cached
+		
+		rate = self._load_rate_to_base(currency_id, date)
+		self.cache.set(currency_id, date, rate)
+		return rate
+	
+	def _load_rate_to_base(self, currency_id: int, date: Optional[date_type] = None) -> Decimal:
+		# Один запрос: код валюты + последний курс на дату (коррелированный подзапрос
+		# идет по индексу (currency_id, date DESC) и читает ровно одну строку)
+		query = select(Currency.char_code, as_of_rate_subquery(Currency.id, date)).where(Currency.id == currency_id)
+		row = self.session.exec(query).first()
+		if row is None:
 			raise ValueError(f"Currency ID {currency_id} not found")
 		
-		if currency.char_code == "UZS":
+		char_code, rate = row
+		if char_code == "UZS":
 			return Decimal("1.00")
 		
-		query = select(CurrencyRate.rate).where(CurrencyRate.currency_id == currency_id)
-		
-		if date:
-			query = query.where(CurrencyRate.date <= date)
-		
-		# Берем самый свежий курс (на дату или последний вообще)
-		query = query.order_by(CurrencyRate.date.desc())
-		
-		rate = self.session.exec(query).first()
-		
 		if rate is None:
-			raise ValueError(f"No rate found for {currency.char_code}")
+			if date:
+				raise ValueError(f"Не найден курс для валюты {char_code} на дату {date}")
+			raise ValueError(f"Не найден курс для валюты {char_code}")
 		
 		return rate  # Это уже Decimal и уже за 1 единицу
 	
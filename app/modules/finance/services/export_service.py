@@ -0,0 +1,120 @@
+# app/modules/finance/services/export_service.py
+"""
+Полная выгрузка операций пользователя (CSV / NDJSON / XLSX) потоком.
+
+Строки читаются серверным курсором (session.stream + yield_per) пачками по EXPORT_BATCH,
+каждая пачка сразу кодируется и отдается клиенту — память не зависит от числа операций.
+Названия кошелька, валюты и категории приходят тем же запросом (JOIN).
+"""
+import csv
+import io
+import json
+from enum import Enum
+from typing import AsyncIterator, Callable
+from uuid import UUID
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.modules.finance.models import Category, Currency, Transaction, Wallet
+from app.utils.xlsx_stream import XlsxStreamWriter
+
+EXPORT_BATCH = 1000
+
+
+class ExportFormat(str, Enum):
+	CSV = "csv"
+	NDJSON = "ndjson"
+	XLSX = "xlsx"
+
+
+MEDIA_TYPES = {
+	ExportFormat.CSV: "text/csv; charset=utf-8",
+	ExportFormat.NDJSON: "application/x-ndjson",
+	ExportFormat.XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+COLUMNS = (
+	"id", "created_at", "type", "amount", "currency", "wallet", "category",
+	"description", "raw_sms_text", "related_transaction_id",
+)
+
+
+def export_query(user_id: UUID):
+	return (
+		select(
+			Transaction.id,
+			Transaction.created_at,
+			Transaction.type,
+			Transaction.amount,
+			Currency.char_code,
+			Wallet.name,
+			Category.name,
+			Transaction.description,
+			Transaction.raw_sms_text,
+			Transaction.related_transaction_id,
+		)
+		.join(Wallet, Wallet.id == Transaction.wallet_id)
+		.join(Currency, Currency.id == Wallet.currency_id)
+		.outerjoin(Category, Category.id == Transaction.category_id)
+		.where(Wallet.user_id == user_id)
+		.order_by(Transaction.created_at, Transaction.id)
+		.execution_options(yield_per=EXPORT_BATCH)
+	)
+
+
+def _plain(row) -> list:
+	created_at, tx_type = row[1], row[2]
+	return [row[0], created_at.isoformat(), tx_type.value, row[3], *row[4:]]
+
+
+# С этих символов Excel начинает формулу: описание и текст SMS приходят от пользователя/банка,
+# и "=HYPERLINK(...)" в них выполнился бы при открытии файла (CSV injection)
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value):
+	if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+		return "'" + value
+	return value
+
+
+def _encode_csv(rows) -> bytes:
+	buffer = io.StringIO()
+	csv.writer(buffer).writerows([_csv_cell(value) for value in row] for row in rows)
+	return buffer.getvalue().encode()
+
+
+def _encode_ndjson(rows) -> bytes:
+	# Decimal → str: копейки не теряются
+	return "".join(
+		json.dumps(dict(zip(COLUMNS, _plain(row))), ensure_ascii=False, default=str) + "\n" for row in rows
+	).encode()
+
+
+async def stream_export(
+		session_factory: Callable[[], AsyncSession], user_id: UUID, fmt: ExportFormat
+) -> AsyncIterator[bytes]:
+	"""
+	Сессия открывается здесь, а не берется из зависимости роута: курсор должен жить,
+	пока отдается тело ответа.
+	"""
+	xlsx = XlsxStreamWriter(COLUMNS, sheet_name="Transactions") if fmt == ExportFormat.XLSX else None
+	if xlsx:
+		yield xlsx.open()
+	elif fmt == ExportFormat.CSV:
+		# BOM — чтобы Excel открыл UTF-8 с кириллицей без танцев
+		yield "\ufeff".encode() + _encode_csv([COLUMNS])
+	
+	async with session_factory() as session:
+		result = await session.stream(export_query(user_id))
+		async for rows in result.partitions():
+			if xlsx:
+				yield xlsx.write_rows(_plain(row) for row in rows)
+			elif fmt == ExportFormat.CSV:
+				yield _encode_csv(_plain(row) for row in rows)
+			else:
+				yield _encode_ndjson(rows)
+	
+	if xlsx:
+		yield xlsx.close()
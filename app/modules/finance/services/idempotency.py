@@ -0,0 +1,85 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.modules.finance.models import IdempotencyKey
+
+
+def request_fingerprint(payload: SQLModel) -> str:
+	"""sha256 канонического JSON тела запроса."""
+	canonical = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+	return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class IdempotencyService:
+	"""
+	Порядок работы ручки:
+	1. get_response — ключ уже отработал: отдаем сохраненный ответ (без блокировок кошельков);
+	2. claim — занимаем ключ в текущей транзакции БД. Параллельный запрос с тем же ключом
+	   ждет на уникальном индексе, пока мы не закончим;
+	3. store_response — пишем ответ; коммит вместе с самой операцией.
+	"""
+
+	def __init__(self, session: AsyncSession):
+		self.session = session
+
+	async def get_response(self, user_id: UUID, key: str, request_hash: str) -> Optional[dict]:
+		query = (
+			select(IdempotencyKey)
+			.where(IdempotencyKey.user_id == user_id)
+			.where(IdempotencyKey.key == key)
+			.where(IdempotencyKey.expires_at > datetime.now(timezone.utc))
+		)
+		record = (await self.session.exec(query)).first()
+		if record is None or record.response_body is None:
+			return None
+
+		if record.request_hash != request_hash:
+			raise HTTPException(status_code=422, detail="Idempotency-Key уже использован с другими данными")
+		return record.response_body
+
+	async def claim(self, user_id: UUID, key: str, request_hash: str) -> bool:
+		"""
+		Занимает ключ (или перезанимает протухший). False — ключ занят другим запросом:
+		вызывающему нужно откатиться и перечитать ответ через get_response.
+		"""
+		now = datetime.now(timezone.utc)
+		insert_stmt = dialect_insert(self.session)(IdempotencyKey).values(
+			user_id=user_id,
+			key=key,
+			request_hash=request_hash,
+			expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+		)
+		stmt = insert_stmt.on_conflict_do_update(
+			index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+			set_={
+				"request_hash": insert_stmt.excluded.request_hash,
+				"transaction_id": None,
+				"response_body": None,
+				"expires_at": insert_stmt.excluded.expires_at,
+			},
+			where=IdempotencyKey.expires_at <= now,
+		).returning(IdempotencyKey.key)
+		return (await self.session.exec(stmt)).first() is not None
+
+	async def store_response(self, user_id: UUID, key: str, transaction_id: int, body: dict):
+		record = await self.session.get(IdempotencyKey, (user_id, key))
+		record.transaction_id = transaction_id
+		record.response_body = body
+		self.session.add(record)
+		await self.session.flush()
+
+	async def purge_expired(self) -> int:
+		"""Удаляет протухшие ключи. Коммит — на вызывающем."""
+		stmt = delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.now(timezone.utc))
+		result = await self.session.exec(stmt)
+		return result.rowcount
@@ -0,0 +1,113 @@
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import Date, cast, delete, func, insert, literal_column
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.database import dialect_insert
+from app.modules.finance.models import MonthlyAggregate, Transaction, Wallet
+
+
+def month_start(moment: datetime) -> date:
+	return date(moment.year, moment.month, 1)
+
+
+def month_end(session: AsyncSession, month):
+	"""SQL-выражение "последний день месяца" для колонки с первым числом месяца."""
+	if session.bind.dialect.name == "sqlite":
+		return func.date(month, "+1 month", "-1 day")
+	return cast(month + literal_column("interval '1 month - 1 day'"), Date)
+
+
+async def apply_transaction(session: AsyncSession, tx: Transaction, user_id: UUID, sign: int = 1):
+	"""
+	Добавляет (sign=1) или вычитает (sign=-1) операцию из месячной свертки.
+	Один атомарный INSERT ... ON CONFLICT DO UPDATE: параллельные операции
+	по одному ключу не теряют друг друга. Коммит — на вызывающем.
+	"""
+	await apply_transactions(session, [tx], user_id, sign)
+
+
+async def apply_transactions(session: AsyncSession, txs: Iterable[Transaction], user_id: UUID, sign: int = 1):
+	"""Пачка операций одним многострочным upsert (ключи схлопываются заранее)."""
+	rows: Dict[tuple, dict] = {}
+	for tx in txs:
+		key = (tx.wallet_id, month_start(tx.created_at), tx.type, tx.category_id or 0)
+		row = rows.setdefault(key, {
+			"user_id": user_id,
+			"wallet_id": key[0],
+			"month": key[1],
+			"type": key[2],
+			"category_id": key[3],
+			"total": 0,
+			"count": 0,
+		})
+		row["total"] += tx.amount * sign
+		row["count"] += sign
+	
+	if not rows:
+		return
+	
+	# Один ключ дважды в одном INSERT ... ON CONFLICT PostgreSQL не пропустит — поэтому dict выше
+	insert_stmt = dialect_insert(session)(MonthlyAggregate).values(list(rows.values()))
+	stmt = insert_stmt.on_conflict_do_update(
+		index_elements=[
+			MonthlyAggregate.user_id,
+			MonthlyAggregate.wallet_id,
+			MonthlyAggregate.month,
+			MonthlyAggregate.type,
+			MonthlyAggregate.category_id,
+		],
+		set_={
+			"total": MonthlyAggregate.total + insert_stmt.excluded.total,
+			"count": MonthlyAggregate.count + insert_stmt.excluded.count,
+		},
+	)
+	await session.exec(stmt)
+
+
+async def rebuild(session: AsyncSession, user_id: Optional[UUID] = None) -> int:
+	"""
+	Пересобирает свертку из transactions одним INSERT ... SELECT
+	(для всех пользователей или для одного). Коммит — на вызывающем.
+	Возвращает количество строк свертки.
+	"""
+	if session.bind.dialect.name == "sqlite":
+		month = func.date(Transaction.created_at, "start of month")
+	else:
+		# Месяц считаем в UTC — так же, как month_start() для datetime из БД
+		month = cast(func.date_trunc("month", func.timezone("UTC", Transaction.created_at)), Date)
+
+	source = (
+		select(
+			Wallet.user_id,
+			Transaction.wallet_id,
+			month,
+			Transaction.type,
+			func.coalesce(Transaction.category_id, 0),
+			func.sum(Transaction.amount),
+			func.count(),
+		)
+		.join(Wallet, Wallet.id == Transaction.wallet_id)
+		.group_by(Wallet.user_id, Transaction.wallet_id, month, Transaction.type, func.coalesce(Transaction.category_id, 0))
+	)
+
+	cleanup = delete(MonthlyAggregate)
+	if user_id:
+		source = source.where(Wallet.user_id == user_id)
+		cleanup = cleanup.where(MonthlyAggregate.user_id == user_id)
+
+	await session.exec(cleanup)
+	await session.exec(
+		insert(MonthlyAggregate).from_select(
+			["user_id", "wallet_id", "month", "type", "category_id", "total", "count"],
+			source,
+		)
+	)
+
+	count_query = select(func.count()).select_from(MonthlyAggregate)
+	if user_id:
+		count_query = count_query.where(MonthlyAggregate.user_id == user_id)
+	return (await session.exec(count_query)).one()
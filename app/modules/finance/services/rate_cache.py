@@ -0,0 +1,68 @@
+# app/modules/finance/services/rate_cache.py
+import threading
+import time
+from collections import OrderedDict
+from datetime import date as date_type
+from decimal import Decimal
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+# Ключ: (currency_id, дата "на которую" нужен курс). None = самый свежий курс.
+RateKey = Tuple[int, Optional[date_type]]
+
+
+class RateCache:
+	"""
+	Общий (на процесс) кэш курсов к UZS.
+	Курсы ЦБ меняются раз в день, поэтому держим их в памяти между запросами
+	и сбрасываем целиком, когда CurrencyClient записывает новые курсы.
+	Сброс виден только в своем процессе: курсы, записанные другим воркером
+	или командой (backfill_rates), подхватываются не позже TTL. Иначе курс "на сегодня",
+	запрошенный до публикации сегодняшнего, навсегда остался бы вчерашним.
+	"""
+
+	def __init__(self, maxsize: int = 4096, ttl_seconds: Optional[int] = None):
+		self.maxsize = maxsize
+		self.ttl_seconds = settings.RATE_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+		self._rates: "OrderedDict[RateKey, tuple[float, Decimal]]" = OrderedDict()
+		# Роуты синхронные и крутятся в threadpool, поэтому нужен лок
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, currency_id: int, as_of: Optional[date_type] = None) -> Optional[Decimal]:
+		key = (currency_id, as_of)
+		with self._lock:
+			item = self._rates.get(key)
+			if item is None or item[0] < time.monotonic():
+				if item is not None:
+					del self._rates[key]
+				self.misses += 1
+				return None
+
+			self._rates.move_to_end(key)  # LRU: свежие ключи в конец
+			self.hits += 1
+			return item[1]
+
+	def set(self, currency_id: int, as_of: Optional[date_type], rate: Decimal) -> None:
+		key = (currency_id, as_of)
+		expires_at = time.monotonic() + self.ttl_seconds
+		with self._lock:
+			self._rates[key] = (expires_at, rate)
+			self._rates.move_to_end(key)
+			while len(self._rates) > self.maxsize:
+				self._rates.popitem(last=False)
+
+	def invalidate(self) -> None:
+		"""Сбрасывает все курсы (вызывается после записи новых курсов)."""
+		with self._lock:
+			self._rates.clear()
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {"size": len(self._rates), "hits": self.hits, "misses": self.misses}
+
+
+# Единый экземпляр на процесс
+rate_cache = RateCache()
@@ -1,162 +1,236 @@
-from datetime import datetime, timezone
+import base64
+import json
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from uuid import UUID
 
 from fastapi import HTTPException
-from sqlmodel import Session, select, col
+from sqlalchemy import insert, literal, or_, tuple_, update
+from sqlmodel import select, desc
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.modules.finance.models import Wallet, Transaction, TransactionType, WalletType
-from app.modules.finance.schemas import TransactionCreate, TransactionUpdate
+from app.core.config import settings
+from app.modules.finance.models import Category, Currency, Wallet, Transaction, TransactionType, WalletType
+from app.modules.finance.schemas import SmsImportItem, TransactionCreate, TransactionUpdate
+from app.modules.finance.services import balance_ledger, monthly_aggregates
+from app.modules.finance.services.category_classifier import category_classifier
 from app.modules.finance.services.currency_service import CurrencyService
+from app.utils.sms_parser import ParsedSms, sms_registry
 
 
 class TransactionService:
-	def __init__(self, session: Session):
+	def __init__(self, session: AsyncSession, atomic_balance: Optional[bool] = None):
 		self.session = session
-		self.currency_service = CurrencyService(session)
+		# Доход/расход без блокировки кошелька (см. _insert_with_balance_delta)
+		self.atomic_balance = settings.ATOMIC_BALANCE_UPDATES if atomic_balance is None else atomic_balance
 	
 	# =========================================================================
 	# PUBLIC METHODS
 	# =========================================================================
 	
-	def create_transaction(self, transaction_in: TransactionCreate, user_id: UUID) -> Transaction:
+	async def create_transaction(self, transaction_in: TransactionCreate, user_id: UUID) -> Transaction:
+		explicit_category = transaction_in.category_id is not None
+		(transaction_in,), errors = await self._fill_categories([transaction_in], user_id)
+		if errors:
+			raise HTTPException(status_code=400, detail=errors[0])
 		
-		amount = Decimal(str(transaction_in.amount))
-		if amount <= 0:
-			raise HTTPException(status_code=400, detail="Сумма должна быть больше нуля")
+		tx = await self._create_one(transaction_in, user_id)
+		if explicit_category:
+			category_classifier.learn_on_commit(self.session, user_id, tx.type, tx.description, tx.category_id)
+		return tx
+	
+	async def _create_one(self, transaction_in: TransactionCreate, user_id: UUID) -> Transaction:
+		if self.atomic_balance and transaction_in.type in (TransactionType.INCOME, TransactionType.EXPENSE):
+			return await self._create_atomic(transaction_in, user_id)
 		
 		# ----------------------------
-		# Определяем кошельки
+		# Определяем и блокируем кошельки
 		# ----------------------------
 		wallet_ids = [transaction_in.wallet_id]
-		
-		if transaction_in.type == TransactionType.TRANSFER:
-			if not transaction_in.target_wallet_id:
-				raise HTTPException(status_code=400, detail="Не указан целевой кошелек")
-			if transaction_in.wallet_id == transaction_in.target_wallet_id:
-				raise HTTPException(status_code=400, detail="Нельзя переводить на тот же кошелек")
-			
+		if transaction_in.type == TransactionType.TRANSFER and transaction_in.target_wallet_id:
 			wallet_ids.append(transaction_in.target_wallet_id)
 		
+		wallets = await self._get_wallets_locked(wallet_ids, user_id)
+		
 		# ----------------------------
-		# Блокируем кошельки
+		# Проверки + изменение балансов
 		# ----------------------------
-		wallets = self._get_wallets_locked(wallet_ids, user_id)
+		txs = await self._apply_new_transaction(transaction_in, wallets)
 		
-		source_wallet = wallets.get(transaction_in.wallet_id)
-		if not source_wallet:
-			raise HTTPException(status_code=404, detail="Кошелек не найден")
+		self.session.add_all(txs)
+		await self.session.flush()
 		
-		# ==========================================================
-		# INCOME
-		# ==========================================================
-		if transaction_in.type == TransactionType.INCOME:
-			source_wallet.balance += amount
-			
-			tx = self._build_transaction_model(
-				wallet_id=source_wallet.id,
-				amount=amount,
-				tx_type=TransactionType.INCOME,
-				data=transaction_in
-			)
-			
-			self.session.add(tx)
-			self.session.flush()
-			return tx
+		# Перевод: части ссылаются друг на друга (id известны только после flush)
+		if len(txs) == 2:
+			expense_tx, income_tx = txs
+			expense_tx.related_transaction_id = income_tx.id
+			income_tx.related_transaction_id = expense_tx.id
 		
-		# ==========================================================
-		# EXPENSE
-		# ==========================================================
-		if transaction_in.type == TransactionType.EXPENSE:
-			
-			if source_wallet.balance < amount:
-				raise HTTPException(status_code=400, detail="Недостаточно средств")
-			
-			source_wallet.balance -= amount
-			
-			tx = self._build_transaction_model(
-				wallet_id=source_wallet.id,
-				amount=amount,
-				tx_type=TransactionType.EXPENSE,
-				data=transaction_in
-			)
+		await monthly_aggregates.apply_transactions(self.session, txs, user_id)
+		return txs[0]
+	
+	async def create_transactions_batch(
+			self, items: List[TransactionCreate], user_id: UUID, atomic: bool = False
+	) -> List[Tuple[Optional[Transaction], Optional[str]]]:
+		"""
+		Пакетное создание операций (импорт СМС / выписок).
+		Все кошельки пакета блокируются один раз (SELECT ... FOR UPDATE в порядке id),
+		балансы меняются в памяти, строки уходят одним многострочным INSERT.
+		На каждую операцию возвращает (транзакция, None) или (None, текст ошибки).
+		atomic=True — первая ошибка прерывает пакет (HTTPException). Коммит — на вызывающем.
+		"""
+		explicit = [item.category_id is not None for item in items]
+		items, category_errors = await self._fill_categories(items, user_id)
+		
+		wallet_ids = {item.wallet_id for item in items}
+		wallet_ids |= {item.target_wallet_id for item in items if item.target_wallet_id}
+		wallets = await self._lock_wallets(list(wallet_ids), user_id)
+		
+		results: List[Tuple[Optional[Transaction], Optional[str]]] = []
+		new_txs: List[Transaction] = []
+		transfers: List[Tuple[Transaction, Transaction]] = []
+		
+		for index, item in enumerate(items):
+			try:
+				if index in category_errors:
+					raise HTTPException(status_code=400, detail=category_errors[index])
+				txs = await self._apply_new_transaction(item, wallets)
+			except HTTPException as e:
+				if atomic:
+					raise HTTPException(status_code=e.status_code, detail=f"Операция #{index}: {e.detail}")
+				results.append((None, e.detail))
+				continue
 			
-			self.session.add(tx)
-			self.session.flush()
-			return tx
+			new_txs.extend(txs)
+			if len(txs) == 2:
+				transfers.append((txs[0], txs[1]))
+			results.append((txs[0], None))
 		
-		# ==========================================================
-		# TRANSFER
-		# ==========================================================
-		target_wallet = wallets.get(transaction_in.target_wallet_id)
-		if not target_wallet:
-			raise HTTPException(status_code=404, detail="Целевой кошелек не найден")
+		if not new_txs:
+			return results
 		
-		if source_wallet.balance < amount:
-			raise HTTPException(status_code=400, detail="Недостаточно средств")
+		# Многострочный INSERT (insertmanyvalues); sort_by_parameter_order гарантирует,
+		# что id в RETURNING идут в порядке строк. На PostgreSQL это один запрос
+		# на каждые 1000 строк, SQLite (тесты) для гарантии порядка вставляет построчно.
+		stmt = insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True)
+		rows = [tx.model_dump(exclude={"id"}) for tx in new_txs]
+		ids = (await self.session.exec(stmt, params=rows)).scalars().all()
+		for tx, tx_id in zip(new_txs, ids):
+			tx.id = tx_id
 		
-		# списание
-		source_wallet.balance -= amount
+		# Связываем части переводов одним executemany по первичному ключу
+		if transfers:
+			links = []
+			for expense_tx, income_tx in transfers:
+				expense_tx.related_transaction_id = income_tx.id
+				income_tx.related_transaction_id = expense_tx.id
+				links.append({"id": expense_tx.id, "related_transaction_id": income_tx.id})
+				links.append({"id": income_tx.id, "related_transaction_id": expense_tx.id})
+			await self.session.exec(update(Transaction), params=links)
 		
-		# конвертация
-		converted_amount = self.currency_service.convert(
-			amount=amount,
-			from_currency_id=source_wallet.currency_id,
-			to_currency_id=target_wallet.currency_id
-		)
+		await self.session.flush()  # балансы кошельков
+		await monthly_aggregates.apply_transactions(self.session, new_txs, user_id)
 		
-		# зачисление
-		target_wallet.balance += converted_amount
+		for (tx, _), is_explicit in zip(results, explicit):
+			if tx is not None and is_explicit:
+				category_classifier.learn_on_commit(self.session, user_id, tx.type, tx.description, tx.category_id)
+		return results
+	
+	async def create_transactions_from_sms(
+			self, items: List[SmsImportItem], user_id: UUID, atomic: bool = False
+	) -> List[Tuple[Optional[Transaction], Optional[str]]]:
+		"""
+		Импорт сырых банковских SMS: разбор (sms_registry), пересчет суммы в валюту кошелька
+		по курсу, затем create_transactions_batch. Результаты — в порядке items,
+		как у create_transactions_batch. Коммит — на вызывающем.
+		"""
+		parsed = [sms_registry.parse(item.text, sender=item.sender) for item in items]
 		
-		# расход
-		expense_tx = self._build_transaction_model(
-			wallet_id=source_wallet.id,
-			amount=amount,
-			tx_type=TransactionType.EXPENSE,
-			data=transaction_in,
-			description=f"Перевод на {target_wallet.name}"
-		)
-		self.session.add(expense_tx)
-		self.session.flush()
+		# Валюты кошельков и коды валют из SMS — по одному запросу на пакет
+		wallets = {
+			wallet_id: (currency_id, char_code)
+			for wallet_id, currency_id, char_code in (await self.session.exec(
+				select(Wallet.id, Wallet.currency_id, Currency.char_code)
+				.join(Currency, Currency.id == Wallet.currency_id)
+				.where(Wallet.id.in_({item.wallet_id for item in items}))
+				.where(Wallet.user_id == user_id)
+			)).all()
+		}
+		char_codes = {sms.currency for sms in parsed if sms is not None}
+		currencies = dict((await self.session.exec(
+			select(Currency.char_code, Currency.id).where(Currency.char_code.in_(char_codes))
+		)).all()) if char_codes else {}
 		
-		# доход
-		income_tx = self._build_transaction_model(
-			wallet_id=target_wallet.id,
-			amount=converted_amount,
-			tx_type=TransactionType.INCOME,
-			data=transaction_in,
-			description=f"Перевод от {source_wallet.name}",
-			related_id=expense_tx.id
-		)
-		income_tx.category_id = None
+		results: List[Optional[Tuple[Optional[Transaction], Optional[str]]]] = [None] * len(items)
+		tx_items: List[TransactionCreate] = []
+		positions: List[int] = []
+		for index, (item, sms) in enumerate(zip(items, parsed)):
+			try:
+				tx_items.append(await self._sms_to_transaction(item, sms, wallets, currencies))
+			except ValueError as e:
+				# atomic: ошибка разбора прерывает пакет до вставки, поэтому номера в ошибках
+				# create_transactions_batch ниже совпадают с номерами SMS
+				if atomic:
+					raise HTTPException(status_code=400, detail=f"SMS #{index}: {e}")
+				results[index] = (None, str(e))
+				continue
+			positions.append(index)
 		
-		self.session.add(income_tx)
-		self.session.flush()
+		if tx_items:
+			created = await self.create_transactions_batch(tx_items, user_id, atomic=atomic)
+			for index, result in zip(positions, created):
+				results[index] = result
+		return results
+	
+	async def _sms_to_transaction(
+			self, item: SmsImportItem, sms: Optional[ParsedSms], wallets: Dict[int, Tuple[int, str]], currencies: Dict[str, int]
+	) -> TransactionCreate:
+		if sms is None:
+			raise ValueError("Не удалось разобрать SMS")
+		if item.wallet_id not in wallets:
+			raise ValueError("Кошелек не найден")
+		if item.category_id is None and not sms.merchant:
+			raise ValueError("В SMS нет получателя — укажите категорию")
 		
-		expense_tx.related_transaction_id = income_tx.id
+		wallet_currency_id, wallet_currency = wallets[item.wallet_id]
+		amount = None
+		if sms.currency != wallet_currency:
+			if sms.currency not in currencies:
+				raise ValueError(f"Неизвестная валюта {sms.currency}")
+			amount = await self._convert(sms.amount, currencies[sms.currency], wallet_currency_id)
 		
-		return expense_tx
+		return sms.to_transaction_create(
+			wallet_id=item.wallet_id,
+			wallet_currency=wallet_currency,
+			category_id=item.category_id,
+			amount=amount,
+		)
 	
-	def update_transaction(self, transaction_id: int, update_data: TransactionUpdate, user_id: UUID) -> Transaction:
+	async def update_transaction(self, transaction_id: int, update_data: TransactionUpdate, user_id: UUID) -> Transaction:
 		"""
 		Обновляет транзакцию. Использует стратегию 'Revert & Apply' (Откат -> Применение нового).
 		"""
 		# Фильтруем None значения
 		data = update_data.model_dump(exclude_unset=True)
 		if not data:
-			return self.get_transaction_or_404(transaction_id, user_id)
+			return await self.get_transaction_or_404(transaction_id, user_id)
 		
 		try:
-			with self.session.begin_nested():
+			async with self.session.begin_nested():
 				# 1. Получаем текущую транзакцию
-				tx = self.get_transaction_or_404(transaction_id, user_id)
+				tx = await self.get_transaction_or_404(transaction_id, user_id)
 				
 				# Запрещаем менять тип транзакции для переводов (слишком сложная логика для надежности)
 				if tx.related_transaction_id and "type" in data and data["type"] != tx.type:
 					raise HTTPException(status_code=400,
 					                    detail="Нельзя менять тип операции для переводов. Удалите и создайте заново.")
 				
+				# Свертка: вычитаем старое состояние, новое добавим после изменений.
+				# Снимки баланса с даты операции (старой и новой) больше не верны
+				await monthly_aggregates.apply_transaction(self.session, tx, user_id, sign=-1)
+				await balance_ledger.invalidate(self.session, tx)
+				
 				# 2. Определяем, нужно ли пересчитывать баланс
 				# Баланс меняется, если изменилась сумма, тип или кошелек
 				is_balance_impacted = any(k in data for k in ["amount", "type", "wallet_id"])
@@ -164,7 +238,7 @@ class TransactionService:
 				if is_balance_impacted:
 					# А. ОТКАТ (REVERT) старого состояния
 					# Блокируем старый кошелек
-					wallet = self._get_wallets_locked([tx.wallet_id], user_id)[tx.wallet_id]
+					wallet = (await self._get_wallets_locked([tx.wallet_id], user_id))[tx.wallet_id]
 					
 					if tx.type == TransactionType.INCOME:
 						self._modify_balance(wallet, tx.amount, is_adding=False)  # Откат дохода = списание
@@ -173,7 +247,7 @@ class TransactionService:
 					
 					# Если это перевод, нужно откатить и связанную часть
 					if tx.related_transaction_id:
-						self._revert_related_transaction(tx.related_transaction_id, user_id)
+						await self._revert_related_transaction(tx.related_transaction_id, user_id)
 					
 					# Б. Применение НОВЫХ данных к объекту
 					for k, v in data.items():
@@ -183,7 +257,7 @@ class TransactionService:
 					# Если кошелек изменился, берем новый, иначе используем тот же
 					target_wallet_id = data.get("wallet_id", tx.wallet_id)
 					if target_wallet_id != wallet.id:
-						wallet = self._get_wallets_locked([target_wallet_id], user_id)[target_wallet_id]
+						wallet = (await self._get_wallets_locked([target_wallet_id], user_id))[target_wallet_id]
 					
 					if tx.type == TransactionType.INCOME:
 						self._modify_balance(wallet, tx.amount, is_adding=True)
@@ -205,24 +279,31 @@ class TransactionService:
 						setattr(tx, k, v)
 				
 				self.session.add(tx)
-				self.session.commit()
-				self.session.refresh(tx)
-				return tx
+				await monthly_aggregates.apply_transaction(self.session, tx, user_id)
+				await balance_ledger.invalidate(self.session, tx)
+				
+				# Пользователь сменил категорию (или описание) — классификатор запомнит новый выбор
+				if "category_id" in data or "description" in data:
+					category_classifier.learn_on_commit(self.session, user_id, tx.type, tx.description, tx.category_id)
+			
+			await self.session.commit()
+			await self.session.refresh(tx)
+			return tx
 		
 		except Exception as e:
-			self.session.rollback()
+			await self.session.rollback()
 			raise e
 	
-	def delete_transaction(self, transaction_id: int, user_id: UUID):
+	async def delete_transaction(self, transaction_id: int, user_id: UUID):
 		"""
 		Удаляет транзакцию с откатом баланса. Удаляет связанные переводы.
 		"""
 		try:
-			with self.session.begin_nested():
-				tx = self.get_transaction_or_404(transaction_id, user_id)
+			async with self.session.begin_nested():
+				tx = await self.get_transaction_or_404(transaction_id, user_id)
 				
 				# 1. Откат баланса текущей транзакции
-				wallet = self._get_wallets_locked([tx.wallet_id], user_id)[tx.wallet_id]
+				wallet = (await self._get_wallets_locked([tx.wallet_id], user_id))[tx.wallet_id]
 				
 				if tx.type == TransactionType.INCOME:
 					self._modify_balance(wallet, tx.amount, is_adding=False)  # Забираем доход
@@ -231,51 +312,308 @@ class TransactionService:
 				
 				# 2. Если есть связанная транзакция (Перевод), удаляем её тоже
 				if tx.related_transaction_id:
-					self._delete_related_transaction(tx.related_transaction_id, user_id)
+					await self._delete_related_transaction(tx, user_id)
 				
-				self.session.delete(tx)
-				self.session.commit()
+				await monthly_aggregates.apply_transaction(self.session, tx, user_id, sign=-1)
+				await balance_ledger.invalidate(self.session, tx)
+				await self.session.delete(tx)
+			
+			await self.session.commit()
 		except Exception as e:
-			self.session.rollback()
+			await self.session.rollback()
 			raise e
 	
-	def get_transaction_or_404(self, transaction_id: int, user_id: UUID) -> Transaction:
+	async def get_transaction_or_404(self, transaction_id: int, user_id: UUID) -> Transaction:
 		"""Получает транзакцию с проверкой прав доступа."""
-		tx = self.session.get(Transaction, transaction_id)
+		tx = await self.session.get(Transaction, transaction_id)
 		if not tx:
 			raise HTTPException(status_code=404, detail="Транзакция не найдена")
 		
 		# Оптимизация: проверяем владельца через join с кошельком, если он не подгружен
 		# Но для простоты проверим через загрузку кошелька
-		wallet = self.session.get(Wallet, tx.wallet_id)
+		wallet = await self.session.get(Wallet, tx.wallet_id)
 		if not wallet or wallet.user_id != user_id:
 			raise HTTPException(status_code=403, detail="Доступ запрещен")
 		return tx
 	
+	async def list_transactions(
+			self,
+			user_id: UUID,
+			*,
+			wallet_id: Optional[int] = None,
+			date_from: Optional[date] = None,
+			date_to: Optional[date] = None,
+			tx_type: Optional[TransactionType] = None,
+			category_id: Optional[int] = None,
+			cursor: Optional[str] = None,
+			skip: int = 0,
+			limit: int = 20,
+	) -> Tuple[List[Transaction], Optional[str]]:
+		"""
+		История операций, новые сверху. Порядок стабильный: (created_at, id) DESC.
+		С cursor — keyset-пагинация (skip игнорируется), без него — старый skip/limit.
+		Возвращает страницу и курсор следующей (None, если страница последняя).
+		"""
+		query = (
+			select(Transaction)
+			.join(Wallet)
+			.where(Wallet.user_id == user_id)
+		)
+		
+		if wallet_id:
+			query = query.where(Transaction.wallet_id == wallet_id)
+		if date_from:
+			query = query.where(Transaction.created_at >= date_from)
+		if date_to:
+			# date_to включительно
+			query = query.where(Transaction.created_at < date_to + timedelta(days=1))
+		if tx_type:
+			query = query.where(Transaction.type == tx_type)
+		if category_id:
+			query = query.where(Transaction.category_id == category_id)
+		
+		if cursor:
+			created_at, tx_id = decode_cursor(cursor)
+			query = query.where(tuple_(Transaction.created_at, Transaction.id) < (created_at, tx_id))
+		elif skip:
+			query = query.offset(skip)
+		
+		query = query.order_by(desc(Transaction.created_at), desc(Transaction.id)).limit(limit)
+		items = (await self.session.exec(query)).all()
+		
+		next_cursor = encode_cursor(items[-1]) if len(items) == limit else None
+		return items, next_cursor
+	
 	# =========================================================================
 	# PRIVATE HELPERS (DRY & Logic)
 	# =========================================================================
 	
-	def _get_wallets_locked(self, wallet_ids: List[int], user_id: UUID) -> Dict[int, Wallet]:
+	async def _get_wallets_locked(self, wallet_ids: List[int], user_id: UUID) -> Dict[int, Wallet]:
 		
 		if not wallet_ids:
 			raise HTTPException(status_code=400, detail="Список кошельков пуст")
 		
+		wallets = await self._lock_wallets(wallet_ids, user_id)
+		
+		if len(wallets) != len(set(wallet_ids)):
+			raise HTTPException(status_code=404, detail="Один из кошельков не найден")
+		
+		return wallets
+	
+	async def _lock_wallets(self, wallet_ids: List[int], user_id: UUID) -> Dict[int, Wallet]:
+		"""SELECT ... FOR UPDATE по кошелькам пользователя. Чужие/несуществующие просто не вернутся."""
 		sorted_ids = sorted(set(wallet_ids))
 		
+		# ORDER BY id: строки блокируются в одном порядке во всех запросах — без дедлоков
 		stmt = (
 			select(Wallet)
 			.where(Wallet.id.in_(sorted_ids))
 			.where(Wallet.user_id == user_id)
+			.order_by(Wallet.id)
 			.with_for_update()
 		)
 		
-		results = self.session.exec(stmt).all()
+		results = (await self.session.exec(stmt)).all()
+		return {w.id: w for w in results}
+	
+	async def _apply_new_transaction(self, transaction_in: TransactionCreate, wallets: Dict[int, Wallet]) -> List[Transaction]:
+		"""
+		Проверяет новую операцию и меняет балансы заблокированных кошельков в памяти.
+		Возвращает строки для вставки: одну, а для перевода — (расход, доход).
+		Если проверка не прошла — HTTPException, балансы не тронуты.
+		"""
+		amount = Decimal(str(transaction_in.amount))
+		if amount <= 0:
+			raise HTTPException(status_code=400, detail="Сумма должна быть больше нуля")
 		
-		if len(results) != len(sorted_ids):
-			raise HTTPException(status_code=404, detail="Один из кошельков не найден")
+		source_wallet = wallets.get(transaction_in.wallet_id)
+		if not source_wallet:
+			raise HTTPException(status_code=404, detail="Кошелек не найден")
 		
-		return {w.id: w for w in results}
+		# ==========================================================
+		# INCOME
+		# ==========================================================
+		if transaction_in.type == TransactionType.INCOME:
+			source_wallet.balance += amount
+			
+			return [self._build_transaction_model(
+				wallet_id=source_wallet.id,
+				amount=amount,
+				tx_type=TransactionType.INCOME,
+				data=transaction_in
+			)]
+		
+		# ==========================================================
+		# EXPENSE
+		# ==========================================================
+		if transaction_in.type == TransactionType.EXPENSE:
+			
+			if not self._has_funds(source_wallet, amount):
+				raise HTTPException(status_code=400, detail="Недостаточно средств")
+			
+			source_wallet.balance -= amount
+			
+			return [self._build_transaction_model(
+				wallet_id=source_wallet.id,
+				amount=amount,
+				tx_type=TransactionType.EXPENSE,
+				data=transaction_in
+			)]
+		
+		# ==========================================================
+		# TRANSFER
+		# ==========================================================
+		if not transaction_in.target_wallet_id:
+			raise HTTPException(status_code=400, detail="Не указан целевой кошелек")
+		if transaction_in.wallet_id == transaction_in.target_wallet_id:
+			raise HTTPException(status_code=400, detail="Нельзя переводить на тот же кошелек")
+		
+		target_wallet = wallets.get(transaction_in.target_wallet_id)
+		if not target_wallet:
+			raise HTTPException(status_code=404, detail="Целевой кошелек не найден")
+		
+		if not self._has_funds(source_wallet, amount):
+			raise HTTPException(status_code=400, detail="Недостаточно средств")
+		
+		# конвертация (до изменения балансов: без курса операция не проходит целиком)
+		try:
+			converted_amount = await self._convert(
+				amount=amount,
+				from_currency_id=source_wallet.currency_id,
+				to_currency_id=target_wallet.currency_id
+			)
+		except ValueError as e:
+			raise HTTPException(status_code=400, detail=str(e))
+		
+		# списание / зачисление
+		source_wallet.balance -= amount
+		target_wallet.balance += converted_amount
+		
+		# расход
+		expense_tx = self._build_transaction_model(
+			wallet_id=source_wallet.id,
+			amount=amount,
+			tx_type=TransactionType.EXPENSE,
+			data=transaction_in,
+			description=f"Перевод на {target_wallet.name}"
+		)
+		
+		# доход
+		income_tx = self._build_transaction_model(
+			wallet_id=target_wallet.id,
+			amount=converted_amount,
+			tx_type=TransactionType.INCOME,
+			data=transaction_in,
+			description=f"Перевод от {source_wallet.name}"
+		)
+		income_tx.category_id = None
+		
+		return [expense_tx, income_tx]
+	
+	async def _fill_categories(
+			self, items: List[TransactionCreate], user_id: UUID
+	) -> Tuple[List[TransactionCreate], Dict[int, str]]:
+		"""
+		Доход/расход без категории: подставляет подсказку классификатора по описанию.
+		Возвращает (операции, {индекс: ошибка}) — для тех, чью категорию определить не удалось.
+		Подсказки проверяются одним запросом: категория могла быть удалена.
+		"""
+		missing = [
+			index for index, item in enumerate(items)
+			if item.category_id is None and item.type in (TransactionType.INCOME, TransactionType.EXPENSE)
+		]
+		if not missing:
+			return items, {}
+		
+		await category_classifier.ensure_user(self.session, user_id)
+		suggested = {
+			index: category_classifier.suggest(user_id, items[index].type, items[index].description)
+			for index in missing
+		}
+		
+		candidates = {category_id for category_id in suggested.values() if category_id is not None}
+		allowed = set()
+		if candidates:
+			allowed = set((await self.session.exec(
+				select(Category.id)
+				.where(Category.id.in_(candidates))
+				.where(or_(Category.user_id == user_id, Category.user_id.is_(None)))
+			)).all())
+		
+		items = list(items)
+		errors = {}
+		for index, category_id in suggested.items():
+			if category_id in allowed:
+				items[index] = items[index].model_copy(update={"category_id": category_id})
+			else:
+				errors[index] = "Не удалось определить категорию по описанию, выберите ее вручную"
+		return items, errors
+	
+	@staticmethod
+	def _has_funds(wallet: Wallet, amount: Decimal) -> bool:
+		"""Кредитка (CARD) может уходить в минус, остальные кошельки — нет."""
+		return wallet.type == WalletType.CARD or wallet.balance >= amount
+	
+	async def _create_atomic(self, transaction_in: TransactionCreate, user_id: UUID) -> Transaction:
+		"""Доход/расход без SELECT ... FOR UPDATE: проверка и изменение баланса — в самом UPDATE."""
+		amount = Decimal(str(transaction_in.amount))
+		if amount <= 0:
+			raise HTTPException(status_code=400, detail="Сумма должна быть больше нуля")
+		
+		tx = self._build_transaction_model(
+			wallet_id=transaction_in.wallet_id,
+			amount=amount,
+			tx_type=transaction_in.type,
+			data=transaction_in
+		)
+		delta = amount if transaction_in.type == TransactionType.INCOME else -amount
+		
+		tx = await self._insert_with_balance_delta(tx, user_id, delta)
+		await monthly_aggregates.apply_transaction(self.session, tx, user_id)
+		return tx
+	
+	async def _insert_with_balance_delta(self, tx: Transaction, user_id: UUID, delta: Decimal) -> Transaction:
+		"""
+		UPDATE wallets SET balance = balance + :delta
+		WHERE id = :id AND user_id = :uid AND (type = 'card' OR balance + :delta >= 0)
+		и INSERT операции. Строка кошелька заблокирована только на время этого UPDATE,
+		а не на несколько round trip'ов, как при SELECT ... FOR UPDATE.
+		PostgreSQL: один запрос (UPDATE в CTE, INSERT ... SELECT FROM cte) — если UPDATE
+		ничего не обновил, INSERT тоже ничего не вставит. Другие БД: два запроса в одной транзакции.
+		"""
+		balance_update = (
+			update(Wallet)
+			.where(Wallet.id == tx.wallet_id)
+			.where(Wallet.user_id == user_id)
+			.where(or_(Wallet.type == WalletType.CARD, Wallet.balance + delta >= 0))
+			.values(balance=Wallet.balance + delta)
+			.returning(Wallet.id)
+		)
+		values = tx.model_dump(exclude={"id"})
+		
+		if self.session.bind.dialect.name == "postgresql":
+			applied = balance_update.cte("applied")
+			columns = ["wallet_id"] + [k for k in values if k != "wallet_id"]
+			source = select(
+				applied.c.id,
+				*[literal(values[k], getattr(Transaction, k).type) for k in columns[1:]]
+			)
+			stmt = insert(Transaction).from_select(columns, source).returning(Transaction)
+			created = (await self.session.exec(stmt)).scalars().first()
+		else:
+			created = None
+			if (await self.session.exec(balance_update)).first() is not None:
+				stmt = insert(Transaction).values(**values).returning(Transaction)
+				created = (await self.session.exec(stmt)).scalars().first()
+		
+		if created is None:
+			# UPDATE ничего не тронул: разбираемся почему (только на этой, редкой, ветке)
+			owned = select(Wallet.id).where(Wallet.id == tx.wallet_id).where(Wallet.user_id == user_id)
+			if (await self.session.exec(owned)).first() is None:
+				raise HTTPException(status_code=404, detail="Кошелек не найден")
+			raise HTTPException(status_code=400, detail="Недостаточно средств")
+		
+		return created
 	
 	def _modify_balance(self, wallet: Wallet, amount: Decimal, is_adding: bool):
 		"""
@@ -312,19 +650,61 @@ class TransactionService:
 			related_transaction_id=related_id
 		)
 	
-	def _revert_related_transaction(self, related_id: int, user_id: UUID):
+	async def _revert_related_transaction(self, related_id: int, user_id: UUID):
 		"""Откатывает баланс связанной транзакции (для update/delete)."""
-		rel_tx = self.session.get(Transaction, related_id)
+		rel_tx = await self.session.get(Transaction, related_id)
 		if rel_tx:
-			rel_wallet = self._get_wallets_locked([rel_tx.wallet_id], user_id)[rel_tx.wallet_id]
+			rel_wallet = (await self._get_wallets_locked([rel_tx.wallet_id], user_id))[rel_tx.wallet_id]
 			if rel_tx.type == TransactionType.INCOME:
 				self._modify_balance(rel_wallet, rel_tx.amount, is_adding=False)
 			elif rel_tx.type == TransactionType.EXPENSE:
 				self._modify_balance(rel_wallet, rel_tx.amount, is_adding=True)
 	
-	def _delete_related_transaction(self, related_id: int, user_id: UUID):
+	async def _delete_related_transaction(self, tx: Transaction, user_id: UUID):
 		"""Откатывает и удаляет связанную транзакцию."""
-		self._revert_related_transaction(related_id, user_id)
-		rel_tx = self.session.get(Transaction, related_id)
+		related_id = tx.related_transaction_id
+		await self._revert_related_transaction(related_id, user_id)
+		rel_tx = await self.session.get(Transaction, related_id)
+		
+		# Части перевода ссылаются друг на друга: сначала рвем обе ссылки,
+		# иначе удаление любой из строк нарушит внешний ключ
+		tx.related_transaction_id = None
+		if rel_tx:
+			rel_tx.related_transaction_id = None
+		await self.session.flush()
+		
 		if rel_tx:
-			self.session.delete(rel_tx)
\ No newline at end of file
+			await monthly_aggregates.apply_transaction(self.session, rel_tx, user_id, sign=-1)
+			await balance_ledger.invalidate(self.session, rel_tx)
+			await self.session.delete(rel_tx)
+	
+	async def _convert(self, amount: Decimal, from_currency_id: int, to_currency_id: int) -> Decimal:
+		"""
+		CurrencyService синхронный (и почти всегда отвечает из кэша курсов),
+		поэтому вызываем его через run_sync на том же соединении.
+		"""
+		return await self.session.run_sync(
+			lambda sync_session: CurrencyService(sync_session).convert(
+				amount=amount,
+				from_currency_id=from_currency_id,
+				to_currency_id=to_currency_id
+			)
+		)
+
+# =========================================================================
+# CURSOR (keyset-пагинация)
+# =========================================================================
+
+def encode_cursor(tx: Transaction) -> str:
+	"""Непрозрачный курсор: base64 от позиции последней операции на странице."""
+	payload = json.dumps({"t": tx.created_at.isoformat(), "i": tx.id}, separators=(",", ":"))
+	return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+	try:
+		padded = cursor + "=" * (-len(cursor) % 4)
+		payload = json.loads(base64.urlsafe_b64decode(padded))
+		return datetime.fromisoformat(payload["t"]), int(payload["i"])
+	except (ValueError, KeyError, TypeError):
+		raise HTTPException(status_code=400, detail="Некорректный курсор")
@@ -4,7 +4,7 @@ from decimal import Decimal  # <--- ИСПРАВЛЕНО: Стандартный
 from enum import Enum
 from typing import Optional, List
 
-from sqlalchemy import Column, DateTime, func, Numeric, UniqueConstraint
+from sqlalchemy import Column, DateTime, ForeignKey, Index, func, Numeric, UniqueConstraint, text
 from sqlmodel import SQLModel, Field, Relationship
 from starlette.requests import Request
 
@@ -53,6 +53,16 @@ class Debtor(SQLModel, table=True):
 class Debt(SQLModel, table=True):
 	__tablename__ = "debts"
 	
+	__table_args__ = (
+		# Кандидаты фоновой пометки просрочки (overdue_sweeper): только активные долги.
+		# Enum хранится по имени члена ('ACTIVE')
+		Index(
+			"ix_debts_active_due_date", "status", "due_date",
+			postgresql_where=text("status = 'ACTIVE'"),
+			sqlite_where=text("status = 'ACTIVE'"),
+		),
+	)
+	
 	id: Optional[int] = Field(default=None, primary_key=True)
 	
 	# Владелец записи (кто записывает долг)
@@ -100,4 +110,40 @@ class Debt(SQLModel, table=True):
 	async def __admin_repr__(self, request: Request):
 		# В админке можно попробовать получить данные, но лучше показывать ID и Сумму
 		direction = "Мне должны" if self.type == DebtType.GIVEN else "Я должен"
-		return f"{direction}: {self.amount} (ID: {self.id})"
\ No newline at end of file
+		return f"{direction}: {self.amount} (ID: {self.id})"
+
+
+# --- ЖУРНАЛ ПОГАШЕНИЙ ---
+class DebtRepayment(SQLModel, table=True):
+	"""
+	Одна выплата по долгу. Debt.repaid_amount — сумма этого журнала: погашение
+	(services/debt_repayments.py) увеличивает его атомарно в SQL и, если указан кошелек,
+	проводит операцию (доход для "мне должны", расход для "я должен").
+	Отрицательная сумма — корректировка repaid_amount вручную через PATCH долга.
+	"""
+	__tablename__ = "debt_repayments"
+	
+	id: Optional[int] = Field(default=None, primary_key=True)
+	debt_id: int = Field(
+		sa_column=Column(ForeignKey("debts.id", ondelete="CASCADE"), nullable=False, index=True)
+	)
+	
+	# В валюте долга
+	amount: Decimal = Field(sa_column=Column(Numeric(20, 2), nullable=False))
+	
+	# Куда пришли / откуда ушли деньги и операция по кошельку (None — без движения денег в приложении)
+	wallet_id: Optional[int] = Field(
+		default=None, sa_column=Column(ForeignKey("wallets.id", ondelete="SET NULL"), nullable=True)
+	)
+	transaction_id: Optional[int] = Field(
+		default=None, sa_column=Column(ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True)
+	)
+	
+	comment: Optional[str] = Field(default=None, max_length=255)
+	created_at: datetime = Field(
+		sa_column=Column(
+			DateTime(timezone=True),
+			server_default=func.now(),
+			nullable=False,
+		)
+	)
@@ -1,17 +1,19 @@
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlalchemy import case
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_session
+from app.core.database import get_async_session
 from app.modules.auth.dependencies import get_current_user
 from app.modules.auth.models import User
+from app.modules.finance.models import Currency
 
-
-from app.modules.social.models import Debtor
+from app.modules.social.models import Debt, DebtStatus, DebtType, Debtor
 from app.modules.social.schemas import (
 	
-	DebtorRead, DebtorCreate, DebtorUpdate)
+	DebtorRead, DebtorCreate, DebtorUpdate, DebtorSummaryRead)
 
 router = APIRouter()
 
@@ -21,9 +23,9 @@ router = APIRouter()
 # ==========================================
 
 @router.post("", response_model=DebtorRead, status_code=201, summary="Создать контакт")
-def create_debtor(
+async def create_debtor(
 		debtor_in: DebtorCreate,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
 	"""
@@ -32,11 +34,11 @@ def create_debtor(
 	"""
 	# Проверка на дубликат (по телефону, если он указан)
 	if debtor_in.phone_number:
-		existing = session.exec(
+		existing = (await session.exec(
 			select(Debtor)
 			.where(Debtor.user_id == current_user.id)
 			.where(Debtor.phone_number == debtor_in.phone_number)
-		).first()
+		)).first()
 		if existing:
 			raise HTTPException(status_code=400, detail="Контакт с таким номером уже существует")
 	
@@ -44,30 +46,75 @@ def create_debtor(
 	debtor.user_id = current_user.id
 	
 	session.add(debtor)
-	session.commit()
-	session.refresh(debtor)
+	await session.commit()
+	await session.refresh(debtor)
 	return debtor
 
 
 @router.get("", response_model=List[DebtorRead], summary="Список контактов")
-def get_debtors(
-		session: Session = Depends(get_session),
+async def get_debtors(
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
 	"""Возвращает всех людей, с которыми у вас есть финансовые отношения."""
 	statement = select(Debtor).where(Debtor.user_id == current_user.id)
-	debtors = session.exec(statement).all()
+	debtors = (await session.exec(statement)).all()
 	return debtors
 
 
+@router.get("/summary", response_model=List[DebtorSummaryRead], summary="Итоги долгов по контактам")
+async def get_debtors_summary(
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user)
+):
+	"""
+	По каждому контакту и валюте: остаток "мне должны" / "я должен" (amount - repaid_amount),
+	число незакрытых долгов и ближайший срок возврата. Один GROUP BY вместо выгрузки
+	всех долгов и суммирования на клиенте. Контакты без незакрытых долгов не попадают.
+	"""
+	outstanding = Debt.amount - func.coalesce(Debt.repaid_amount, 0)
+	statement = (
+		select(
+			Debt.debtor_id,
+			Debtor.name,
+			Debt.currency_id,
+			Currency.char_code,
+			func.sum(case((Debt.type == DebtType.GIVEN, outstanding), else_=0)),
+			func.sum(case((Debt.type == DebtType.TAKEN, outstanding), else_=0)),
+			func.count(),
+			func.min(Debt.due_date),
+		)
+		.join(Debtor, Debtor.id == Debt.debtor_id)
+		.join(Currency, Currency.id == Debt.currency_id)
+		.where(Debt.user_id == current_user.id)
+		.where(Debt.status.in_([DebtStatus.ACTIVE, DebtStatus.OVERDUE]))
+		.group_by(Debt.debtor_id, Debtor.name, Debt.currency_id, Currency.char_code)
+		.order_by(Debtor.name, Debt.debtor_id, Currency.char_code)
+	)
+	rows = (await session.exec(statement)).all()
+	return [
+		DebtorSummaryRead(
+			debtor_id=debtor_id,
+			debtor_name=name,
+			currency_id=currency_id,
+			currency=char_code,
+			given=given,
+			taken=taken,
+			active_debts=count,
+			nearest_due_date=nearest_due_date,
+		)
+		for debtor_id, name, currency_id, char_code, given, taken, count, nearest_due_date in rows
+	]
+
+
 @router.patch("/debtors/{debtor_id}", response_model=DebtorRead, summary="Обновить контакт")
-def update_debtor(
+async def update_debtor(
 		debtor_id: int,
 		debtor_in: DebtorUpdate,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
-	debtor = session.get(Debtor, debtor_id)
+	debtor = await session.get(Debtor, debtor_id)
 	if not debtor or debtor.user_id != current_user.id:
 		raise HTTPException(status_code=404, detail="Контакт не найден")
 	
@@ -76,6 +123,6 @@ def update_debtor(
 		setattr(debtor, key, value)
 	
 	session.add(debtor)
-	session.commit()
-	session.refresh(debtor)
+	await session.commit()
+	await session.refresh(debtor)
 	return debtor
@@ -1,17 +1,23 @@
+from datetime import datetime, timezone
 from typing import List, Optional
+from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, desc
+from sqlalchemy.orm import selectinload
+from sqlmodel import select, desc
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_session
+from app.core.database import get_async_session
 from app.modules.auth.dependencies import get_current_user
 from app.modules.auth.models import User
 from app.modules.finance.models import Currency
 
-from app.modules.social.models import Debtor, Debt, DebtStatus, DebtType
+from app.modules.social.models import Debtor, Debt, DebtRepayment, DebtStatus, DebtType
 from app.modules.social.schemas import (
-	DebtCreate, DebtRead, DebtUpdate
+	DebtCreate, DebtRead, DebtUpdate,
+	DebtRepaymentCreate, DebtRepaymentBatchItem, DebtRepaymentBatchCreate, DebtRepaymentRead,
 )
+from app.modules.social.services.debt_repayments import DebtRepaymentService
 
 # ==========================================
 # 2. 📒 DEBTS (Долги)
@@ -19,19 +25,28 @@ from app.modules.social.schemas import (
 
 router = APIRouter()
 
+
+async def _get_debt_or_404(session: AsyncSession, debt_id: int, user_id: UUID, detail: str = "Запись о долге не найдена") -> Debt:
+	"""Долг пользователя вместе с должником (DebtRead.debtor), иначе 404."""
+	debt = await session.get(Debt, debt_id, options=[selectinload(Debt.debtor)], populate_existing=True)
+	if not debt or debt.user_id != user_id:
+		raise HTTPException(status_code=404, detail=detail)
+	return debt
+
+
 @router.post("", response_model=DebtRead, status_code=201, summary="Записать долг")
-def create_debt(
+async def create_debt(
 		debt_in: DebtCreate,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
 	# 1. Проверяем, существует ли должник и принадлежит ли он пользователю
-	debtor = session.get(Debtor, debt_in.debtor_id)
+	debtor = await session.get(Debtor, debt_in.debtor_id)
 	if not debtor or debtor.user_id != current_user.id:
 		raise HTTPException(status_code=404, detail="Должник не найден в вашем списке")
 	
 	# 2. Проверяем валюту
-	currency = session.get(Currency, debt_in.currency_id)
+	currency = await session.get(Currency, debt_in.currency_id)
 	if not currency:
 		raise HTTPException(status_code=404, detail="Валюта не найдена")
 	
@@ -41,17 +56,16 @@ def create_debt(
 	debt.repaid_amount = 0  # Новый долг всегда с 0 погашением
 	
 	session.add(debt)
-	session.commit()
-	session.refresh(debt)
-	return debt
+	await session.commit()
+	return await _get_debt_or_404(session, debt.id, current_user.id)
 
 
 @router.get("", response_model=List[DebtRead], summary="Список долгов")
-def get_debts(
+async def get_debts(
 		debtor_id: Optional[int] = None,
 		status: Optional[DebtStatus] = None,
 		type: Optional[DebtType] = None,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
 	"""
@@ -60,7 +74,7 @@ def get_debts(
 	- **status**: active, paid, overdue
 	- **type**: given (мне должны), taken (я должен)
 	"""
-	query = select(Debt).where(Debt.user_id == current_user.id)
+	query = select(Debt).where(Debt.user_id == current_user.id).options(selectinload(Debt.debtor))
 	
 	if debtor_id:
 		query = query.where(Debt.debtor_id == debtor_id)
@@ -72,36 +86,42 @@ def get_debts(
 	# Сортируем: сначала активные, потом по дате создания (новые сверху)
 	query = query.order_by(Debt.status, desc(Debt.created_at))
 	
-	debts = session.exec(query).all()
+	debts = (await session.exec(query)).all()
 	return debts
 
 
+@router.post("/repayments/batch", response_model=List[DebtRepaymentRead], status_code=201, summary="Погасить несколько долгов")
+async def repay_debts_batch(
+		batch_in: DebtRepaymentBatchCreate,
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user)
+):
+	"""Все погашения пакета проходят одной транзакцией: первая ошибка отменяет весь пакет."""
+	return await _repay(session, batch_in.items, current_user.id)
+
+
 @router.get("/{debt_id}", response_model=DebtRead)
-def get_debt_detail(
+async def get_debt_detail(
 		debt_id: int,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
-	debt = session.get(Debt, debt_id)
-	if not debt or debt.user_id != current_user.id:
-		raise HTTPException(status_code=404, detail="Запись о долге не найдена")
-	return debt
+	return await _get_debt_or_404(session, debt_id, current_user.id)
 
 
 @router.patch("/{debt_id}", response_model=DebtRead, summary="Обновить долг / Погасить часть")
-def update_debt(
+async def update_debt(
 		debt_id: int,
 		debt_in: DebtUpdate,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
 	"""
 	Используйте этот метод для частичного погашения или изменения статуса.
 	Если repaid_amount >= amount, статус автоматически станет PAID.
 	"""
-	debt = session.get(Debt, debt_id)
-	if not debt or debt.user_id != current_user.id:
-		raise HTTPException(status_code=404, detail="Запись о долге не найдена")
+	debt = await _get_debt_or_404(session, debt_id, current_user.id)
+	old_repaid = debt.repaid_amount or 0
 	
 	update_data = debt_in.model_dump(exclude_unset=True)
 	
@@ -113,26 +133,84 @@ def update_debt(
 	if debt.repaid_amount >= debt.amount and debt.status != DebtStatus.PAID:
 		debt.status = DebtStatus.PAID
 	
+	# Срок перенесли в будущее (или убрали) — просроченный долг снова активен.
+	# Обратный переход (ACTIVE -> OVERDUE) делает фоновая задача overdue_sweeper
+	if debt.status == DebtStatus.OVERDUE and "due_date" in update_data and "status" not in update_data:
+		due = debt.due_date
+		if due is None or (due if due.tzinfo else due.replace(tzinfo=timezone.utc)) > datetime.now(timezone.utc):
+			debt.status = DebtStatus.ACTIVE
+	
 	# Если статус вручную сменили на PAID, но сумму не подтянули -> подтягиваем
 	if debt.status == DebtStatus.PAID and debt.repaid_amount < debt.amount:
 		debt.repaid_amount = debt.amount
 	
+	# Ручная правка погашенной суммы тоже попадает в журнал (без движения по кошелькам).
+	# Деньги на кошелек — через POST /{debt_id}/repayments
+	if debt.repaid_amount != old_repaid:
+		session.add(DebtRepayment(
+			debt_id=debt.id,
+			amount=debt.repaid_amount - old_repaid,
+			comment="Изменено вручную",
+			created_at=datetime.now(timezone.utc),
+		))
+	
 	session.add(debt)
-	session.commit()
-	session.refresh(debt)
-	return debt
+	await session.commit()
+	return await _get_debt_or_404(session, debt.id, current_user.id)
+
+
+@router.post("/{debt_id}/repayments", response_model=DebtRepaymentRead, status_code=201, summary="Записать погашение")
+async def repay_debt(
+		debt_id: int,
+		repayment_in: DebtRepaymentCreate,
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user)
+):
+	"""
+	Частичное или полное погашение: repaid_amount растет атомарно, при полном
+	погашении долг закрывается (PAID). С wallet_id деньги проходят по кошельку:
+	"мне должны" — доход, "я должен" — расход (с конвертацией в валюту кошелька).
+	"""
+	item = DebtRepaymentBatchItem(debt_id=debt_id, **repayment_in.model_dump())
+	return (await _repay(session, [item], current_user.id))[0]
+
+
+@router.get("/{debt_id}/repayments", response_model=List[DebtRepaymentRead], summary="История погашений")
+async def get_debt_repayments(
+		debt_id: int,
+		session: AsyncSession = Depends(get_async_session),
+		current_user: User = Depends(get_current_user)
+):
+	await _get_debt_or_404(session, debt_id, current_user.id)
+	query = (
+		select(DebtRepayment)
+		.where(DebtRepayment.debt_id == debt_id)
+		.order_by(DebtRepayment.created_at, DebtRepayment.id)
+	)
+	return (await session.exec(query)).all()
+
+
+async def _repay(session: AsyncSession, items: List[DebtRepaymentBatchItem], user_id: UUID) -> List[DebtRepayment]:
+	try:
+		repayments = await DebtRepaymentService(session).repay(items, user_id)
+		await session.commit()
+	except HTTPException:
+		await session.rollback()
+		raise
+	except Exception:
+		await session.rollback()
+		raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+	return repayments
 
 
 @router.delete("/{debt_id}", status_code=204, summary="Удалить запись")
-def delete_debt(
+async def delete_debt(
 		debt_id: int,
-		session: Session = Depends(get_session),
+		session: AsyncSession = Depends(get_async_session),
 		current_user: User = Depends(get_current_user)
 ):
-	debt = session.get(Debt, debt_id)
-	if not debt or debt.user_id != current_user.id:
-		raise HTTPException(status_code=404, detail="Запись не найдена")
+	debt = await _get_debt_or_404(session, debt_id, current_user.id, detail="Запись не найдена")
 	
-	session.delete(debt)
-	session.commit()
+	await session.delete(debt)
+	await session.commit()
 	return None
\ No newline at end of file
@@ -4,7 +4,7 @@ from typing import Optional, List
 from uuid import UUID
 
 from pydantic import ConfigDict, field_validator
-from sqlmodel import SQLModel
+from sqlmodel import Field, SQLModel
 
 from app.modules.social.models import DebtType, DebtStatus
 
@@ -40,9 +40,21 @@ class DebtorRead(DebtorBase):
 	"""Схема для ответа API"""
 	id: int
 	user_id: UUID
-# Можно добавить вычисляемое поле, например, total_debt,
-# но это лучше делать через query параметры или отдельный эндпоинт,
-# чтобы не нагружать список.
+# Итоги по долгам — отдельный эндпоинт (DebtorSummaryRead), чтобы не нагружать список.
+
+
+class DebtorSummaryRead(SQLModel):
+	"""Незакрытые долги (active + overdue) одного контакта в одной валюте"""
+	model_config = _money_model_config
+	
+	debtor_id: int
+	debtor_name: str
+	currency_id: int
+	currency: str  # Буквенный код (USD)
+	given: Decimal  # Мне должны: сумма amount - repaid_amount
+	taken: Decimal  # Я должен
+	active_debts: int
+	nearest_due_date: Optional[datetime] = None
 
 
 # ==========================================
@@ -84,4 +96,42 @@ class DebtRead(DebtBase):
 	
 	# Вложенный объект должника, чтобы на фронте сразу видеть имя
 	# В SQLModel это подтянется, если в router сделать join или lazy loading
-	debtor: Optional[DebtorRead] = None
\ No newline at end of file
+	debtor: Optional[DebtorRead] = None
+
+
+# ==========================================
+# 3. 💸 REPAYMENTS (Погашения)
+# ==========================================
+
+MAX_REPAYMENT_BATCH = 200
+
+
+class DebtRepaymentCreate(SQLModel):
+	"""Выплата по долгу"""
+	amount: Decimal = Field(gt=0)  # В валюте долга
+	# Кошелек, куда пришли (мне должны) / откуда ушли (я должен) деньги.
+	# Валюта кошелька может отличаться — сумма операции конвертируется
+	wallet_id: Optional[int] = None
+	category_id: Optional[int] = None  # Категория операции по кошельку (необязательно)
+	comment: Optional[str] = Field(default=None, max_length=255)
+
+
+class DebtRepaymentBatchItem(DebtRepaymentCreate):
+	debt_id: int
+
+
+class DebtRepaymentBatchCreate(SQLModel):
+	"""Погашение нескольких долгов разом: все или ничего"""
+	items: List[DebtRepaymentBatchItem] = Field(min_length=1, max_length=MAX_REPAYMENT_BATCH)
+
+
+class DebtRepaymentRead(SQLModel):
+	model_config = _money_model_config
+	
+	id: int
+	debt_id: int
+	amount: Decimal
+	wallet_id: Optional[int] = None
+	transaction_id: Optional[int] = None
+	comment: Optional[str] = None
+	created_at: datetime
@@ -0,0 +1,168 @@
+# app/modules/social/services/debt_repayments.py
+"""
+Погашение долгов через журнал debt_repayments.
+
+Одно погашение или пакет — одна транзакция БД (коммит — на вызывающем):
+1. один UPDATE debts ... RETURNING на весь пакет: repaid_amount += сумма (CASE по id),
+   статус PAID при полном погашении. Закрытые долги и перебор остатка отсекает WHERE,
+   поэтому параллельные погашения одного долга не затирают друг друга;
+2. операции по кошелькам — одним пакетом TransactionService, сумма в валюте кошелька;
+3. строки журнала — одним INSERT.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import Numeric, case, literal, update
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.modules.finance.models import Transaction, TransactionType, Wallet
+from app.modules.finance.schemas import TransactionCreate
+from app.modules.finance.services.currency_service import CurrencyService
+from app.modules.finance.services.transaction_service import TransactionService
+from app.modules.social.models import Debt, DebtRepayment, DebtStatus, DebtType, Debtor
+from app.modules.social.schemas import DebtRepaymentBatchItem
+
+OPEN_STATUSES = (DebtStatus.ACTIVE, DebtStatus.OVERDUE)
+
+
+class DebtRepaymentService:
+	def __init__(self, session: AsyncSession):
+		self.session = session
+
+	async def repay(self, items: List[DebtRepaymentBatchItem], user_id: UUID) -> List[DebtRepayment]:
+		"""Проводит погашения (все или ничего) и возвращает строки журнала в порядке items."""
+		debts = await self._load_debts({item.debt_id for item in items}, user_id)
+
+		# Проверки до записи — ради понятных ошибок; гонки закрывает WHERE в UPDATE
+		totals: Dict[int, Decimal] = {}
+		for index, item in enumerate(items):
+			debt = debts.get(item.debt_id)
+			if debt is None:
+				raise HTTPException(status_code=404, detail=self._error(items, index, "Запись о долге не найдена"))
+			if debt.status not in OPEN_STATUSES:
+				raise HTTPException(status_code=400, detail=self._error(items, index, "Долг уже закрыт"))
+
+			totals[item.debt_id] = totals.get(item.debt_id, Decimal("0")) + item.amount
+			remaining = debt.amount - (debt.repaid_amount or 0)
+			if totals[item.debt_id] > remaining:
+				raise HTTPException(
+					status_code=400,
+					detail=self._error(items, index, f"Сумма больше остатка долга ({remaining})"),
+				)
+
+		await self._increment_repaid(totals, user_id)
+		transactions = await self._create_transactions(items, debts, user_id)
+
+		now = datetime.now(timezone.utc)
+		repayments = [
+			DebtRepayment(
+				debt_id=item.debt_id,
+				amount=item.amount,
+				wallet_id=item.wallet_id,
+				transaction_id=transactions[index].id if index in transactions else None,
+				comment=item.comment,
+				created_at=now,
+			)
+			for index, item in enumerate(items)
+		]
+		self.session.add_all(repayments)
+		await self.session.flush()
+		return repayments
+
+	# =========================================================================
+	# PRIVATE
+	# =========================================================================
+
+	async def _load_debts(self, debt_ids, user_id: UUID) -> dict:
+		"""Колонки, а не объекты Debt: UPDATE ниже не синхронизирует identity map."""
+		rows = (await self.session.exec(
+			select(
+				Debt.id, Debt.amount, Debt.repaid_amount, Debt.status, Debt.type, Debt.currency_id, Debtor.name
+			)
+			.join(Debtor, Debtor.id == Debt.debtor_id)
+			.where(Debt.id.in_(debt_ids))
+			.where(Debt.user_id == user_id)
+		)).all()
+		return {row.id: row for row in rows}
+
+	async def _increment_repaid(self, totals: Dict[int, Decimal], user_id: UUID):
+		delta = case(
+			{debt_id: literal(total, Numeric(20, 2)) for debt_id, total in totals.items()},
+			value=Debt.id,
+		)
+		# В SET справа — значения строки до обновления, поэтому repaid считается один раз
+		repaid = func.coalesce(Debt.repaid_amount, 0) + delta
+		paid = literal(DebtStatus.PAID, Debt.__table__.c.status.type)
+		stmt = (
+			update(Debt)
+			.where(Debt.id.in_(list(totals)))
+			.where(Debt.user_id == user_id)
+			.where(Debt.status.in_(OPEN_STATUSES))
+			.where(repaid <= Debt.amount)
+			.values(repaid_amount=repaid, status=case((repaid >= Debt.amount, paid), else_=Debt.status))
+			.returning(Debt.id)
+			.execution_options(synchronize_session=False)
+		)
+		updated = (await self.session.exec(stmt)).scalars().all()
+		if len(updated) != len(totals):
+			# Между проверкой и UPDATE долг закрыли или погасили параллельно
+			raise HTTPException(status_code=409, detail="Долг изменился во время погашения, повторите запрос")
+
+	async def _create_transactions(self, items: List[DebtRepaymentBatchItem], debts: dict, user_id: UUID) -> Dict[int, Transaction]:
+		"""Доход ("мне должны") / расход ("я должен") по кошелькам. Возвращает {индекс погашения: операция}."""
+		indexes = [index for index, item in enumerate(items) if item.wallet_id]
+		if not indexes:
+			return {}
+
+		wallet_ids = {items[index].wallet_id for index in indexes}
+		wallet_currencies = dict((await self.session.exec(
+			select(Wallet.id, Wallet.currency_id).where(Wallet.id.in_(wallet_ids)).where(Wallet.user_id == user_id)
+		)).all())
+
+		tx_items = []
+		for index in indexes:
+			item, debt = items[index], debts[items[index].debt_id]
+			if item.wallet_id not in wallet_currencies:
+				raise HTTPException(status_code=404, detail=self._error(items, index, "Кошелек не найден"))
+
+			amount = item.amount
+			if wallet_currencies[item.wallet_id] != debt.currency_id:
+				try:
+					amount = await self._convert(amount, debt.currency_id, wallet_currencies[item.wallet_id])
+				except ValueError as e:
+					raise HTTPException(status_code=400, detail=self._error(items, index, str(e)))
+
+			given = debt.type == DebtType.GIVEN
+			tx_items.append(TransactionCreate(
+				wallet_id=item.wallet_id,
+				amount=amount,
+				type=TransactionType.INCOME if given else TransactionType.EXPENSE,
+				# 0 — операция без категории (см. TransactionService._build_transaction_model)
+				category_id=item.category_id or 0,
+				description=f"{'Возврат долга' if given else 'Погашение долга'}: {debt.name}"[:150],
+			))
+
+		results = await TransactionService(self.session).create_transactions_batch(tx_items, user_id)
+		transactions = {}
+		for index, (tx, error) in zip(indexes, results):
+			if tx is None:
+				raise HTTPException(status_code=400, detail=self._error(items, index, error))
+			transactions[index] = tx
+		return transactions
+
+	async def _convert(self, amount: Decimal, from_currency_id: int, to_currency_id: int) -> Decimal:
+		return await self.session.run_sync(
+			lambda sync_session: CurrencyService(sync_session).convert(
+				amount=amount,
+				from_currency_id=from_currency_id,
+				to_currency_id=to_currency_id
+			)
+		)
+
+	@staticmethod
+	def _error(items: list, index: int, detail: Optional[str]) -> str:
+		return f"Погашение #{index}: {detail}" if len(items) > 1 else detail
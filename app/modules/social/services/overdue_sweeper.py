@@ -0,0 +1,90 @@
+# app/modules/social/services/overdue_sweeper.py
+"""
+Просрочка долгов: ACTIVE с due_date в прошлом -> OVERDUE.
+
+Раньше статус менялся только при PATCH долга, и OVERDUE не ставился никогда.
+Теперь фоновая задача (lifespan) раз в DEBT_OVERDUE_SWEEP_INTERVAL_SECONDS делает
+множественный UPDATE пачками по DEBT_OVERDUE_SWEEP_BATCH строк, каждая пачка —
+своя короткая транзакция. Кандидатов выбирает частичный индекс ix_debts_active_due_date.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import and_, literal_column, update
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.modules.social.models import Debt, DebtStatus
+
+logger = logging.getLogger("moneta.debts.overdue")
+
+
+# Статус — литералом, как в предикате ix_debts_active_due_date (status = 'ACTIVE'). С параметром
+# generic plan prepared-запроса asyncpg не знает значения и частичный индекс не берет
+_ACTIVE = literal_column(f"'{DebtStatus.ACTIVE.name}'")
+
+
+def _is_overdue(now: datetime):
+	return and_(Debt.status == _ACTIVE, Debt.due_date < now)
+
+
+async def sweep_overdue(
+		session: AsyncSession,
+		now: Optional[datetime] = None,
+		batch_size: Optional[int] = None,
+		dry_run: Optional[bool] = None,
+) -> int:
+	"""
+	Помечает просроченные долги и возвращает их число (dry_run — только считает).
+	Коммитит каждую пачку. На PostgreSQL строки, занятые параллельным PATCH
+	(или другим воркером), пропускаются (SKIP LOCKED) и достанутся следующему проходу.
+	"""
+	now = now or datetime.now(timezone.utc)
+	batch_size = batch_size or settings.DEBT_OVERDUE_SWEEP_BATCH
+	dry_run = settings.DEBT_OVERDUE_SWEEP_DRY_RUN if dry_run is None else dry_run
+
+	if dry_run:
+		count = (await session.exec(select(func.count()).select_from(Debt).where(_is_overdue(now)))).one()
+		metrics.record_overdue_debts(count, dry_run=True)
+		return count
+
+	total = 0
+	while True:
+		batch = select(Debt.id).where(_is_overdue(now)).order_by(Debt.due_date).limit(batch_size)
+		if session.bind.dialect.name == "postgresql":
+			batch = batch.with_for_update(skip_locked=True)
+
+		result = await session.exec(
+			update(Debt)
+			.where(Debt.id.in_(batch.scalar_subquery()))
+			.values(status=DebtStatus.OVERDUE)
+			.execution_options(synchronize_session=False)
+		)
+		await session.commit()
+
+		total += result.rowcount
+		if result.rowcount < batch_size:
+			break
+
+	metrics.record_overdue_debts(total)
+	return total
+
+
+async def run_overdue_sweeper(session_factory, interval_seconds: int):
+	"""Бесконечный цикл для lifespan; ошибка прохода логируется, следующий проход по расписанию."""
+	while True:
+		try:
+			async with session_factory() as session:
+				count = await sweep_overdue(session)
+			if count:
+				mode = " (dry run)" if settings.DEBT_OVERDUE_SWEEP_DRY_RUN else ""
+				logger.info("Просроченных долгов: %s%s", count, mode)
+		except asyncio.CancelledError:
+			raise
+		except Exception:
+			logger.exception("Проход пометки просроченных долгов упал")
+		await asyncio.sleep(interval_seconds)
@@ -1 +1,255 @@
-# Парсер SMS (Click, Payme)
+# Парсер SMS (Uzcard, Humo, Click, Payme, Visa/Mastercard банков)
+"""
+Разбор банковских SMS-уведомлений на сервере.
+
+Каждый формат — заранее скомпилированная регулярка с именованными группами
+(op, amount, currency, merchant, card, balance). Реестр индексирует
+форматы по отправителю и по первому слову текста, так что сообщение проверяется
+только против пары кандидатов, а не против всех известных форматов.
+
+	parsed = sms_registry.parse(text, sender="HUMO")
+	if parsed:
+		tx_in = parsed.to_transaction_create(wallet_id=wallet.id, wallet_currency="UZS", category_id=category.id)
+
+Импорт из API — POST /finance/transactions/sms (TransactionService.create_transactions_from_sms).
+"""
+import re
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from app.modules.finance.models import TransactionType
+from app.modules.finance.schemas import TransactionCreate
+
+
+@dataclass(frozen=True)
+class ParsedSms:
+	provider: str
+	type: TransactionType
+	amount: Decimal
+	currency: str
+	merchant: Optional[str] = None
+	card_mask: Optional[str] = None  # "*1234"
+	balance: Optional[Decimal] = None
+	raw_text: str = ""
+
+	def to_transaction_create(
+			self,
+			wallet_id: int,
+			wallet_currency: str,
+			category_id: Optional[int] = None,
+			amount: Optional[Decimal] = None,
+	) -> TransactionCreate:
+		"""
+		amount — сумма, уже пересчитанная в валюту кошелька. Без нее валюта SMS
+		должна совпадать с валютой кошелька, иначе ValueError: сумма в чужой валюте
+		молча исказила бы баланс.
+		"""
+		if amount is None:
+			if self.currency != wallet_currency:
+				raise ValueError(f"Валюта SMS ({self.currency}) не совпадает с валютой кошелька ({wallet_currency})")
+			amount = self.amount
+		
+		return TransactionCreate(
+			wallet_id=wallet_id,
+			amount=amount,
+			type=self.type,
+			category_id=category_id,
+			description=self.merchant[:150] if self.merchant else None,
+			raw_sms_text=self.raw_text,
+		)
+
+
+@dataclass(frozen=True)
+class SmsFormat:
+	provider: str
+	regex: Pattern
+	operations: Dict[str, TransactionType]  # значение группы op (в нижнем регистре) -> тип
+
+
+# =========================================================================
+# НОРМАЛИЗАЦИЯ
+# =========================================================================
+
+# "1 234 567,89" / "1 234 567.89" / "125000" (пробелы, в т.ч. неразрывные — разделители разрядов)
+AMOUNT = r"(?:\d{1,3}(?:[ \u00a0]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?)"
+CURRENCY = r"(?:UZS|USD|EUR|RUB|so'?m|sum|сум)"
+
+_CURRENCY_ALIASES = {"so'm": "UZS", "som": "UZS", "sum": "UZS", "сум": "UZS"}
+_KEY = re.compile(r"[^\W_]+")
+
+
+def parse_amount(value: str) -> Decimal:
+	return Decimal(value.replace(" ", "").replace("\u00a0", "").replace(",", "."))
+
+
+def normalize_currency(value: str) -> str:
+	value = value.lower()
+	return _CURRENCY_ALIASES.get(value, value.upper())
+
+
+def _key(value: str) -> str:
+	"""Ключ индекса: первое слово без пунктуации, в верхнем регистре."""
+	match = _KEY.match(value) or _KEY.search(value)
+	return match.group(0).upper() if match else ""
+
+
+# =========================================================================
+# РЕЕСТР
+# =========================================================================
+
+class SmsParserRegistry:
+	def __init__(self):
+		self._by_sender: Dict[str, List[SmsFormat]] = {}
+		self._by_prefix: Dict[str, List[SmsFormat]] = {}
+		self._fallback: List[SmsFormat] = []
+		# (отправитель, первое слово) -> кандидаты; сбрасывается при регистрации
+		self._candidates: Dict[Tuple[str, str], List[SmsFormat]] = {}
+
+	def register(
+			self,
+			provider: str,
+			pattern: str,
+			operations: Dict[str, TransactionType],
+			senders: Iterable[str] = (),
+			prefixes: Iterable[str] = (),
+	) -> SmsFormat:
+		"""
+		pattern компилируется один раз здесь. {AMOUNT}/{CURRENCY} в шаблоне подставляются.
+		Без senders и prefixes формат попадает в fallback и проверяется для всех
+		сообщений, не подошедших по индексу, — таких форматов должно быть мало.
+		"""
+		regex = re.compile(pattern.format(AMOUNT=AMOUNT, CURRENCY=CURRENCY), re.IGNORECASE)
+		sms_format = SmsFormat(provider, regex, {op.lower(): tx_type for op, tx_type in operations.items()})
+
+		senders = list(dict.fromkeys(_key(s) for s in senders))
+		prefixes = list(dict.fromkeys(_key(p) for p in prefixes))
+		for sender in senders:
+			self._by_sender.setdefault(sender, []).append(sms_format)
+		for prefix in prefixes:
+			self._by_prefix.setdefault(prefix, []).append(sms_format)
+		if not senders and not prefixes:
+			self._fallback.append(sms_format)
+		self._candidates.clear()
+		return sms_format
+
+	def candidates(self, text: str, sender: Optional[str] = None) -> List[SmsFormat]:
+		key = (_key(sender) if sender else "", _key(text))
+		found = self._candidates.get(key)
+		if found is None:
+			found = list(self._by_sender.get(key[0], ()))
+			for sms_format in self._by_prefix.get(key[1], ()):
+				if sms_format not in found:
+					found.append(sms_format)
+			found = found or self._fallback
+			# Ключей немного (отправители банков и первые слова их шаблонов), но на мусорных
+			# SMS их число не ограничено — кэш не растет бесконечно
+			if len(self._candidates) < 10_000:
+				self._candidates[key] = found
+		return found
+
+	def parse(self, text: str, sender: Optional[str] = None) -> Optional[ParsedSms]:
+		text = text.strip()
+		for sms_format in self.candidates(text, sender):
+			match = sms_format.regex.search(text)
+			if not match:
+				continue
+			parsed = self._build(sms_format, match, text)
+			if parsed:
+				return parsed
+		return None
+
+	@staticmethod
+	def _build(sms_format: SmsFormat, match: re.Match, text: str) -> Optional[ParsedSms]:
+		groups = match.groupdict()
+		tx_type = sms_format.operations.get(re.sub(r"\s+", " ", groups["op"]).lower())
+		if tx_type is None:
+			return None
+
+		try:
+			amount = parse_amount(groups["amount"])
+			balance = parse_amount(groups["balance"]) if groups.get("balance") else None
+		except InvalidOperation:
+			return None
+
+		merchant = (groups.get("merchant") or "").strip(" .,;") or None
+		card = groups.get("card")
+		return ParsedSms(
+			provider=sms_format.provider,
+			type=tx_type,
+			amount=amount,
+			currency=normalize_currency(groups["currency"]),
+			merchant=merchant,
+			card_mask=f"*{card[-4:]}" if card else None,
+			balance=balance,
+			raw_text=text,
+		)
+
+
+# =========================================================================
+# ФОРМАТЫ
+# =========================================================================
+
+INCOME, EXPENSE = TransactionType.INCOME, TransactionType.EXPENSE
+
+sms_registry = SmsParserRegistry()
+
+# HUMOCARD *1234: oplata 125000.00 UZS; KORZINKA MCHJ; 26.03.25 14:05; Dostupno: 1234567.89 UZS
+sms_registry.register(
+	"humo",
+	r"^HUMOCARD \*(?P<card>\d{{4}}): (?P<op>oplata|pokupka|perevod|popolnenie|vozvrat) "
+	r"(?P<amount>{AMOUNT}) (?P<currency>{CURRENCY});\s*(?P<merchant>[^;]*?);"
+	r"(?:\s*\d{{2}}\.\d{{2}}\.\d{{2,4}} \d{{2}}:\d{{2}};)?\s*Dostupno: (?P<balance>{AMOUNT}) {CURRENCY}",
+	{"oplata": EXPENSE, "pokupka": EXPENSE, "perevod": EXPENSE, "popolnenie": INCOME, "vozvrat": INCOME},
+	senders=["HUMO", "HUMOCARD"],
+	prefixes=["HUMOCARD"],
+)
+
+# UZCARD
+# Pokupka: 125 000,00 UZS
+# Karta: 8600***1234
+# Merchant: KORZINKA MCHJ
+# Balans: 1 234 567,89 UZS
+sms_registry.register(
+	"uzcard",
+	r"^UZCARD\s+(?P<op>pokupka|oplata|spisanie|popolnenie|zachislenie): (?P<amount>{AMOUNT}) (?P<currency>{CURRENCY})"
+	r"\s+Karta: (?P<card>[\d*]+)"
+	r"(?:\s+Merchant: (?P<merchant>[^\r\n]+))?"
+	r"\s+Balans: (?P<balance>{AMOUNT}) {CURRENCY}",
+	{"pokupka": EXPENSE, "oplata": EXPENSE, "spisanie": EXPENSE, "popolnenie": INCOME, "zachislenie": INCOME},
+	senders=["UZCARD"],
+	prefixes=["UZCARD"],
+)
+
+# Click: Oplata 45 000 so'm. Beeline. Karta *1234. Balans: 100 000 so'm
+sms_registry.register(
+	"click",
+	r"^Click: (?P<op>oplata|perevod|poluchen perevod|popolnenie) (?P<amount>{AMOUNT}) (?P<currency>{CURRENCY})\."
+	r"(?: (?P<merchant>[^.]+(?:\.[a-z]{{2,3}})?)\.)? Karta \*(?P<card>\d{{4}})\."
+	r"(?: Balans: (?P<balance>{AMOUNT}) {CURRENCY})?",
+	{"oplata": EXPENSE, "perevod": EXPENSE, "poluchen perevod": INCOME, "popolnenie": INCOME},
+	senders=["CLICK", "CLICKUZ", "CLICK.UZ"],
+	prefixes=["CLICK"],
+)
+
+# Payme: Platezh 45000.00 UZS, Ucell, karta 8600**1234. Ostatok: 100000.00 UZS
+sms_registry.register(
+	"payme",
+	r"^Payme: (?P<op>platezh|perevod|zachislenie|vozvrat) (?P<amount>{AMOUNT}) (?P<currency>{CURRENCY}),"
+	r"(?: (?P<merchant>[^,]+),)? karta (?P<card>[\d*]+)\."
+	r"(?: Ostatok: (?P<balance>{AMOUNT}) {CURRENCY})?",
+	{"platezh": EXPENSE, "perevod": EXPENSE, "zachislenie": INCOME, "vozvrat": INCOME},
+	senders=["PAYME"],
+	prefixes=["PAYME"],
+)
+
+# Международные карты банков (Kapitalbank, Ipak Yuli, TBC ...):
+# VISA *4321: Purchase 12.50 USD, AMAZON.COM, Balance: 340.00 USD
+sms_registry.register(
+	"visa_mastercard",
+	r"^(?:VISA|MASTERCARD|MC) \*(?P<card>\d{{4}}): (?P<op>purchase|withdrawal|refund|credit) "
+	r"(?P<amount>{AMOUNT}) (?P<currency>{CURRENCY}),\s*(?P<merchant>[^,]+?),\s*Balance: (?P<balance>{AMOUNT}) {CURRENCY}",
+	{"purchase": EXPENSE, "withdrawal": EXPENSE, "refund": INCOME, "credit": INCOME},
+	senders=["KAPITALBANK", "IPAKYULI", "TBCBANK", "HAMKORBANK"],
+	prefixes=["VISA", "MASTERCARD", "MC"],
+)
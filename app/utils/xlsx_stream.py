@@ -0,0 +1,124 @@
+# app/utils/xlsx_stream.py
+"""
+Потоковая запись XLSX (один лист) без сторонних библиотек.
+
+XLSX — это zip с несколькими XML. zipfile умеет писать в поток без seek
+(data descriptor после каждого файла), поэтому строки листа сжимаются и отдаются
+кусками по мере поступления: память не зависит от числа строк.
+Строки пишутся inline (без sharedStrings), без стилей.
+"""
+import re
+import zipfile
+from decimal import Decimal
+from typing import Iterable, List, Sequence
+from xml.sax.saxutils import escape
+
+_CONTENT_TYPES = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+	'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+	'<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+	'<Default Extension="xml" ContentType="application/xml"/>'
+	'<Override PartName="/xl/workbook.xml" '
+	'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+	'<Override PartName="/xl/worksheets/sheet1.xml" '
+	'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+	'</Types>'
+)
+_ROOT_RELS = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+	'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+	'<Relationship Id="rId1" '
+	'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+	'Target="xl/workbook.xml"/>'
+	'</Relationships>'
+)
+_WORKBOOK_RELS = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+	'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+	'<Relationship Id="rId1" '
+	'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+	'Target="worksheets/sheet1.xml"/>'
+	'</Relationships>'
+)
+_SHEET_HEAD = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+	'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+# Управляющие символы в XML 1.0 запрещены (в СМС встречаются)
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _workbook(sheet_name: str) -> str:
+	return (
+		'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+		'<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+		'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+		f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+		'</workbook>'
+	)
+
+
+def _cell(value) -> str:
+	if value is None:
+		return "<c/>"
+	if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+		return f'<c t="n"><v>{value}</v></c>'
+	text = _ILLEGAL_XML.sub("", escape(str(value)))
+	return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class _Sink:
+	"""Поток без seek для zipfile: копит байты, пока их не заберут."""
+
+	def __init__(self):
+		self._chunks: List[bytes] = []
+
+	def write(self, data) -> int:
+		self._chunks.append(bytes(data))
+		return len(data)
+
+	def flush(self):
+		pass
+
+	def drain(self) -> bytes:
+		data = b"".join(self._chunks)
+		self._chunks.clear()
+		return data
+
+
+class XlsxStreamWriter:
+	"""
+	writer = XlsxStreamWriter(header)
+	yield writer.open(); yield writer.write_rows(rows) ...; yield writer.close()
+	Каждый вызов возвращает готовые байты zip-потока (может быть b"").
+	"""
+
+	def __init__(self, header: Sequence[str], sheet_name: str = "Sheet1"):
+		self._header = header
+		self._sheet_name = sheet_name
+		self._sink = _Sink()
+		self._zip = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)
+		self._sheet = None
+
+	def open(self) -> bytes:
+		self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES)
+		self._zip.writestr("_rels/.rels", _ROOT_RELS)
+		self._zip.writestr("xl/workbook.xml", _workbook(self._sheet_name))
+		self._zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+		# force_zip64: размер листа заранее неизвестен и может перевалить за 4 ГБ
+		self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+		self._sheet.write(_SHEET_HEAD.encode())
+		return self.write_rows([self._header])
+
+	def write_rows(self, rows: Iterable[Sequence]) -> bytes:
+		xml = "".join("<row>" + "".join(_cell(value) for value in row) + "</row>" for row in rows)
+		self._sheet.write(xml.encode())
+		return self._sink.drain()
+
+	def close(self) -> bytes:
+		self._sheet.write(_SHEET_TAIL.encode())
+		self._sheet.close()
+		self._zip.close()
+		return self._sink.drain()
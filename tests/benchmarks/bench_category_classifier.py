@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Бенчмарк: память и скорость индекса мерчантов классификатора категорий
+(CompactIndex на array('q')) против dict[str, int] с нормализованными строками.
+
+    python -m tests.benchmarks.bench_category_classifier
+"""
+import os
+import sys
+import time
+import uuid
+
+from app.modules.finance.models import TransactionType
+from app.modules.finance.services.category_classifier import CategoryClassifier, CompactIndex, merchant_keys, merchant_tokens
+
+MERCHANTS = int(os.getenv("BENCH_MERCHANTS", 1_000_000))
+LOOKUPS = int(os.getenv("BENCH_LOOKUPS", 200_000))
+
+EXPENSE = TransactionType.EXPENSE
+
+
+def merchant_name(i: int) -> str:
+	# Цифры нормализация выбрасывает — имена мерчантов из букв (i в 26-ричной записи)
+	word = ""
+	while True:
+		i, rest = divmod(i, 26)
+		word += chr(ord("a") + rest)
+		if not i:
+			break
+	return f"{word.upper()} SHOP MCHJ"
+
+
+def dict_size(mapping: dict) -> int:
+	return sys.getsizeof(mapping) + sum(sys.getsizeof(key) for key in mapping)
+
+
+def main():
+	names = [merchant_name(i) for i in range(MERCHANTS)]
+
+	started = time.perf_counter()
+	index = CompactIndex()
+	for i, name in enumerate(names):
+		index.set(merchant_keys(EXPENSE, name)[0], i % 500)
+	compact_build = time.perf_counter() - started
+
+	plain = {" ".join(merchant_tokens(name)): i % 500 for i, name in enumerate(names)}
+
+	print(f"Мерчантов: {MERCHANTS:,}")
+	print(f"CompactIndex:   {index.nbytes / 2**20:8.1f} МБ ({index.nbytes / MERCHANTS:.0f} Б/ключ), построение {compact_build:.1f} с")
+	print(f"dict[str, int]: {dict_size(plain) / 2**20:8.1f} МБ ({dict_size(plain) / MERCHANTS:.0f} Б/ключ)")
+
+	classifier = CategoryClassifier(users_maxsize=1, user_ttl_seconds=3600, history_limit=0)
+	classifier._global = index
+	user_id = uuid.uuid4()
+	sample = [names[i * 7919 % MERCHANTS] for i in range(LOOKUPS)]
+	started = time.perf_counter()
+	found = sum(classifier.suggest(user_id, EXPENSE, name) is not None for name in sample)
+	elapsed = time.perf_counter() - started
+	print(f"suggest(): {LOOKUPS / elapsed:,.0f} подсказок/с, найдено {found}/{LOOKUPS}")
+
+
+if __name__ == "__main__":
+	main()
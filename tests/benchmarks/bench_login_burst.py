@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Бенчмарк: влияние всплеска логинов на задержку остальных запросов.
+
+Поднимает ASGI-приложение с тремя ручками и гоняет его через httpx.ASGITransport:
+  /ping           — "горячая" лёгкая ручка;
+  /login-blocking — async-ручка, вызывающая bcrypt прямо в event loop (как было);
+  /login-pooled   — async-ручка, отдающая bcrypt в выделенный пул (как сейчас).
+Во время всплеска из LOGINS логинов меряется p50/p99 задержки /ping.
+
+    python -m tests.benchmarks.bench_login_burst
+"""
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_password, verify_password_async
+
+LOGINS = 20
+PINGS = 200
+
+PASSWORD = "password123"
+HASHED = get_password_hash(PASSWORD)
+
+app = FastAPI()
+
+
+@app.get("/ping")
+async def ping():
+	return {"ok": True}
+
+
+@app.post("/login-blocking")
+async def login_blocking():
+	return {"ok": verify_password(PASSWORD, HASHED)}
+
+
+@app.post("/login-pooled")
+async def login_pooled():
+	return {"ok": await verify_password_async(PASSWORD, HASHED)}
+
+
+def percentile(samples: list[float], p: float) -> float:
+	samples = sorted(samples)
+	return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+async def burst(client: httpx.AsyncClient, login_path: str) -> tuple[float, float, float, float]:
+	ping_ms = []
+	
+	async def pings():
+		# Пинги идут по расписанию (каждые 2 мс); задержку считаем от запланированного
+		# момента — так в неё попадает и время, когда event loop был заблокирован.
+		t0 = time.perf_counter()
+		for i in range(PINGS):
+			scheduled = t0 + i * 0.002
+			await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+			await client.get("/ping")
+			ping_ms.append((time.perf_counter() - scheduled) * 1000)
+	
+	async def login(i: int):
+		# Логины растянуты по времени, чтобы попадать между пингами
+		await asyncio.sleep(i * 0.01)
+		await client.post(login_path)
+	
+	start = time.perf_counter()
+	await asyncio.gather(pings(), *[login(i) for i in range(LOGINS)])
+	total_ms = (time.perf_counter() - start) * 1000
+	
+	return statistics.median(ping_ms), percentile(ping_ms, 0.99), max(ping_ms), total_ms
+
+
+async def main():
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+		print(f"bcrypt rounds={settings.BCRYPT_ROUNDS}, pool={settings.PASSWORD_HASH_WORKERS}, "
+		      f"logins={LOGINS}, pings={PINGS}")
+		print(f"{'mode':<16} {'ping p50, ms':>13} {'ping p99, ms':>13} {'ping max, ms':>13} {'total, ms':>10}")
+		for path in ("/login-blocking", "/login-pooled"):
+			p50, p99, worst, total = await burst(client, path)
+			print(f"{path.strip('/'):<16} {p50:>13.2f} {p99:>13.2f} {worst:>13.2f} {total:>10.0f}")
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
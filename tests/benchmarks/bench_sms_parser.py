@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Бенчмарк: пропускная способность парсера банковских SMS (сообщений в секунду)
+на корпусе tests/data/sms_corpus.jsonl. Для сравнения — перебор всех форматов
+реестра без индекса по отправителю/префиксу.
+
+Реальный реестр — десятки банков, поэтому к встроенным форматам добавляется
+BENCH_EXTRA_FORMATS однотипных форматов других "банков".
+
+    python -m tests.benchmarks.bench_sms_parser
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+from app.modules.finance.models import TransactionType
+from app.utils.sms_parser import sms_registry
+
+MESSAGES = int(os.getenv("BENCH_MESSAGES", 200_000))
+EXTRA_FORMATS = int(os.getenv("BENCH_EXTRA_FORMATS", 50))
+CORPUS = [
+	json.loads(line)
+	for line in (Path(__file__).parent.parent / "data" / "sms_corpus.jsonl").read_text().splitlines()
+]
+
+
+def all_formats():
+	formats = []
+	for group in (*sms_registry._by_sender.values(), *sms_registry._by_prefix.values(), sms_registry._fallback):
+		formats.extend(f for f in group if f not in formats)
+	return formats
+
+
+def parse_without_index(text: str, formats) -> bool:
+	text = text.strip()
+	for sms_format in formats:
+		match = sms_format.regex.search(text)
+		if match and sms_registry._build(sms_format, match, text):
+			return True
+	return False
+
+
+def register_extra_formats():
+	for i in range(EXTRA_FORMATS):
+		sms_registry.register(
+			f"bank{i}",
+			rf"BANK{i} \*(?P<card>\d{{{{4}}}}): (?P<op>spisanie|zachislenie) (?P<amount>{{AMOUNT}}) (?P<currency>{{CURRENCY}})"
+			rf"(?:, (?P<merchant>[^,]+))?(?:, ostatok (?P<balance>{{AMOUNT}}) {{CURRENCY}})?",
+			{"spisanie": TransactionType.EXPENSE, "zachislenie": TransactionType.INCOME},
+			senders=[f"BANK{i}"],
+			prefixes=[f"BANK{i}"],
+		)
+
+
+def main():
+	register_extra_formats()
+	messages = [(CORPUS[i % len(CORPUS)]["text"], CORPUS[i % len(CORPUS)]["sender"]) for i in range(MESSAGES)]
+	
+	start = time.perf_counter()
+	parsed = sum(1 for text, sender in messages if sms_registry.parse(text, sender=sender))
+	indexed = time.perf_counter() - start
+	
+	formats = all_formats()
+	start = time.perf_counter()
+	for text, _ in messages:
+		parse_without_index(text, formats)
+	brute = time.perf_counter() - start
+	
+	print(f"{MESSAGES} сообщений, распознано {parsed}, форматов в реестре: {len(formats)}")
+	print(f"  реестр с индексом: {MESSAGES / indexed:10.0f} сообщ/с")
+	print(f"  перебор форматов:  {MESSAGES / brute:10.0f} сообщ/с  (индекс x{brute / indexed:.1f})")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.pool import StaticPool
+
+from app.modules.auth.user_cache import user_cache
+from app.modules.finance.services.rate_cache import rate_cache
+
+
+# Кэши общие на процесс: чистим их, чтобы тесты не видели данные соседей
+@pytest.fixture(autouse=True)
+def reset_caches():
+    rate_cache.invalidate()
+    user_cache.clear()
+    yield
+    rate_cache.invalidate()
+    user_cache.clear()
+
+
+# Async-тесты (AsyncSession) гоняем через pytest-плагин anyio на asyncio
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+# Чистая БД в памяти на каждый тест: StaticPool — одно соединение, иначе у каждого своя пустая база
+@pytest.fixture(name="engine")
+async def engine_fixture():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture(name="session")
+async def session_fixture(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+
+# Ловит N+1: assert_max_queries(engine, n) падает, если внутри блока ушло больше n SQL-запросов
+@pytest.fixture
+def assert_max_queries():
+    @contextmanager
+    def _assert(engine, expected: int):
+        engine = getattr(engine, "sync_engine", engine)  # AsyncEngine -> Engine
+        statements = []
+        
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+        
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        
+        assert len(statements) <= expected, (
+            f"Ожидалось не больше {expected} запросов, выполнено {len(statements)}:\n" + "\n".join(statements)
+        )
+    
+    return _assert
@@ -0,0 +1,169 @@
+import json
+
+import pytest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.modules.analytics.router import _stream_net_worth
+from app.modules.analytics.service import AnalyticsService, Granularity
+from app.modules.auth.models import User
+from app.modules.finance.models import (
+    Category, Currency, CurrencyRate, MonthlyAggregate, Transaction, TransactionType, Wallet,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(name="user")
+async def user_fixture(session: AsyncSession):
+    user = User(phone_number="998901234567", hashed_password="pw")
+    uzs = Currency(code="860", char_code="UZS", name="Sum", nominal=1)
+    usd = Currency(code="840", char_code="USD", name="Dollar", nominal=1)
+    eur = Currency(code="978", char_code="EUR", name="Euro", nominal=1)
+    food = Category(name="Food")
+    session.add_all([user, uzs, usd, eur, food])
+    await session.commit()
+    
+    usd_wallet = Wallet(name="USD Cash", currency_id=usd.id, user_id=user.id)
+    uzs_card = Wallet(name="UZS Card", currency_id=uzs.id, user_id=user.id)
+    session.add_all([
+        usd_wallet, uzs_card,
+        CurrencyRate(currency_id=usd.id, rate=Decimal("12000.00"), date=date(2026, 1, 5)),
+        CurrencyRate(currency_id=usd.id, rate=Decimal("13000.00"), date=date(2026, 2, 3)),
+    ])
+    await session.commit()
+    
+    def row(wallet, month, tx_type, total, category_id=0):
+        return MonthlyAggregate(user_id=user.id, wallet_id=wallet.id, month=month, type=tx_type,
+                                category_id=category_id, total=Decimal(total), count=1)
+    
+    session.add_all([
+        row(usd_wallet, date(2026, 1, 1), TransactionType.EXPENSE, "10.00", food.id),
+        row(uzs_card, date(2026, 1, 1), TransactionType.EXPENSE, "50000.00", food.id),
+        row(uzs_card, date(2026, 1, 1), TransactionType.INCOME, "1000000.00"),
+        row(usd_wallet, date(2026, 2, 1), TransactionType.EXPENSE, "10.00", food.id),
+    ])
+    await session.commit()
+    return user
+
+
+async def test_summary_converts_each_month_at_its_own_rate(session: AsyncSession, engine, user, assert_max_queries):
+    service = AnalyticsService(session)
+    
+    # Валюта отчета + один запрос данных
+    with assert_max_queries(engine, 2):
+        summary = await service.monthly_summary(user.id, date(2026, 1, 20))
+    
+    assert summary == {
+        "income": Decimal("1000000.00"), "expense": Decimal("170000.00"),
+        "total": Decimal("830000.00"), "currency": "UZS",
+    }
+    
+    in_usd = await service.monthly_summary(user.id, date(2026, 1, 20), currency="USD")
+    assert in_usd["expense"] == Decimal("14.17")
+    assert in_usd["income"] == Decimal("83.33")
+    
+    # Февраль — по курсу на конец февраля
+    assert (await service.monthly_summary(user.id, date(2026, 2, 1)))["expense"] == Decimal("130000.00")
+
+
+async def test_expenses_by_category_and_missing_rate(session: AsyncSession, user):
+    service = AnalyticsService(session)
+    
+    food_id = (await session.exec(select(Category.id).where(Category.name == "Food"))).one()
+    assert await service.expenses_by_category(user.id) == [
+        {"id": food_id, "category": "Food", "amount": Decimal("300000.00")}
+    ]
+    assert await service.expenses_by_category(user.id, month=date(2026, 2, 10)) == [
+        {"id": food_id, "category": "Food", "amount": Decimal("130000.00")}
+    ]
+    
+    with pytest.raises(HTTPException) as exc:
+        await service.monthly_summary(user.id, date(2026, 1, 1), currency="EUR")
+    assert exc.value.status_code == 400
+    
+    with pytest.raises(HTTPException) as exc:
+        await service.monthly_summary(user.id, date(2026, 1, 1), currency="XXX")
+    assert exc.value.status_code == 404
+
+
+async def test_category_subtrees_roll_up(session: AsyncSession, engine, user, assert_max_queries):
+    food = (await session.exec(select(Category).where(Category.name == "Food"))).one()
+    uzs_card = (await session.exec(select(Wallet).where(Wallet.name == "UZS Card"))).one()
+    cafes = Category(name="Cafes", parent_id=food.id)
+    transport = Category(name="Transport")
+    session.add_all([cafes, transport])
+    await session.commit()
+    coffee = Category(name="Coffee", parent_id=cafes.id)
+    session.add(coffee)
+    await session.commit()
+    
+    def expense(category, total):
+        return MonthlyAggregate(user_id=user.id, wallet_id=uzs_card.id, month=date(2026, 1, 1),
+                                type=TransactionType.EXPENSE, category_id=category.id, total=Decimal(total), count=1)
+    
+    session.add_all([expense(cafes, "20000.00"), expense(coffee, "5000.00"), expense(transport, "400000.00")])
+    await session.commit()
+    
+    service = AnalyticsService(session)
+    with assert_max_queries(engine, 2):
+        roots = await service.expenses_by_category(user.id)
+    assert [(r["category"], r["amount"]) for r in roots] == [
+        ("Transport", Decimal("400000.00")), ("Food", Decimal("325000.00")),
+    ]
+    
+    drill = await service.category_drilldown(user.id, food.id, month=date(2026, 1, 1))
+    assert (drill["amount"], drill["own"]) == (Decimal("195000.00"), Decimal("170000.00"))
+    assert [(c["category"], c["amount"]) for c in drill["children"]] == [("Cafes", Decimal("25000.00"))]
+    
+    with pytest.raises(HTTPException) as exc:
+        await service.category_drilldown(user.id, 999)
+    assert exc.value.status_code == 404
+
+
+async def test_net_worth_series(session: AsyncSession, engine, user, assert_max_queries):
+    usd_wallet, uzs_card = (await session.exec(select(Wallet).order_by(Wallet.id))).all()
+    usd_wallet.balance, uzs_card.balance = Decimal("90.00"), Decimal("950000.00")
+    session.add_all([
+        usd_wallet, uzs_card,
+        Transaction(wallet_id=uzs_card.id, amount=Decimal("1000000.00"), type=TransactionType.INCOME,
+                    created_at=datetime(2026, 1, 3, 9, tzinfo=timezone.utc)),
+        Transaction(wallet_id=uzs_card.id, amount=Decimal("50000.00"), type=TransactionType.EXPENSE,
+                    created_at=datetime(2026, 1, 20, 18, tzinfo=timezone.utc)),
+        Transaction(wallet_id=usd_wallet.id, amount=Decimal("10.00"), type=TransactionType.EXPENSE,
+                    created_at=datetime(2026, 2, 4, 8, tzinfo=timezone.utc)),
+    ])
+    await session.commit()
+    
+    service = AnalyticsService(session)
+    with assert_max_queries(engine, 5):
+        report = await service.net_worth(user.id, date(2026, 1, 1), date(2026, 2, 28), Granularity.MONTH)
+    
+    assert [w["currency"] for w in report["wallets"]] == ["USD", "UZS"]
+    assert [(p["date"], p["balances"]) for p in report["series"]] == [
+        (date(2026, 1, 1), [Decimal("100.00"), Decimal("950000.00")]),
+        (date(2026, 2, 1), [Decimal("90.00"), Decimal("950000.00")]),
+    ]
+    # Январь по курсу на 31.01 (12000), февраль — на 28.02 (13000)
+    assert [p["total"] for p in report["series"]] == [Decimal("2150000.00"), Decimal("2120000.00")]
+    
+    daily = await service.net_worth(user.id, date(2026, 1, 5), date(2026, 1, 6), Granularity.DAY, "usd")
+    assert daily["currency"] == "USD"
+    assert [(p["balances"][1], p["total"]) for p in daily["series"]] == [
+        (Decimal("1000000.00"), Decimal("183.33")), (Decimal("1000000.00"), Decimal("183.33")),
+    ]
+    # Курса USD до 05.01 нет
+    with pytest.raises(HTTPException) as exc:
+        await service.net_worth(user.id, date(2026, 1, 2), date(2026, 1, 4), Granularity.DAY)
+    assert exc.value.status_code == 400
+    
+    # Потоковое тело — валидный JSON той же формы
+    body = json.loads("".join(_stream_net_worth(dict(daily))))
+    # Суммы строками, без потери точности
+    assert body["series"][0] == {"date": "2026-01-05", "balances": ["100.00", "1000000.00"], "total": "183.33"}
+    
+    weekly = await service.net_worth(user.id, date(2026, 1, 21), date(2026, 1, 21), Granularity.WEEK)
+    assert [p["date"] for p in weekly["series"]] == [date(2026, 1, 19)]
+    assert weekly["series"][0]["balances"][1] == Decimal("950000.00")
@@ -0,0 +1,113 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.security import create_access_token, get_password_hash
+from app.modules.auth.dependencies import get_current_admin, get_current_user, get_current_user_readonly
+from app.modules.auth.models import User, UserRole
+from app.modules.finance import models as finance_models  # noqa: F401 (связи User -> Wallet/Category)
+from app.modules.auth.service import AuthService
+from app.modules.auth.user_cache import UserCache, user_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(name="user")
+async def user_fixture(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = User(phone_number="998901234567", hashed_password=get_password_hash("password123"))
+        session.add(user)
+        await session.commit()
+        return user
+
+
+def count_statements(engine) -> list:
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+async def test_get_current_user_is_cached(engine, user):
+    token = create_access_token({"sub": str(user.id)})
+    statements = count_statements(engine)
+    
+    async with AsyncSession(engine) as session:
+        first = await get_current_user(token, session)
+        second = await get_current_user(token, session)
+    
+    assert first.id == second.id == user.id
+    assert second.phone_number == "998901234567"
+    assert len(statements) == 1
+    assert user_cache.stats()["hits"] == 1
+
+
+async def test_deactivation_invalidates_cache(engine, user):
+    token = create_access_token({"sub": str(user.id)})
+    async with AsyncSession(engine) as session:
+        await get_current_user(token, session)
+        
+        db_user = await session.get(User, user.id)
+        db_user.is_active = False
+        session.add(db_user)
+        await session.commit()
+        
+        # Пока снимок не сброшен, берем его из кэша
+        assert (await get_current_user(token, session)).is_active is True
+        
+        user_cache.invalidate(user.id)
+        with pytest.raises(HTTPException) as exc:
+            await get_current_user(token, session)
+        assert exc.value.status_code == 403
+
+
+async def test_change_password_invalidates_cache(engine, user):
+    token = create_access_token({"sub": str(user.id)})
+    async with AsyncSession(engine) as session:
+        await get_current_user(token, session)
+        await AuthService(session).change_password(user.id, "password123", "newpassword123")
+        
+        assert user_cache.stats()["size"] == 0
+        assert await AuthService(session).authenticate(user.phone_number, "newpassword123") is not None
+
+
+async def test_invalid_token_is_rejected(engine):
+    async with AsyncSession(engine) as session:
+        with pytest.raises(HTTPException) as exc:
+            await get_current_user("not-a-token", session)
+        assert exc.value.status_code == 401
+        
+        token = create_access_token({"sub": str(uuid.uuid4())})
+        with pytest.raises(HTTPException):
+            await get_current_user(token, session)
+
+
+async def test_readonly_trusts_token_claims(engine, user, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    token = create_access_token({"sub": str(user.id), "role": UserRole.ADMIN.value})
+    statements = count_statements(engine)
+    
+    async with AsyncSession(engine) as session:
+        current = await get_current_user_readonly(token, session)
+    
+    assert current.id == user.id
+    assert current.role == UserRole.ADMIN
+    assert statements == []
+
+
+def test_user_cache_ttl_expires():
+    cache = UserCache(ttl_seconds=0, maxsize=10)
+    user = User(id=uuid.uuid4(), phone_number="998901234567", hashed_password="x")
+    cache.set(user)
+    assert cache.get(user.id) is None
+
+
+async def test_admin_dependency_rejects_regular_users(user):
+    with pytest.raises(HTTPException) as exc:
+        await get_current_admin(user)
+    assert exc.value.status_code == 403
+    
+    admin = User(phone_number="998900000000", hashed_password="pw", role=UserRole.ADMIN)
+    assert await get_current_admin(admin) is admin
@@ -0,0 +1,92 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.modules.auth.models import User
+from app.modules.finance.models import BalanceSnapshot, Category, Currency, Transaction, TransactionType, Wallet
+from app.modules.finance.schemas import TransactionUpdate
+from app.modules.finance.services import balance_ledger
+from app.modules.finance.services.transaction_service import TransactionService
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(name="wallet")
+async def wallet_fixture(session: AsyncSession):
+    """Кошелек с начальным балансом 100 и тремя операциями: +50 (1 марта), −30 (5 марта), +20 (9 марта)."""
+    user = User(phone_number="998901112233", hashed_password="pw")
+    uzs = Currency(code="860", char_code="UZS", name="Sum", nominal=1)
+    category = Category(name="Food")
+    session.add_all([user, uzs, category])
+    await session.commit()
+    
+    wallet = Wallet(name="Cash", balance=Decimal("140.00"), currency_id=uzs.id, user_id=user.id)
+    session.add(wallet)
+    await session.commit()
+    for day, amount, tx_type in ((1, "50.00", TransactionType.INCOME), (5, "30.00", TransactionType.EXPENSE),
+                                 (9, "20.00", TransactionType.INCOME)):
+        session.add(Transaction(wallet_id=wallet.id, amount=Decimal(amount), type=tx_type, category_id=category.id,
+                                created_at=datetime(2026, 3, day, tzinfo=timezone.utc)))
+    await session.commit()
+    return user, wallet
+
+
+async def test_balance_at_without_and_with_snapshots(session: AsyncSession, wallet):
+    _, wallet = wallet
+    
+    # Без снимков — назад от текущего баланса
+    assert await balance_ledger.balance_at(session, wallet.id, datetime(2026, 2, 1, tzinfo=timezone.utc)) == Decimal("100.00")
+    assert await balance_ledger.balance_at(session, wallet.id, datetime(2026, 3, 6, tzinfo=timezone.utc)) == Decimal("120.00")
+    
+    report = await balance_ledger.reconcile(session, now=NOW)
+    assert (report.wallets, report.baselined, report.snapshots, report.drifts) == (1, 1, 1, [])
+    snapshot = (await session.exec(select(BalanceSnapshot))).one()
+    assert snapshot.balance == Decimal("140.00")
+    
+    # Со снимком — вперед от него и назад до него дают ту же историю
+    assert await balance_ledger.balance_at(session, wallet.id, datetime(2026, 3, 2, tzinfo=timezone.utc)) == Decimal("150.00")
+    assert await balance_ledger.balance_at(session, wallet.id, NOW) == Decimal("140.00")
+
+
+async def test_reconcile_reports_drift_and_takes_snapshots(session: AsyncSession, wallet, monkeypatch):
+    user, wallet = wallet
+    await balance_ledger.reconcile(session, now=NOW)
+    
+    monkeypatch.setattr(settings, "BALANCE_SNAPSHOT_EVERY", 2)
+    session.add_all([
+        Transaction(wallet_id=wallet.id, amount=Decimal("5.00"), type=TransactionType.EXPENSE,
+                    created_at=NOW + timedelta(hours=1)),
+        Transaction(wallet_id=wallet.id, amount=Decimal("7.00"), type=TransactionType.EXPENSE,
+                    created_at=NOW + timedelta(hours=2)),
+    ])
+    wallet.balance = Decimal("128.00")
+    session.add(wallet)
+    await session.commit()
+    
+    report = await balance_ledger.reconcile(session, now=NOW + timedelta(hours=3))
+    assert report.drifts == [] and report.snapshots == 1
+    assert await balance_ledger.balance_at(session, wallet.id, NOW + timedelta(hours=3)) == Decimal("128.00")
+    
+    # Баланс поменяли в обход операций — сверка это видит
+    wallet.balance = Decimal("1000.00")
+    session.add(wallet)
+    await session.commit()
+    report = await balance_ledger.reconcile(session, chunk_size=1, now=NOW + timedelta(hours=3))
+    assert [(d.wallet_id, d.diff) for d in report.drifts] == [(wallet.id, Decimal("872.00"))]
+
+
+async def test_backdated_edit_invalidates_snapshots(session: AsyncSession, wallet):
+    user, wallet = wallet
+    await balance_ledger.reconcile(session, now=NOW)
+    
+    first = (await session.exec(select(Transaction).order_by(Transaction.created_at))).first()
+    await TransactionService(session).update_transaction(first.id, TransactionUpdate(amount=Decimal("60.00")), user.id)
+    
+    assert (await session.exec(select(BalanceSnapshot))).all() == []
+    await session.refresh(wallet)
+    assert wallet.balance == Decimal("150.00")
+    assert await balance_ledger.balance_at(session, wallet.id, datetime(2026, 3, 2, tzinfo=timezone.utc)) == Decimal("160.00")
@@ -0,0 +1,82 @@
+import json
+import uuid
+
+import pytest
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.requests import Request
+from app.modules.auth.models import User
+from app.modules.finance.models import Category
+from app.modules.finance.routes.categories import create_category, delete_category, get_categories
+from app.modules.finance.schemas import CategoryCreate
+from app.modules.finance.services.category_cache import CachedTree, CategoryTreeCache, category_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    category_cache.bump_system()
+    yield
+    category_cache.bump_system()
+
+
+def make_request(etag=None) -> Request:
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/categories", "headers": headers})
+
+
+async def test_tree_is_cached_and_revalidated_with_etag(session: AsyncSession, engine, assert_max_queries):
+    alice = User(phone_number="998901111111", hashed_password="pw")
+    bob = User(phone_number="998902222222", hashed_password="pw")
+    food = Category(name="Food")
+    session.add_all([alice, bob, food])
+    await session.commit()
+    await create_category(CategoryCreate(name="Cafes", parent_id=food.id), session, alice)
+    
+    # Первый запрос: системные + свои; второй пользователь берет системные из общего кэша
+    with assert_max_queries(engine, 2):
+        first = await get_categories(make_request(), session, alice)
+    with assert_max_queries(engine, 1):
+        await get_categories(make_request(), session, bob)
+    
+    tree = json.loads(first.body)
+    assert [(c["name"], [child["name"] for child in c["children"]]) for c in tree] == [("Food", ["Cafes"])]
+    
+    with assert_max_queries(engine, 0):
+        again = await get_categories(make_request(), session, alice)
+        not_modified = await get_categories(make_request(first.headers["etag"]), session, alice)
+    assert again.body == first.body
+    assert not_modified.status_code == 304 and not_modified.headers["etag"] == first.headers["etag"]
+    
+    # Запись категории поднимает версию: новое тело, новый ETag
+    cafes = (await session.exec(select(Category).where(Category.name == "Cafes"))).one()
+    await delete_category(cafes.id, session, alice)
+    changed = await get_categories(make_request(first.headers["etag"]), session, alice)
+    assert changed.status_code == 200 and changed.headers["etag"] != first.headers["etag"]
+    assert json.loads(changed.body)[0]["children"] == []
+
+
+async def test_stale_load_is_not_stored():
+    user_id = uuid.uuid4()
+    versions = category_cache.versions(user_id)
+    category_cache.bump_user(user_id)  # запись категорий, пока "грузили" дерево
+    category_cache.set_tree(user_id, versions, CachedTree(etag='"old"', body=b"[]"))
+    assert category_cache.get_tree(user_id) is None
+
+
+def test_user_versions_are_bounded():
+    cache = CategoryTreeCache(ttl_seconds=60, maxsize=2)
+    users = [uuid.uuid4() for _ in range(5)]
+    stale = cache.versions(users[0])
+    for user_id in users:
+        cache.bump_user(user_id)
+    assert cache.stats()["versions"] == 2
+    
+    # Версия первого вытеснена, но загрузка, начатая до его записи, все равно не сохранится
+    cache.set_tree(users[0], stale, CachedTree(etag='"old"', body=b"[]"))
+    assert cache.get_tree(users[0]) is None
+    
+    fresh = cache.versions(users[0])
+    cache.set_tree(users[0], fresh, CachedTree(etag='"new"', body=b"[]"))
+    assert cache.get_tree(users[0]).etag == '"new"'
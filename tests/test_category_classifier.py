@@ -0,0 +1,165 @@
+import pytest
+from decimal import Decimal
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.modules.auth.models import User
+from app.modules.finance.models import Category, Currency, TransactionType, Wallet
+from app.modules.finance.schemas import TransactionCreate, TransactionUpdate
+from app.modules.finance.services.category_classifier import (
+    CompactIndex, category_classifier, merchant_keys, merchant_tokens, vote,
+)
+from app.modules.finance.services.transaction_service import TransactionService
+
+pytestmark = pytest.mark.anyio
+
+EXPENSE = TransactionType.EXPENSE
+
+
+@pytest.fixture(autouse=True)
+def clean_classifier():
+    category_classifier.clear()
+    yield
+    category_classifier.clear()
+
+
+@pytest.fixture(name="data")
+async def data_fixture(session: AsyncSession):
+    user = User(phone_number="998901234567", hashed_password="pw")
+    uzs = Currency(code="860", char_code="UZS", name="Sum", nominal=1)
+    session.add_all([user, uzs])
+    await session.commit()
+
+    food = Category(name="Food")
+    mobile = Category(name="Mobile")
+    wallet = Wallet(name="Card", balance=Decimal("1000000.00"), currency_id=uzs.id, user_id=user.id)
+    session.add_all([food, mobile, wallet])
+    await session.commit()
+    return user, food, mobile, wallet
+
+
+def expense(wallet_id: int, description: str, category_id=None) -> TransactionCreate:
+    return TransactionCreate(
+        wallet_id=wallet_id, amount=Decimal("1000.00"), type=EXPENSE,
+        category_id=category_id, description=description,
+    )
+
+
+def test_merchant_normalization():
+    assert merchant_tokens("KORZINKA MCHJ #12, Yunusobod") == ["korzinka", "yunusobod"]
+    assert merchant_keys(EXPENSE, "Korzinka MCHJ") == merchant_keys(EXPENSE, "KORZINKA 7")
+    # Ключ фразы, затем ключ первого слова (сеть магазинов)
+    assert merchant_keys(EXPENSE, "Korzinka Yunusobod")[1] == merchant_keys(EXPENSE, "Korzinka")[0]
+    # Доход и расход от одного мерчанта (покупка / возврат) — разные ключи
+    assert merchant_keys(EXPENSE, "Korzinka") != merchant_keys(TransactionType.INCOME, "Korzinka")
+    assert merchant_keys(EXPENSE, "12345 #") == ()
+
+
+def test_compact_index_grows_and_overwrites():
+    index = CompactIndex()
+    for key in range(1, 5001):
+        index.set(key * 7919, key)
+    index.set(7919, -1)
+
+    assert len(index) == 5000
+    assert index.get(7919) == -1
+    assert index.get(5000 * 7919) == 5000
+    assert index.get(123) is None
+    assert index.nbytes < 5000 * 40
+
+
+def test_vote_keeps_majority():
+    index = CompactIndex()
+    for category_id in (1, 1, 2, 1, 2, 2, 2):
+        vote(index, 42, category_id)
+    assert index.get(42) >> 16 == 2
+
+
+async def test_autofill_from_history_and_recategorization(session: AsyncSession, data):
+    user, food, mobile, wallet = data
+    service = TransactionService(session)
+
+    await service.create_transaction(expense(wallet.id, "KORZINKA MCHJ", food.id), user.id)
+    await session.commit()
+
+    # Индекс пользователя еще не загружен: автоподстановка грузит его из истории
+    category_classifier.clear()
+    tx = await service.create_transaction(expense(wallet.id, "Korzinka Yunusobod"), user.id)
+    assert tx.category_id == food.id
+    await session.commit()
+
+    # Пользователь исправил категорию — следующая операция берет новую
+    await service.update_transaction(tx.id, TransactionUpdate(category_id=mobile.id), user.id)
+    tx = await service.create_transaction(expense(wallet.id, "Korzinka Yunusobod"), user.id)
+    assert tx.category_id == mobile.id
+
+    # Сеть целиком ("korzinka") помнит последний выбор, незнакомый мерчант — ошибка
+    tx = await service.create_transaction(expense(wallet.id, "Korzinka Chilonzor"), user.id)
+    assert tx.category_id == mobile.id
+    with pytest.raises(HTTPException) as exc:
+        await service.create_transaction(expense(wallet.id, "Beeline"), user.id)
+    assert exc.value.status_code == 400
+
+
+async def test_batch_autofill_reports_unknown(session: AsyncSession, data):
+    user, food, mobile, wallet = data
+    service = TransactionService(session)
+
+    await service.create_transactions_batch([expense(wallet.id, "Beeline", mobile.id)], user.id)
+    # Подсказки пакета считаются до его вставки, поэтому учимся на предыдущем пакете
+    results = await service.create_transactions_batch([
+        expense(wallet.id, "BEELINE UZ"),
+        expense(wallet.id, "Unknown shop"),
+        expense(wallet.id, "Evos", food.id),
+    ], user.id)
+
+    assert results[0][0].category_id == mobile.id
+    assert results[1][0] is None and "категорию" in results[1][1]
+    assert results[2][0].category_id == food.id
+
+
+async def test_rolled_back_choice_is_not_learned(session: AsyncSession, data):
+    user, food, mobile, wallet = data
+    # После rollback объекты сессии просрочены — работаем с id
+    user_id, food_id, wallet_id = user.id, food.id, wallet.id
+    service = TransactionService(session)
+    await category_classifier.ensure_user(session, user_id)
+    
+    await service.create_transaction(expense(wallet_id, "Korzinka", food_id), user_id)
+    await service.create_transactions_batch([expense(wallet_id, "Beeline", mobile.id)], user_id)
+    assert category_classifier.suggest(user_id, EXPENSE, "Korzinka") is None  # до коммита
+    await session.rollback()
+    assert category_classifier.suggest(user_id, EXPENSE, "Korzinka") is None
+    assert category_classifier.suggest(user_id, EXPENSE, "Beeline") is None
+    
+    await service.create_transaction(expense(wallet_id, "Korzinka", food_id), user_id)
+    await session.commit()
+    assert category_classifier.suggest(user_id, EXPENSE, "Korzinka") == food_id
+
+
+async def test_global_index_uses_system_categories_only(session: AsyncSession, engine, data):
+    user, food, _, wallet = data
+    private = Category(name="Mine", user_id=user.id)
+    session.add(private)
+    await session.commit()
+
+    service = TransactionService(session)
+    await service.create_transaction(expense(wallet.id, "Evos", food.id), user.id)
+    await service.create_transaction(expense(wallet.id, "Makro", private.id), user.id)
+    await session.commit()
+
+    assert await category_classifier.build_global(lambda: AsyncSession(engine)) == 1
+
+    other = User(phone_number="998907654321", hashed_password="pw")
+    session.add(other)
+    await session.commit()
+    await category_classifier.ensure_user(session, other.id)
+    assert category_classifier.suggest(other.id, EXPENSE, "EVOS MCHJ") == food.id
+    assert category_classifier.suggest(other.id, EXPENSE, "Makro") is None
+
+
+def test_category_still_required_without_description():
+    with pytest.raises(ValidationError):
+        TransactionCreate(wallet_id=1, amount=Decimal("1"), type=EXPENSE)
+    assert TransactionCreate(wallet_id=1, amount=Decimal("1"), type=EXPENSE, description="Evos").category_id is None
@@ -0,0 +1,149 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import event
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.modules.finance.models import Currency, CurrencyRate
+from app.modules.finance.services.currency_parser import CurrencyClient
+
+
+def cbu_item(ccy: str, code: str, rate: str, nominal: str = "1", day: str = "10.02.2026") -> dict:
+    return {
+        "id": int(code), "Code": code, "Ccy": ccy, "CcyNm_RU": ccy,
+        "Nominal": nominal, "Rate": rate, "Date": day,
+    }
+
+
+class StubClient(CurrencyClient):
+    def __init__(self, payload: list[dict]):
+        self.payload = payload
+    
+    async def fetch_rates(self) -> list[dict]:
+        return self.payload
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_update_rates_bulk_insert(engine):
+    payload = [
+        cbu_item("USD", "840", "12800.50"),
+        cbu_item("JPY", "392", "850.00", nominal="10"),
+        cbu_item("XYZ", "999", "1.00"),  # не отслеживаем
+        {"Ccy": "EUR", "Rate": "broken"},  # битые данные
+    ]
+    
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    
+    async with AsyncSession(engine) as session:
+        result = await StubClient(payload).update_rates(session)
+    
+    assert result == {"status": "success", "new_rates_added": 2}
+    # Один upsert валют + один insert курсов, независимо от количества валют
+    assert len(statements) == 2
+    
+    async with AsyncSession(engine) as session:
+        jpy = (await session.exec(select(Currency).where(Currency.char_code == "JPY"))).one()
+        assert jpy.nominal == 10
+        rate = (await session.exec(select(CurrencyRate).where(CurrencyRate.currency_id == jpy.id))).one()
+        assert rate.rate == Decimal("85.00")
+        assert rate.date == date(2026, 2, 10)
+
+
+async def test_update_rates_is_idempotent(engine):
+    payload = [cbu_item("USD", "840", "12800.50"), cbu_item("EUR", "978", "14000.00")]
+    
+    async with AsyncSession(engine) as session:
+        assert (await StubClient(payload).update_rates(session))["new_rates_added"] == 2
+        assert (await StubClient(payload).update_rates(session))["new_rates_added"] == 0
+        
+        # Новая дата + смена номинала: добавляется только новый курс
+        payload = [cbu_item("USD", "840", "128005.00", nominal="10", day="11.02.2026")]
+        assert (await StubClient(payload).update_rates(session))["new_rates_added"] == 1
+        
+        usd = (await session.exec(select(Currency).where(Currency.char_code == "USD"))).one()
+        await session.refresh(usd)
+        assert usd.nominal == 10
+        assert len((await session.exec(select(CurrencyRate))).all()) == 3
+
+
+# ---------------------------------------------------------------------------
+# Backfill against a local stub of the CBU archive (no network)
+# ---------------------------------------------------------------------------
+
+class ArchiveStub(BaseHTTPRequestHandler):
+    """Serves /json/all/YYYY-MM-DD/; the first hit of every date answers 503."""
+    seen: set = set()
+    
+    def do_GET(self):
+        day = date.fromisoformat(self.path.strip("/").split("/")[-1])
+        if day == date(2026, 1, 4):
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.path not in self.seen:
+            self.seen.add(self.path)
+            self.send_response(503)
+            self.end_headers()
+            return
+        
+        body = json.dumps([
+            cbu_item("USD", "840", str(12000 + day.day), day=day.strftime("%d.%m.%Y")),
+            cbu_item("EUR", "978", str(13000 + day.day), day=day.strftime("%d.%m.%Y")),
+        ]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="archive_url")
+def archive_url_fixture():
+    ArchiveStub.seen = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArchiveStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/json/all/{{date}}/"
+    server.shutdown()
+
+
+async def test_backfill_rates_with_retries(engine, archive_url):
+    async def run(session):
+        async with httpx.AsyncClient() as http:
+            client = CurrencyClient(client=http, archive_url=archive_url, backoff=0.01)
+            return await client.backfill_rates(
+                session, date(2026, 1, 1), date(2026, 1, 10), concurrency=3, flush_every=4
+            )
+    
+    async with AsyncSession(engine) as session:
+        result = await run(session)
+        
+        assert result["dates_requested"] == 10
+        assert result["dates_failed"] == ["2026-01-04"]
+        assert result["new_rates_added"] == 18
+        
+        usd = (await session.exec(select(Currency).where(Currency.char_code == "USD"))).one()
+        rate = (await session.exec(
+            select(CurrencyRate).where(CurrencyRate.currency_id == usd.id, CurrencyRate.date == date(2026, 1, 7))
+        )).one()
+        assert rate.rate == Decimal("12007")
+        
+        # Повторный бэкфилл ничего не дублирует
+        assert (await run(session))["new_rates_added"] == 0
+
+
+async def test_backfill_rates_rejects_inverted_range(engine):
+    async with AsyncSession(engine) as session:
+        with pytest.raises(ValueError):
+            await CurrencyClient().backfill_rates(session, date(2026, 1, 2), date(2026, 1, 1))
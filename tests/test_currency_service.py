@@ -5,6 +5,8 @@ from sqlmodel import SQLModel, create_engine, Session
 from sqlmodel.pool import StaticPool
 from app.modules.finance.models import Currency, CurrencyRate
 from app.modules.finance.services.currency_service import CurrencyService
+from app.modules.finance.services import rate_cache as rate_cache_module
+from app.modules.finance.services.rate_cache import RateCache
 
 
 # Use in-memory SQLite with StaticPool to avoid threading/locking issues
@@ -262,3 +264,65 @@ def test_convert_from_uzs(session: Session, test_currencies, historical_rates):
     
     expected = Decimal("100.00")
     assert converted == expected
+
+
+def test_rate_cache_hit_skips_db(session: Session, test_currencies, historical_rates):
+    """Second lookup of the same (currency, date) is served from the cache"""
+    uzs, usd, eur = test_currencies
+    cache = RateCache()
+    service = CurrencyService(session, cache=cache)
+    
+    assert service.get_rate_to_base(usd.id, date=date(2026, 1, 20)) == Decimal("12500.00")
+    assert cache.stats()["misses"] == 1
+    
+    # Меняем курс в БД в обход кэша: сервис должен вернуть закэшированное значение
+    historical_rates['usd_jan'].rate = Decimal("1.00")
+    session.add(historical_rates['usd_jan'])
+    session.commit()
+    
+    assert service.get_rate_to_base(usd.id, date=date(2026, 1, 20)) == Decimal("12500.00")
+    assert cache.stats()["hits"] == 1
+    
+    # После инвалидации читаем свежий курс из БД
+    cache.invalidate()
+    assert service.get_rate_to_base(usd.id, date=date(2026, 1, 20)) == Decimal("1.00")
+
+
+def test_rate_cache_convert_is_in_memory(session: Session, test_currencies, historical_rates):
+    """Repeated conversions only hit the DB once per currency"""
+    uzs, usd, eur = test_currencies
+    cache = RateCache()
+    service = CurrencyService(session, cache=cache)
+    
+    for _ in range(5):
+        assert service.convert(Decimal("100.00"), usd.id, eur.id) == Decimal("91.43")
+    
+    stats = cache.stats()
+    assert stats["misses"] == 2
+    assert stats["hits"] == 8
+    assert stats["size"] == 2
+
+
+def test_rate_cache_evicts_least_recently_used():
+    cache = RateCache(maxsize=2)
+    cache.set(1, None, Decimal("1"))
+    cache.set(2, None, Decimal("2"))
+    cache.get(1)
+    cache.set(3, None, Decimal("3"))
+    
+    assert cache.get(2) is None
+    assert cache.get(1) == Decimal("1")
+    assert cache.get(3) == Decimal("3")
+
+
+def test_rate_cache_entries_expire(monkeypatch):
+    # Курсы, записанные другим процессом, не видны через invalidate() — спасает только TTL
+    cache = RateCache(ttl_seconds=60)
+    now = 1000.0
+    monkeypatch.setattr(rate_cache_module.time, "monotonic", lambda: now)
+    cache.set(1, None, Decimal("12500"))
+    assert cache.get(1) == Decimal("12500")
+    
+    now += 61
+    assert cache.get(1) is None
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,201 @@
+import pytest
+from datetime import datetime, timezone
+from decimal import Decimal
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.metrics import metrics
+from app.modules.auth.models import User
+from fastapi import HTTPException
+from app.modules.finance.models import Currency, CurrencyRate, Transaction, TransactionType, Wallet
+from app.modules.social.models import Debt, DebtRepayment, DebtStatus, DebtType, Debtor
+from app.modules.social.routes.debtors import get_debtors_summary
+from app.modules.social.routes.debts import (
+    get_debt_repayments, get_debts, repay_debt, repay_debts_batch, update_debt,
+)
+from app.modules.social.schemas import (
+    DebtRepaymentBatchCreate, DebtRepaymentBatchItem, DebtRepaymentCreate, DebtUpdate,
+)
+from app.modules.social.services.overdue_sweeper import _is_overdue, sweep_overdue
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(name="data")
+async def data_fixture(session: AsyncSession):
+    user = User(phone_number="998901234567", hashed_password="pw")
+    uzs = Currency(code="860", char_code="UZS", name="Sum", nominal=1)
+    usd = Currency(code="840", char_code="USD", name="Dollar", nominal=1)
+    session.add_all([user, uzs, usd])
+    await session.commit()
+
+    ali = Debtor(name="Ali", user_id=user.id)
+    vali = Debtor(name="Vali", user_id=user.id)
+    session.add_all([ali, vali])
+    await session.commit()
+    return user, uzs, usd, ali, vali
+
+
+def debt(user, debtor, currency, amount, repaid="0", type=DebtType.GIVEN, status=DebtStatus.ACTIVE, due=None) -> Debt:
+    return Debt(
+        user_id=user.id, debtor_id=debtor.id, currency_id=currency.id, amount=Decimal(amount),
+        repaid_amount=Decimal(repaid), type=type, status=status,
+        due_date=datetime(2026, 1, due, tzinfo=timezone.utc) if due else None,
+    )
+
+
+async def test_summary_groups_outstanding_per_debtor_and_currency(session: AsyncSession, engine, data, assert_max_queries):
+    user, uzs, usd, ali, vali = data
+    session.add_all([
+        debt(user, ali, uzs, "100000", repaid="30000", due=20),
+        debt(user, ali, uzs, "50000", type=DebtType.TAKEN, status=DebtStatus.OVERDUE, due=10),
+        debt(user, ali, usd, "100", due=None),
+        debt(user, ali, uzs, "999", repaid="999", status=DebtStatus.PAID, due=1),
+        debt(user, vali, uzs, "10", status=DebtStatus.FORGIVEN),
+    ])
+    await session.commit()
+
+    with assert_max_queries(engine, 1):
+        summary = await get_debtors_summary(session, user)
+
+    assert [(s.debtor_name, s.currency, s.given, s.taken, s.active_debts) for s in summary] == [
+        ("Ali", "USD", Decimal("100"), Decimal("0"), 1),
+        ("Ali", "UZS", Decimal("70000"), Decimal("50000"), 2),
+    ]
+    assert summary[0].nearest_due_date is None
+    assert summary[1].nearest_due_date.replace(tzinfo=timezone.utc) == datetime(2026, 1, 10, tzinfo=timezone.utc)
+
+
+async def test_debt_list_loads_debtors_in_one_query(session: AsyncSession, engine, data, assert_max_queries):
+    user, uzs, _, ali, vali = data
+    session.add_all([debt(user, ali, uzs, "1"), debt(user, vali, uzs, "2"), debt(user, ali, uzs, "3")])
+    await session.commit()
+    session.expunge_all()
+
+    # Сами долги + один selectinload по должникам
+    with assert_max_queries(engine, 2):
+        debts = await get_debts(None, None, None, session, user)
+        assert sorted(d.debtor.name for d in debts) == ["Ali", "Ali", "Vali"]
+
+
+async def test_overdue_sweep_in_batches_and_dry_run(session: AsyncSession, data):
+    user, uzs, _, ali, _ = data
+    session.add_all([debt(user, ali, uzs, "1", due=day) for day in range(1, 6)])
+    session.add_all([
+        debt(user, ali, uzs, "2", due=None),
+        debt(user, ali, uzs, "3", due=25),  # срок еще не наступил
+        debt(user, ali, uzs, "4", due=2, status=DebtStatus.PAID),
+    ])
+    await session.commit()
+    now = datetime(2026, 1, 20, tzinfo=timezone.utc)
+    metrics.reset()
+
+    assert await sweep_overdue(session, now=now, batch_size=2, dry_run=True) == 5
+    assert await sweep_overdue(session, now=now, batch_size=2, dry_run=False) == 5
+    assert await sweep_overdue(session, now=now, batch_size=2, dry_run=False) == 0
+
+    statuses = (await session.exec(select(Debt.amount, Debt.status).order_by(Debt.id))).all()
+    assert [status for _, status in statuses] == [DebtStatus.OVERDUE] * 5 + [
+        DebtStatus.ACTIVE, DebtStatus.ACTIVE, DebtStatus.PAID,
+    ]
+    assert metrics.overdue_debts == {"applied": 5, "dry_run": 5}
+
+
+def test_overdue_filter_matches_partial_index_predicate():
+    # Параметр вместо литерала не совпадет с WHERE частичного индекса в generic plan
+    sql = str(_is_overdue(datetime(2026, 1, 20)).compile(dialect=postgresql.dialect()))
+    assert "debts.status = 'ACTIVE'" in sql
+
+
+async def test_moving_due_date_reactivates_overdue_debt(session: AsyncSession, data):
+    user, uzs, _, ali, _ = data
+    overdue = debt(user, ali, uzs, "100", due=1, status=DebtStatus.OVERDUE)
+    session.add(overdue)
+    await session.commit()
+
+    updated = await update_debt(overdue.id, DebtUpdate(due_date=datetime(2100, 1, 1)), session, user)
+    assert updated.status == DebtStatus.ACTIVE
+
+
+@pytest.fixture(name="wallet")
+async def wallet_fixture(session: AsyncSession, data):
+    user, uzs, usd, _, _ = data
+    session.add(CurrencyRate(currency_id=usd.id, rate=Decimal("12500.00"), date=datetime(2026, 1, 1).date()))
+    wallet = Wallet(name="Cash", balance=Decimal("0.00"), currency_id=uzs.id, user_id=user.id)
+    session.add(wallet)
+    await session.commit()
+    return wallet
+
+
+async def test_repayment_moves_money_and_closes_debt(session: AsyncSession, data, wallet):
+    user, _, usd, ali, _ = data
+    loan = debt(user, ali, usd, "100")
+    session.add(loan)
+    await session.commit()
+
+    first = await repay_debt(loan.id, DebtRepaymentCreate(amount=Decimal("40"), wallet_id=wallet.id), session, user)
+    await repay_debt(loan.id, DebtRepaymentCreate(amount=Decimal("60")), session, user)
+
+    await session.refresh(loan)
+    await session.refresh(wallet)
+    assert loan.repaid_amount == Decimal("100") and loan.status == DebtStatus.PAID
+    # "Мне должны" в USD -> доход на UZS-кошелек по курсу, без категории
+    assert wallet.balance == Decimal("500000.00")
+    tx = await session.get(Transaction, first.transaction_id)
+    assert (tx.type, tx.amount, tx.category_id, tx.description) == (
+        TransactionType.INCOME, Decimal("500000.00"), None, "Возврат долга: Ali",
+    )
+
+    history = await get_debt_repayments(loan.id, session, user)
+    assert [(r.amount, r.wallet_id) for r in history] == [(Decimal("40"), wallet.id), (Decimal("60"), None)]
+
+    with pytest.raises(HTTPException) as exc:
+        await repay_debt(loan.id, DebtRepaymentCreate(amount=Decimal("1")), session, user)
+    assert exc.value.detail == "Долг уже закрыт"
+
+
+async def test_batch_repayment_is_all_or_nothing(session: AsyncSession, data, wallet):
+    user, uzs, _, ali, vali = data
+    lent = debt(user, ali, uzs, "1000")
+    borrowed = debt(user, vali, uzs, "5000", type=DebtType.TAKEN)
+    session.add_all([lent, borrowed])
+    await session.commit()
+
+    # Возврат 1000 на кошелек, но расхода 5000 с него не хватает — не проходит ничего
+    batch = DebtRepaymentBatchCreate(items=[
+        DebtRepaymentBatchItem(debt_id=lent.id, amount=Decimal("1000"), wallet_id=wallet.id),
+        DebtRepaymentBatchItem(debt_id=borrowed.id, amount=Decimal("5000"), wallet_id=wallet.id),
+    ])
+    with pytest.raises(HTTPException) as exc:
+        await repay_debts_batch(batch, session, user)
+    assert exc.value.detail == "Погашение #1: Недостаточно средств"
+    await session.refresh(user)  # после rollback в ручке объекты сессии просрочены
+    await session.refresh(lent)
+    assert lent.repaid_amount == 0 and (await session.exec(select(DebtRepayment))).all() == []
+
+    batch.items[1].amount = Decimal("1000")
+    repayments = await repay_debts_batch(batch, session, user)
+    assert len(repayments) == 2
+    await session.refresh(lent)
+    await session.refresh(borrowed)
+    await session.refresh(wallet)
+    assert (lent.status, borrowed.repaid_amount, borrowed.status) == (DebtStatus.PAID, Decimal("1000"), DebtStatus.ACTIVE)
+    assert wallet.balance == Decimal("0.00")
+
+    with pytest.raises(HTTPException) as exc:
+        await repay_debt(borrowed.id, DebtRepaymentCreate(amount=Decimal("4000.01")), session, user)
+    assert exc.value.status_code == 400
+
+
+async def test_manual_repaid_amount_edit_is_journaled(session: AsyncSession, data):
+    user, uzs, _, ali, _ = data
+    loan = debt(user, ali, uzs, "100", repaid="10")
+    session.add(loan)
+    await session.commit()
+
+    await update_debt(loan.id, DebtUpdate(repaid_amount=Decimal("30")), session, user)
+    await update_debt(loan.id, DebtUpdate(status=DebtStatus.PAID), session, user)
+
+    history = await get_debt_repayments(loan.id, session, user)
+    assert [r.amount for r in history] == [Decimal("20"), Decimal("70")]
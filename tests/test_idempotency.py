@@ -0,0 +1,91 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi import HTTPException, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.modules.auth.models import User
+from app.modules.finance.models import Category, Currency, IdempotencyKey, Transaction, TransactionType, Wallet
+from app.modules.finance.routes.transactions import create_transaction
+from app.modules.finance.schemas import TransactionCreate
+from app.modules.finance.services.idempotency import IdempotencyService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(name="initial_data")
+async def initial_data_fixture(session: AsyncSession):
+    user = User(phone_number="998901234567", hashed_password="pw")
+    uzs = Currency(code="860", char_code="UZS", name="Sum", nominal=1)
+    category = Category(name="Food")
+    session.add_all([user, uzs, category])
+    await session.commit()
+    wallet = Wallet(name="Cash", balance=Decimal("1000.00"), currency_id=uzs.id, user_id=user.id)
+    session.add(wallet)
+    await session.commit()
+    return user, category, wallet
+
+
+def expense(wallet_id: int, category_id: int, amount="100.00") -> TransactionCreate:
+    return TransactionCreate(wallet_id=wallet_id, amount=Decimal(amount), type=TransactionType.EXPENSE,
+                             category_id=category_id)
+
+
+async def post(session, user, payload, key):
+    response = Response()
+    body = await create_transaction(payload, response, idempotency_key=key, session=session, current_user=user)
+    return body, response
+
+
+async def test_retry_with_same_key_replays_first_response(session: AsyncSession, initial_data):
+    user, category, wallet = initial_data
+    # Ошибка ручки откатывает сессию и протухает объекты — дальше работаем с id
+    wallet_id, category_id = wallet.id, category.id
+    
+    first, first_response = await post(session, user, expense(wallet_id, category_id), "retry-1")
+    replay, replay_response = await post(session, user, expense(wallet_id, category_id), "retry-1")
+    
+    assert "idempotent-replayed" not in first_response.headers
+    assert replay_response.headers["idempotent-replayed"] == "true"
+    assert replay["id"] == first.id
+    assert Decimal(replay["amount"]) == Decimal("100.00")
+    
+    await session.refresh(wallet)
+    assert wallet.balance == Decimal("900.00")
+    assert len((await session.exec(select(Transaction))).all()) == 1
+    
+    # Тот же ключ, другие данные — ошибка, а не тихий повтор
+    with pytest.raises(HTTPException) as exc:
+        await post(session, user, expense(wallet_id, category_id, "5.00"), "retry-1")
+    assert exc.value.status_code == 422
+    await session.refresh(user)  # В проде каждый запрос получает свежего пользователя
+    
+    # Без ключа — обычное поведение
+    await post(session, user, expense(wallet_id, category_id), None)
+    await session.refresh(wallet)
+    assert wallet.balance == Decimal("800.00")
+
+
+async def test_expired_key_is_reclaimed_and_purged(session: AsyncSession, initial_data):
+    user, category, wallet = initial_data
+    # Ошибка ручки откатывает сессию и протухает объекты — дальше работаем с id
+    wallet_id, category_id = wallet.id, category.id
+    
+    await post(session, user, expense(wallet_id, category_id), "old")
+    record = await session.get(IdempotencyKey, (user.id, "old"))
+    record.expires_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+    await session.commit()
+    
+    # Протухший ключ не защищает: операция проводится заново
+    await post(session, user, expense(wallet_id, category_id, "50.00"), "old")
+    await session.refresh(wallet)
+    assert wallet.balance == Decimal("850.00")
+    
+    await post(session, user, expense(wallet_id, category_id), "other")
+    record = await session.get(IdempotencyKey, (user.id, "other"))
+    record.expires_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+    await session.commit()
+    
+    assert await IdempotencyService(session).purge_expired() == 1
+    await session.commit()
+    assert [r.key for r in (await session.exec(select(IdempotencyKey))).all()] == ["old"]
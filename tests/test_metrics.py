@@ -0,0 +1,93 @@
+import logging
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.pool import StaticPool
+from app.core.config import settings
+from app.core.database import TimedQueuePool
+from app.core.metrics import MetricsMiddleware, RequestStats, current_stats, instrument_engine, metrics, metrics_endpoint
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(name="client")
+async def client_fixture(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    instrument_engine(engine)
+    
+    async def get_session():
+        async with AsyncSession(engine) as session:
+            yield session
+    
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/internal/metrics", metrics_endpoint)
+    
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int, session: AsyncSession = Depends(get_session)):
+        await session.exec(text("SELECT 1"))
+        await session.exec(text("SELECT :id").bindparams(id=item_id))
+        return {"id": item_id}
+    
+    metrics.reset()
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"Authorization": "Bearer secret"},
+    ) as client:
+        yield client
+    metrics.reset()
+    await engine.dispose()
+
+
+async def test_request_stats_go_to_header_and_metrics(client):
+    for item_id in (1, 2):
+        response = await client.get(f"/items/{item_id}")
+        assert response.status_code == 200
+        assert 'db;desc="2 queries"' in response.headers["server-timing"]
+    
+    body = (await client.get("/internal/metrics")).text
+    # Метки — по шаблону пути, а не по сырому URL
+    assert 'moneta_http_requests_total{method="GET",route="/items/{item_id}"} 2' in body
+    assert 'moneta_db_statements_total{method="GET",route="/items/{item_id}"} 4' in body
+    assert "/items/1" not in body
+
+
+async def test_slow_query_log(client, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="moneta.sql.slow"):
+        await client.get("/items/1")
+    
+    assert any("SELECT 1" in record.getMessage() for record in caplog.records)
+    assert "moneta_db_slow_queries_total 2" in (await client.get("/internal/metrics")).text
+
+
+async def test_metrics_require_token(client, monkeypatch):
+    assert (await client.get("/internal/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 401
+    assert (await client.get("/internal/metrics", headers={"Authorization": ""})).status_code == 401
+    
+    # Токен не задан — ручки как будто нет
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert (await client.get("/internal/metrics")).status_code == 404
+
+
+def test_pool_wait_is_recorded():
+    engine = create_engine("sqlite://", poolclass=TimedQueuePool)
+    stats = RequestStats()
+    token = current_stats.set(stats)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    finally:
+        current_stats.reset(token)
+        engine.dispose()
+    
+    assert stats.pool_wait > 0
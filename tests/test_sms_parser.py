@@ -0,0 +1,53 @@
+import json
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from app.modules.finance.models import TransactionType
+from app.utils.sms_parser import SmsParserRegistry, sms_registry
+
+CORPUS = [json.loads(line) for line in (Path(__file__).parent / "data" / "sms_corpus.jsonl").read_text().splitlines()]
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[f"{i}-{c['sender']}" for i, c in enumerate(CORPUS)])
+def test_corpus(case):
+    parsed = sms_registry.parse(case["text"], sender=case["sender"])
+    expected = case["expected"]
+    if expected is None:
+        assert parsed is None
+        return
+    
+    assert parsed is not None
+    assert {
+        "provider": parsed.provider,
+        "type": parsed.type.value,
+        "amount": str(parsed.amount),
+        "currency": parsed.currency,
+        "merchant": parsed.merchant,
+        "card_mask": parsed.card_mask,
+        "balance": None if parsed.balance is None else str(parsed.balance),
+    } == expected
+
+
+def test_candidates_are_indexed():
+    # По отправителю/первому слову — только свой формат, а не весь реестр
+    assert [f.provider for f in sms_registry.candidates("HUMOCARD *1: ...", sender="HUMO")] == ["humo"]
+    assert [f.provider for f in sms_registry.candidates("VISA *1: ...", sender="KAPITALBANK")] == ["visa_mastercard"]
+    assert sms_registry.candidates("Skidki!", sender="UNKNOWN") == []
+
+
+def test_fallback_and_transaction_create():
+    registry = SmsParserRegistry()
+    registry.register("any", r"(?P<op>spent) (?P<amount>{AMOUNT}) (?P<currency>{CURRENCY}) at (?P<merchant>.+)$",
+                      {"spent": TransactionType.EXPENSE})
+    
+    parsed = registry.parse("You spent 9.99 USD at NETFLIX", sender="SOMEBANK")
+    tx_in = parsed.to_transaction_create(wallet_id=3, wallet_currency="USD", category_id=7)
+    assert (tx_in.amount, tx_in.type, tx_in.description) == (Decimal("9.99"), TransactionType.EXPENSE, "NETFLIX")
+    assert tx_in.raw_sms_text == "You spent 9.99 USD at NETFLIX"
+    
+    # Сумма в чужой валюте без пересчета не проходит
+    with pytest.raises(ValueError):
+        parsed.to_transaction_create(wallet_id=4, wallet_currency="UZS", category_id=7)
+    tx_in = parsed.to_transaction_create(wallet_id=4, wallet_currency="UZS", category_id=7, amount=Decimal("124875.00"))
+    assert tx_in.amount == Decimal("124875.00")
@@ -0,0 +1,320 @@
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.modules.auth.models import User
+from app.modules.finance.models import (
+    Category, Currency, CurrencyRate, MonthlyAggregate, Transaction, TransactionType, Wallet, WalletType,
+)
+from app.modules.finance.schemas import SmsImportItem, TransactionCreate, TransactionUpdate
+from app.modules.finance.services import monthly_aggregates
+from app.modules.finance.services.transaction_service import TransactionService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(name="initial_data")
+async def initial_data_fixture(session: AsyncSession):
+    user = User(phone_number="998901234567", hashed_password="pw")
+    uzs = Currency(code="860", char_code="UZS", name="Sum", nominal=1)
+    usd = Currency(code="840", char_code="USD", name="Dollar", nominal=1)
+    session.add_all([user, uzs, usd])
+    await session.commit()
+    
+    session.add(CurrencyRate(currency_id=usd.id, rate=Decimal("12500.00"), date=date(2026, 1, 1)))
+    category = Category(name="Food")
+    usd_wallet = Wallet(name="USD Cash", balance=Decimal("1000.00"), currency_id=usd.id, user_id=user.id)
+    uzs_card = Wallet(name="UZS Card", balance=Decimal("0.00"), currency_id=uzs.id, user_id=user.id,
+                      type=WalletType.CARD)
+    session.add_all([category, usd_wallet, uzs_card])
+    await session.commit()
+    return user, category, usd_wallet, uzs_card
+
+
+async def test_expense_and_income(session: AsyncSession, initial_data):
+    user, category, usd_wallet, _ = initial_data
+    service = TransactionService(session)
+    
+    await service.create_transaction(TransactionCreate(
+        wallet_id=usd_wallet.id, amount=Decimal("40.00"), type=TransactionType.EXPENSE, category_id=category.id
+    ), user.id)
+    await service.create_transaction(TransactionCreate(
+        wallet_id=usd_wallet.id, amount=Decimal("15.50"), type=TransactionType.INCOME, category_id=category.id
+    ), user.id)
+    await session.commit()
+    
+    await session.refresh(usd_wallet)
+    assert usd_wallet.balance == Decimal("975.50")
+    
+    with pytest.raises(HTTPException) as exc:
+        await service.create_transaction(TransactionCreate(
+            wallet_id=usd_wallet.id, amount=Decimal("5000.00"), type=TransactionType.EXPENSE,
+            category_id=category.id
+        ), user.id)
+    assert exc.value.status_code == 400
+
+
+async def test_cross_currency_transfer_and_delete(session: AsyncSession, initial_data):
+    user, _, usd_wallet, uzs_card = initial_data
+    service = TransactionService(session)
+    
+    tx = await service.create_transaction(TransactionCreate(
+        wallet_id=usd_wallet.id, amount=Decimal("100.00"), type=TransactionType.TRANSFER,
+        target_wallet_id=uzs_card.id
+    ), user.id)
+    await session.commit()
+    
+    await session.refresh(usd_wallet)
+    await session.refresh(uzs_card)
+    assert usd_wallet.balance == Decimal("900.00")
+    assert uzs_card.balance == Decimal("1250000.00")
+    
+    related = await session.get(Transaction, tx.related_transaction_id)
+    assert related.amount == Decimal("1250000.00")
+    assert related.related_transaction_id == tx.id
+    
+    await service.delete_transaction(tx.id, user.id)
+    
+    await session.refresh(usd_wallet)
+    await session.refresh(uzs_card)
+    assert usd_wallet.balance == Decimal("1000.00")
+    assert uzs_card.balance == Decimal("0.00")
+    assert (await session.exec(select(Transaction))).all() == []
+
+
+async def test_update_amount_reapplies_balance(session: AsyncSession, initial_data):
+    user, category, usd_wallet, _ = initial_data
+    service = TransactionService(session)
+    
+    tx = await service.create_transaction(TransactionCreate(
+        wallet_id=usd_wallet.id, amount=Decimal("100.00"), type=TransactionType.EXPENSE, category_id=category.id
+    ), user.id)
+    await session.commit()
+    
+    await service.update_transaction(tx.id, TransactionUpdate(amount=Decimal("30.00")), user.id)
+    
+    await session.refresh(usd_wallet)
+    assert usd_wallet.balance == Decimal("970.00")
+
+
+async def test_list_transactions_cursor_pages(session: AsyncSession, initial_data):
+    user, category, usd_wallet, uzs_card = initial_data
+    service = TransactionService(session)
+    
+    # Одинаковый created_at у части операций: порядок должен держаться на id
+    same_time = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+    for i in range(7):
+        session.add(Transaction(
+            wallet_id=usd_wallet.id, amount=Decimal(i + 1), type=TransactionType.EXPENSE,
+            category_id=category.id if i % 2 else None,
+            created_at=same_time if i < 4 else same_time + timedelta(days=i),
+        ))
+    session.add(Transaction(wallet_id=uzs_card.id, amount=Decimal("1"), type=TransactionType.INCOME,
+                            created_at=same_time))
+    await session.commit()
+    
+    offset_page, _ = await service.list_transactions(user.id, wallet_id=usd_wallet.id, limit=100)
+    
+    seen, cursor = [], None
+    while True:
+        page, cursor = await service.list_transactions(user.id, wallet_id=usd_wallet.id, cursor=cursor, limit=3)
+        seen.extend(page)
+        if cursor is None:
+            break
+    
+    assert [t.id for t in seen] == [t.id for t in offset_page]
+    assert len(seen) == 7
+    
+    by_category, _ = await service.list_transactions(user.id, category_id=category.id, limit=100)
+    assert {t.amount for t in by_category} == {Decimal(2), Decimal(4), Decimal(6)}
+    
+    incomes, _ = await service.list_transactions(user.id, tx_type=TransactionType.INCOME, limit=100)
+    assert [t.wallet_id for t in incomes] == [uzs_card.id]
+    
+    in_range, _ = await service.list_transactions(
+        user.id, date_from=date(2026, 3, 6), date_to=date(2026, 3, 7), limit=100
+    )
+    assert {t.amount for t in in_range} == {Decimal(6), Decimal(7)}
+    
+    with pytest.raises(HTTPException) as exc:
+        await service.list_transactions(user.id, cursor="not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+async def _rollup(session: AsyncSession) -> dict:
+    rows = (await session.exec(select(MonthlyAggregate))).all()
+    return {
+        (r.wallet_id, r.month, r.type, r.category_id): (r.total, r.count)
+        for r in rows if r.count
+    }
+
+
+async def test_monthly_aggregates_follow_service_and_match_rebuild(session: AsyncSession, initial_data):
+    user, category, usd_wallet, uzs_card = initial_data
+    service = TransactionService(session)
+    
+    expense = await service.create_transaction(TransactionCreate(
+        wallet_id=usd_wallet.id, amount=Decimal("40.00"), type=TransactionType.EXPENSE, category_id=category.id
+    ), user.id)
+    await service.create_transaction(TransactionCreate(
+        wallet_id=usd_wallet.id, amount=Decimal("10.00"), type=TransactionType.EXPENSE, category_id=category.id
+    ), user.id)
+    transfer = await service.create_transaction(TransactionCreate(
+        wallet_id=usd_wallet.id, amount=Decimal("100.00"), type=TransactionType.TRANSFER,
+        target_wallet_id=uzs_card.id
+    ), user.id)
+    await session.commit()
+    
+    month = monthly_aggregates.month_start(expense.created_at)
+    assert (await _rollup(session))[(usd_wallet.id, month, TransactionType.EXPENSE, category.id)] == (
+        Decimal("50.00"), 2
+    )
+    
+    # Перенос операции в прошлый месяц и смена суммы
+    await service.update_transaction(expense.id, TransactionUpdate(
+        amount=Decimal("30.00"), created_at=datetime(2026, 1, 15, tzinfo=timezone.utc)
+    ), user.id)
+    await service.delete_transaction(transfer.id, user.id)
+    
+    live = await _rollup(session)
+    assert live[(usd_wallet.id, date(2026, 1, 1), TransactionType.EXPENSE, category.id)] == (Decimal("30.00"), 1)
+    assert live[(usd_wallet.id, month, TransactionType.EXPENSE, category.id)] == (Decimal("10.00"), 1)
+    assert not any(key[0] == uzs_card.id for key in live)
+    
+    await monthly_aggregates.rebuild(session)
+    await session.commit()
+    assert await _rollup(session) == live
+
+
+async def test_batch_creates_rows_and_reports_failures(session: AsyncSession, initial_data):
+    user, category, usd_wallet, uzs_card = initial_data
+    service = TransactionService(session)
+    
+    items = [
+        TransactionCreate(wallet_id=usd_wallet.id, amount=Decimal("10.00"), type=TransactionType.EXPENSE,
+                          category_id=category.id, raw_sms_text=f"sms {i}")
+        for i in range(50)
+    ]
+    items.append(TransactionCreate(wallet_id=usd_wallet.id, amount=Decimal("5000.00"),
+                                   type=TransactionType.EXPENSE, category_id=category.id))
+    items.append(TransactionCreate(wallet_id=usd_wallet.id, amount=Decimal("100.00"),
+                                   type=TransactionType.TRANSFER, target_wallet_id=uzs_card.id))
+    items.append(TransactionCreate(wallet_id=999, amount=Decimal("1.00"), type=TransactionType.INCOME,
+                                   category_id=category.id))
+    
+    results = await service.create_transactions_batch(items, user.id)
+    await session.commit()
+    
+    errors = {index: error for index, (tx, error) in enumerate(results) if error}
+    assert errors == {50: "Недостаточно средств", 52: "Кошелек не найден"}
+    
+    await session.refresh(usd_wallet)
+    await session.refresh(uzs_card)
+    assert usd_wallet.balance == Decimal("400.00")
+    assert uzs_card.balance == Decimal("1250000.00")
+    
+    transfer = results[51][0]
+    related = await session.get(Transaction, transfer.related_transaction_id)
+    assert related.related_transaction_id == transfer.id
+    assert related.amount == Decimal("1250000.00")
+    
+    assert len((await session.exec(select(Transaction))).all()) == 52
+    rollup = await _rollup(session)
+    month = monthly_aggregates.month_start(transfer.created_at)
+    assert rollup[(usd_wallet.id, month, TransactionType.EXPENSE, category.id)] == (Decimal("500.00"), 50)
+
+
+async def test_batch_atomic_rolls_back_everything(session: AsyncSession, initial_data):
+    user, category, usd_wallet, _ = initial_data
+    service = TransactionService(session)
+    
+    items = [
+        TransactionCreate(wallet_id=usd_wallet.id, amount=Decimal("600.00"), type=TransactionType.EXPENSE,
+                          category_id=category.id)
+        for _ in range(2)
+    ]
+    with pytest.raises(HTTPException) as exc:
+        await service.create_transactions_batch(items, user.id, atomic=True)
+    assert exc.value.detail == "Операция #1: Недостаточно средств"
+    await session.rollback()
+    
+    await session.refresh(usd_wallet)
+    assert usd_wallet.balance == Decimal("1000.00")
+    assert (await session.exec(select(Transaction))).all() == []
+
+
+async def test_sms_import_converts_to_wallet_currency(session: AsyncSession, initial_data):
+    user, category, usd_wallet, uzs_card = initial_data
+    service = TransactionService(session)
+    
+    def visa(currency: str) -> str:
+        return f"VISA *4321: Purchase 2.00 {currency}, AMAZON.COM, Balance: 340.00 {currency}"
+    
+    items = [
+        SmsImportItem(text="HUMOCARD *1234: popolnenie 100000.00 UZS; PAYNET; Dostupno: 100000.00 UZS",
+                      sender="HUMO", wallet_id=uzs_card.id, category_id=category.id),
+        SmsImportItem(text=visa("USD"), sender="KAPITALBANK", wallet_id=uzs_card.id, category_id=category.id),
+        SmsImportItem(text=visa("USD"), sender="KAPITALBANK", wallet_id=usd_wallet.id, category_id=category.id),
+        SmsImportItem(text=visa("EUR"), sender="KAPITALBANK", wallet_id=uzs_card.id, category_id=category.id),
+        SmsImportItem(text="Skidki 50%!", sender="KORZINKA", wallet_id=uzs_card.id, category_id=category.id),
+    ]
+    results = await service.create_transactions_from_sms(items, user.id)
+    await session.commit()
+    
+    assert [tx.amount if tx else error for tx, error in results] == [
+        Decimal("100000.00"),
+        Decimal("25000.00"),  # 2 USD по курсу 12500 — в валюте UZS-кошелька
+        Decimal("2.00"),
+        "Неизвестная валюта EUR",
+        "Не удалось разобрать SMS",
+    ]
+    assert results[1][0].raw_sms_text == visa("USD")
+    await session.refresh(uzs_card)
+    assert uzs_card.balance == Decimal("75000.00")
+    
+    with pytest.raises(HTTPException) as exc:
+        await service.create_transactions_from_sms(items, user.id, atomic=True)
+    assert exc.value.detail == "SMS #3: Неизвестная валюта EUR"
+
+
+@pytest.mark.parametrize("atomic_balance", [True, False])
+async def test_income_expense_paths_agree(session: AsyncSession, initial_data, atomic_balance):
+    user, category, usd_wallet, uzs_card = initial_data
+    service = TransactionService(session, atomic_balance=atomic_balance)
+    
+    tx = await service.create_transaction(TransactionCreate(
+        wallet_id=usd_wallet.id, amount=Decimal("250.00"), type=TransactionType.EXPENSE, category_id=category.id
+    ), user.id)
+    assert tx.id is not None
+    # Кредитка может уйти в минус
+    await service.create_transaction(TransactionCreate(
+        wallet_id=uzs_card.id, amount=Decimal("70000.00"), type=TransactionType.EXPENSE, category_id=category.id
+    ), user.id)
+    await session.commit()
+    
+    with pytest.raises(HTTPException) as exc:
+        await service.create_transaction(TransactionCreate(
+            wallet_id=usd_wallet.id, amount=Decimal("750.01"), type=TransactionType.EXPENSE, category_id=category.id
+        ), user.id)
+    assert exc.value.status_code == 400
+    
+    stranger = User(phone_number="998907777777", hashed_password="pw")
+    session.add(stranger)
+    await session.commit()
+    with pytest.raises(HTTPException) as exc:
+        await service.create_transaction(TransactionCreate(
+            wallet_id=usd_wallet.id, amount=Decimal("1.00"), type=TransactionType.INCOME, category_id=category.id
+        ), stranger.id)
+    assert exc.value.status_code == 404
+    await session.rollback()
+    
+    await session.refresh(usd_wallet)
+    await session.refresh(uzs_card)
+    assert usd_wallet.balance == Decimal("750.00")
+    assert uzs_card.balance == Decimal("-70000.00")
+    rows = (await session.exec(select(Transaction).where(Transaction.wallet_id == usd_wallet.id))).all()
+    assert [r.amount for r in rows] == [Decimal("250.00")]
+    rollup = (await session.exec(select(MonthlyAggregate).where(MonthlyAggregate.wallet_id == usd_wallet.id))).one()
+    assert (rollup.total, rollup.count) == (Decimal("250.00"), 1)
@@ -0,0 +1,102 @@
+import pytest
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlmodel import SQLModel, Session, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.pool import StaticPool
+from starlette.requests import Request
+from app.modules.auth.models import User
+from app.modules.finance.admin import WalletAdmin
+from app.modules.finance.models import Category, Currency, MonthlyAggregate, TransactionType, Wallet, WalletType
+from app.modules.finance.routes.wallets import delete_wallet, get_my_wallets, get_wallet_detail
+from app.modules.finance.schemas import TransactionCreate
+from app.modules.finance.services.transaction_service import TransactionService
+
+pytestmark = pytest.mark.anyio
+
+WALLETS = 15
+
+
+async def seed(session) -> User:
+    user = User(phone_number="998901234567", hashed_password="pw")
+    currencies = [
+        Currency(code=str(800 + i), char_code=code, name=code, nominal=1)
+        for i, code in enumerate(["UZS", "USD", "EUR"])
+    ]
+    session.add_all([user, *currencies])
+    await session.commit()
+    
+    session.add_all([
+        Wallet(name=f"W{i}", balance=Decimal(i), currency_id=currencies[i % 3].id, user_id=user.id,
+               type=WalletType.CARD)
+        for i in range(WALLETS)
+    ])
+    await session.commit()
+    return user
+
+
+async def test_wallet_list_and_detail_are_single_query(session: AsyncSession, engine, assert_max_queries):
+    user = await seed(session)
+    session.expunge_all()  # Никаких подгруженных валют в identity map
+    
+    with assert_max_queries(engine, 1):
+        wallets = await get_my_wallets(session=session, current_user=user)
+    
+    assert len(wallets) == WALLETS
+    assert [w.currency_code for w in wallets[:3]] == ["UZS", "USD", "EUR"]
+    assert wallets[4].balance == Decimal("4.00")
+    
+    with assert_max_queries(engine, 1):
+        detail = await get_wallet_detail(wallets[1].id, session=session, current_user=user)
+    assert detail.currency_code == "USD"
+    
+    stranger = User(phone_number="998900000000", hashed_password="pw")
+    with pytest.raises(HTTPException) as exc:
+        await get_wallet_detail(wallets[1].id, session=session, current_user=stranger)
+    assert exc.value.status_code == 404
+
+
+async def test_wallet_admin_list_loads_relations_in_one_query(assert_max_queries):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(phone_number="998901234567", hashed_password="pw")
+        currency = Currency(code="860", char_code="UZS", name="Sum", nominal=1)
+        session.add_all([user, currency])
+        session.commit()
+        session.add_all([Wallet(name=f"W{i}", currency_id=currency.id, user_id=user.id) for i in range(WALLETS)])
+        session.commit()
+    
+    with Session(engine) as session:
+        request = Request({"type": "http", "state": {"session": session}})
+        view = WalletAdmin(Wallet)
+        
+        with assert_max_queries(engine, 1):
+            wallets = await view.find_all(request, limit=20)
+            names = [(w.currency_rel.char_code, w.user.phone_number) for w in wallets]
+    
+    assert len(names) == WALLETS
+
+
+async def test_delete_wallet_with_history(session: AsyncSession):
+    # SQLite по умолчанию не проверяет внешние ключи — включаем, как в PostgreSQL
+    await session.exec(text("PRAGMA foreign_keys=ON"))
+    user = await seed(session)
+    wallet = (await get_my_wallets(session=session, current_user=user))[0]
+    category = Category(name="Food")
+    session.add(category)
+    await session.commit()
+    
+    # Операции удалены, но в месячной свертке остались строки кошелька
+    service = TransactionService(session)
+    tx = await service.create_transaction(TransactionCreate(
+        wallet_id=wallet.id, amount=Decimal("1.00"), type=TransactionType.INCOME, category_id=category.id
+    ), user.id)
+    await session.commit()
+    await service.delete_transaction(tx.id, user.id)
+    assert (await session.exec(select(MonthlyAggregate))).all() != []
+    
+    await delete_wallet(wallet.id, session=session, current_user=user)
+    assert await session.get(Wallet, wallet.id) is None
+    assert (await session.exec(select(MonthlyAggregate))).all() == []